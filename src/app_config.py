@@ -17,6 +17,10 @@ class AppConfig:
     title: str = "Hunter Game"
     assets_dir: str = localize_path("assets")
     keys: str = "keys/azerty.json"
+    server_io_thread: bool = False
+    server_asyncio: bool = False
+    server_pool_workers: int = 0
+    server_pool_spare_sessions: int = 1
 
 def load_config() -> AppConfig:
     # I added a config.json file from an urgent need of constantly changing different app settings
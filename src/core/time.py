@@ -18,13 +18,16 @@ class Clock:
         self.delta_time = 0.0
         self.time = 0.0
 
-    def update(self):
+    def update(self, limit_fps: bool = True):
         """
         Update the internal time information with provided delta time. 
-        This is only supposed to get called from the clock plugin
+        This is only supposed to get called from the clock plugin.
+
+        When `limit_fps` is `False`, the clock will not sleep to maintain its framerate. This is useful
+        for runners that wait on their own (like the asyncio one)
         """
 
-        delta_time = self.clock.tick(self.fps) / 1000
+        delta_time = self.clock.tick(self.fps if limit_fps else 0) / 1000
 
         self.delta_time = delta_time
         self.time += delta_time
@@ -37,6 +40,10 @@ class Clock:
 
     def get_fixed_delta(self) -> float:
         return 1/self.fixed_fps
+
+    def get_time_until_fixed_update(self) -> float:
+        "How much time is left until the next fixed update should run"
+        return max(0, self.get_fixed_delta() - self.alpha_timer)
     
     def get_alpha(self) -> float:
         """
@@ -0,0 +1,61 @@
+"""
+A dedicated multi-session server, that hosts many games in a single process on a single port.
+
+With `--workers` the sessions are spread between multiple processes that all listen on the same port
+(only on platforms with `SO_REUSEPORT` support, see the sharding section of the network module). Every worker
+also hosts its sessions on its own port, and clients get redirected there from the shared one.
+"""
+
+from plugins.server.sessions import run_session_host
+from modules.network import get_current_ip, supports_sharding
+
+from argparse import ArgumentParser
+from multiprocessing import Process, freeze_support
+
+import socket
+
+def pick_free_port(ip: str) -> int:
+    "Sharded workers need to know their ports (both the shared and each other's) up front"
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((ip, 0))
+        return sock.getsockname()[1]
+
+def main():
+    parser = ArgumentParser(description="Host multiple game sessions on a single port")
+    parser.add_argument("--sessions", type=int, default=8, help="The amount of sessions to keep available (per worker)")
+    parser.add_argument("--port", type=int, default=0, help="The port to host on (0 picks any free port)")
+    parser.add_argument("--workers", type=int, default=1, help="The amount of processes sharing the port")
+    args = parser.parse_args()
+
+    ip = get_current_ip()
+
+    if args.workers == 1:
+        run_session_host(args.sessions, (ip, args.port))
+        return
+
+    assert supports_sharding(), "Multiple workers require SO_REUSEPORT, which isn't supported on this platform"
+
+    addr = (ip, args.port or pick_free_port(ip))
+    print("Hosting on", addr)
+
+    worker_ports = tuple(pick_free_port(ip) for _ in range(args.workers))
+
+    workers = [
+        Process(target=run_session_host, args=(args.sessions, (ip, port), (addr, shard, worker_ports)))
+        for shard, port in enumerate(worker_ports)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # The workers get interrupted as well, so we only need to wait for them
+        for worker in workers:
+            worker.join()
+
+if __name__ == "__main__":
+    freeze_support()
+    main()
@@ -0,0 +1,67 @@
+"""
+A headless load generator, that connects many bots (simulated players) from a single process to a server,
+and periodically reports the bandwidth, the latency and how steadily the server sends its snapshots
+(see the load bots module).
+
+For example, 40 bots against a dedicated server, joining at 5 per second and playing for 2 minutes:
+```
+python loadbot.py --target 192.168.0.2:5000 --bots 40 --spawn-rate 5 --duration 120
+```
+"""
+
+from plugins.client.loadbots import BotSwarm, RandomInputs, ScriptedInputs, load_input_script, run_swarm
+
+from app_config import CONFIG
+
+from argparse import ArgumentParser
+
+def parse_addr(addr: str) -> tuple[str, int]:
+    ip, port = addr.rsplit(":", 1)
+    return ip, int(port)
+
+def main():
+    parser = ArgumentParser(description="Stress test a game server with headless bots")
+    parser.add_argument("--target", type=parse_addr, required=True, help="The server's address (ip:port)")
+    parser.add_argument("--room", type=int, default=None, help="A specific session's room ID (by default bots join any)")
+    parser.add_argument("--bots", type=int, default=10, help="The amount of bots")
+    parser.add_argument("--spawn-rate", type=float, default=10, help="How many bots connect every second")
+    parser.add_argument("--duration", type=float, default=None, help="How long to run in seconds (forever by default)")
+    parser.add_argument("--report-rate", type=float, default=5, help="How often to print a report, in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the bots' random inputs")
+    parser.add_argument("--script", type=str, default=None, help="An input script all bots follow, instead of random inputs")
+    parser.add_argument("--ready-after", type=float, default=0, help="Seconds after connecting before a bot is ready")
+    parser.add_argument("--never-ready", action="store_true", help="Never signal that bots are ready")
+    args = parser.parse_args()
+
+    if args.script is not None:
+        steps = load_input_script(args.script)
+        script_duration = sum(duration for duration, _ in steps)
+
+        # Every bot starts at a random point of the script, so they don't move in lockstep
+        make_behaviour = lambda rng: ScriptedInputs(steps, rng.uniform(0, script_duration))
+    else:
+        make_behaviour = RandomInputs
+
+    swarm = BotSwarm(
+        args.target,
+        args.bots,
+        make_behaviour,
+        args.room,
+        None if args.never_ready else args.ready_after,
+        args.spawn_rate,
+        args.seed
+    )
+
+    try:
+        run_swarm(swarm, CONFIG.fixed_fps, args.duration, args.report_rate)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Whatever happened since the last periodic report
+        if swarm.time > swarm.last_report_time:
+            print(swarm.report())
+
+        swarm.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Bit level packing of values.
+
+`struct` formats are byte aligned: a boolean takes a full byte, and a position takes 16 bits even if the map
+only needs 12. A bit schema instead describes every field with the exact amount of bits it needs (and how to
+quantize it into them), and packs all fields tightly one after another.
+
+Under the hood all fields are accumulated into a single Python integer, which is then converted to bytes
+in one go (and the other way around when unpacking). This is way faster than shifting bytes manually.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+BIT_ORDER = "little"
+
+class BitpackError(Exception):
+    "The packed data is too short for the schema"
+
+class BitField(ABC):
+    "A field of a bit schema. Every field converts its values into unsigned integers of `bits` bits and back"
+
+    def __init__(self, bits: int):
+        assert bits > 0, "A field needs at least a single bit"
+
+        self.bits = bits
+        self.max_value = (1 << bits) - 1
+
+    @abstractmethod
+    def encode(self, value: Any) -> int:
+        ...
+
+    @abstractmethod
+    def decode(self, value: int) -> Any:
+        ...
+
+class UInt(BitField):
+    "An unsigned integer. Values that don't fit are clamped"
+
+    def encode(self, value: int) -> int:
+        return min(max(int(value), 0), self.max_value)
+
+    def decode(self, value: int) -> int:
+        return value
+
+class Int(BitField):
+    "An integer in the inclusive range. It takes exactly as many bits as the range needs. Values outside are clamped"
+
+    def __init__(self, low: int, high: int):
+        assert low < high, "The range is empty"
+
+        super().__init__((high - low).bit_length())
+
+        self.low = low
+        self.high = high
+
+    def encode(self, value: int) -> int:
+        return min(max(int(value), self.low), self.high) - self.low
+
+    def decode(self, value: int) -> int:
+        return value + self.low
+
+class Bool(BitField):
+    def __init__(self):
+        super().__init__(1)
+
+    def encode(self, value: bool) -> int:
+        return 1 if value else 0
+
+    def decode(self, value: int) -> bool:
+        return value == 1
+
+class Fixed(BitField):
+    "A float in the inclusive range, quantized into `bits` bits. Values outside are clamped"
+
+    def __init__(self, low: float, high: float, bits: int):
+        assert low < high, "The range is empty"
+
+        super().__init__(bits)
+
+        self.low = low
+        self.high = high
+        self.step = (high - low) / self.max_value
+
+    def encode(self, value: float) -> int:
+        return round((min(max(value, self.low), self.high) - self.low) / self.step)
+
+    def decode(self, value: int) -> float:
+        return self.low + value * self.step
+
+class BitSchema:
+    "A tightly packed sequence of fields"
+
+    def __init__(self, *fields: BitField):
+        assert len(fields) > 0, "A schema needs at least a single field"
+
+        self.fields = fields
+        self.bits = sum(field.bits for field in fields)
+        self.size = (self.bits + 7) // 8
+        "The size of packed values in bytes"
+
+    def pack(self, *values: Any) -> bytes:
+        assert len(values) == len(self.fields), "The amount of values doesn't match the schema"
+
+        packed = 0
+        shift = 0
+        for field, value in zip(self.fields, values):
+            packed |= field.encode(value) << shift
+            shift += field.bits
+
+        return packed.to_bytes(self.size, BIT_ORDER)
+
+    def unpack(self, data: bytes) -> tuple:
+        if len(data) != self.size:
+            raise BitpackError(f"Expected {self.size} bytes, got {len(data)}")
+
+        packed = int.from_bytes(data, BIT_ORDER)
+
+        values = []
+        for field in self.fields:
+            values.append(field.decode(packed & field.max_value))
+            packed >>= field.bits
+
+        return tuple(values)
@@ -0,0 +1,95 @@
+"""
+Clock synchronization, similar to NTP. The client sends its own time, and the remote side answers with the time
+it has received the request at, and the time it has sent the answer at, echoing the client's. The time the request
+was held on the remote side isn't part of the round trip, and assuming the request and the answer took the same
+time - the client can estimate how far the remote clock is from its own:
+
+```
+rtt = (received_at - sent_at) - (remote_sent_at - remote_received_at)
+offset = ((remote_received_at - sent_at) + (remote_sent_at - received_at)) / 2
+```
+
+A single sample isn't reliable. Packets that got delayed on their way (or on the way back) have a larger round trip
+time, and a larger error. So multiple samples are kept, and only the ones with the shortest round trip times
+are used (the rest are considered outliers).
+
+Changing the offset at once would make the remote time jump (and everything interpolated by it). Small corrections
+are slewed instead - the offset moves towards the estimate slowly, so the remote time passes slightly
+faster or slower for a while. Only large errors (like the very first sample) are stepped
+"""
+
+from collections import deque
+from typing import Optional
+
+class ClockSync:
+    "The estimated offset of a remote clock from ours"
+
+    def __init__(self, samples: int = 8, max_slew_rate: float = 0.05, max_slew_error: float = 0.25):
+        assert samples > 0
+
+        self.samples: deque[tuple[float, float]] = deque(maxlen=samples)
+        "Round trip times and offsets of the latest samples"
+
+        self.max_slew_rate = max_slew_rate
+        "How many seconds every second the offset can change by when slewing"
+        self.max_slew_error = max_slew_error
+        "Errors larger than this are corrected at once"
+
+        self.offset: Optional[float] = None
+
+    def push_sample(self, sent_at: float, remote_received_at: float, remote_sent_at: float, received_at: float) -> bool:
+        """
+        Add a sample from a request sent at `sent_at`, whose answer arrived at `received_at` (both by our clock).
+        The remote side has received it at `remote_received_at`, and answered at `remote_sent_at` (by its clock).
+        Returns `False` if the sample is impossible (like the one with a negative round trip time)
+        """
+
+        held = remote_sent_at - remote_received_at
+        rtt = received_at - sent_at - held
+        if held < 0 or rtt < 0:
+            return False
+
+        self.samples.append((rtt, ((remote_received_at - sent_at) + (remote_sent_at - received_at))/2))
+
+        target = self.get_target_offset()
+        if self.offset is None or abs(target - self.offset) > self.max_slew_error:
+            self.offset = target
+
+        return True
+
+    def get_target_offset(self) -> Optional[float]:
+        "The offset estimated from the best samples: the median offset of the half with the shortest round trip times"
+
+        if not self.samples:
+            return None
+
+        best = sorted(self.samples)[:(len(self.samples)+1)//2]
+        offsets = sorted(offset for _, offset in best)
+
+        middle = len(offsets)//2
+        if len(offsets) % 2:
+            return offsets[middle]
+
+        return (offsets[middle-1] + offsets[middle])/2
+
+    def update(self, dt: float):
+        "Slew the offset towards the estimate"
+
+        target = self.get_target_offset()
+        if target is None:
+            return
+
+        max_change = self.max_slew_rate * dt
+        self.offset += min(max(target - self.offset, -max_change), max_change)
+
+    def get_offset(self) -> float:
+        "The current offset of the remote clock. If there are no samples yet - returns 0"
+        return self.offset if self.offset is not None else 0
+
+    def get_rtt(self) -> Optional[float]:
+        "The shortest round trip time of all samples"
+        return min(self.samples)[0] if self.samples else None
+
+    def reset(self):
+        self.samples.clear()
+        self.offset = None
@@ -1,4 +1,5 @@
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Optional
+from collections import deque
 from numpy import pi
 
 V = TypeVar("V")
@@ -32,21 +33,179 @@ class InterpolatedDegrees(Interpolated):
     def get_interpolated(self, alpha: float):
         assert 0 <= alpha <= 1
 
-        delta_angle = self.values[1]-self.values[0]
+        return _lerp_radians(self.values[0], self.values[1], alpha)
 
-        if delta_angle > pi:
-            delta_angle -= 2*pi
-        elif delta_angle < -pi:
-            delta_angle += 2*pi
+def _lerp_radians(a: float, b: float, alpha: float) -> float:
+    "Interpolate between 2 angles (between -PI and PI) along the shortest path"
+
+    delta_angle = b-a
+
+    if delta_angle > pi:
+        delta_angle -= 2*pi
+    elif delta_angle < -pi:
+        delta_angle += 2*pi
+    
+    interpolated = a + delta_angle*alpha
+
+    if interpolated > pi:
+        interpolated -= 2*pi
+    elif interpolated < -pi:
+        interpolated += 2*pi
+
+    return interpolated
+
+class SnapshotBuffer(Generic[V]):
+    """
+    A jitter buffer of timestamped samples (like positions received from the server). Unlike `Interpolated`, it
+    remembers multiple samples, and interpolates between whichever 2 of them surround the requested time. So a late or lost
+    sample doesn't make the value snap - it's simply interpolated across a longer gap.
+
+    When the requested time is past the latest sample, the value gets extrapolated from the 2 latest samples, but
+    only up to `max_extrapolation` seconds. After that it stays where the extrapolation has stopped
+    """
+    def __init__(self, initial: V, size: int = 8, max_extrapolation: float = 0.1):
+        assert size >= 2, "Interpolation needs at least 2 samples"
+
+        self.initial = initial
+        "The value until the first sample arrives"
+
+        self.samples: deque[tuple[float, V]] = deque(maxlen=size)
+        "Samples from the oldest to the latest"
+
+        self.max_extrapolation = max_extrapolation
+
+    def push_sample(self, time: float, value: V) -> bool:
+        "Add a new sample. Samples that aren't newer than the latest one are ignored (returns `False`)"
+
+        if self.samples and time <= self.samples[-1][0]:
+            return False
         
-        interpolated = self.values[0] + delta_angle*alpha
+        self.samples.append((time, value))
+        return True
+    
+    def get_latest_time(self) -> Optional[float]:
+        "The time of the latest sample, or `None` if there are no samples yet"
+        return self.samples[-1][0] if self.samples else None
+
+    def get_value(self) -> V:
+        "Return the latest, non-interpolated value"
+        return self.samples[-1][1] if self.samples else self.initial
+    
+    def _lerp(self, a: V, b: V, alpha: float) -> V:
+        return a + (b-a) * alpha
 
-        if interpolated > pi:
-            interpolated -= 2*pi
-        elif interpolated < -pi:
-            interpolated += 2*pi
+    def get_interpolated(self, time: float) -> V:
+        "Get the value at the provided time. Times before the oldest sample return the oldest sample"
 
-        return interpolated
+        samples = self.samples
+        if not samples:
+            return self.initial
+        
+        latest_time, latest = samples[-1]
+        if time >= latest_time:
+            if len(samples) < 2:
+                return latest
+            
+            prev_time, prev = samples[-2]
+            ahead = min(time - latest_time, self.max_extrapolation)
+
+            return self._lerp(prev, latest, 1 + ahead/(latest_time - prev_time))
+        
+        # Usually the render time is close to the latest samples, so we search from the end
+        for i in range(len(samples)-2, -1, -1):
+            prev_time, prev = samples[i]
+            if time >= prev_time:
+                next_time, next_value = samples[i+1]
+                return self._lerp(prev, next_value, (time - prev_time)/(next_time - prev_time))
+        
+        return samples[0][1]
+    
+    def clear(self):
+        self.samples.clear()
+
+class SnapshotBufferDegrees(SnapshotBuffer):
+    "The same as `SnapshotBuffer`, but for angles between -PI and PI"
+
+    def _lerp(self, a: float, b: float, alpha: float) -> float:
+        return _lerp_radians(a, b, alpha)
+
+class InterpolationDelay:
+    """
+    How far in the past snapshots should be interpolated, measured from how regularly they arrive.
+
+    To always have a newer sample to interpolate towards, the delay has to be at least 1 interval between samples. On
+    top of that we add a margin for jitter, which is estimated like in RTP (RFC 3550): a smoothed average of how much
+    every interval differs from the average interval. A steady connection gets a short delay, while an unstable one
+    gets a longer (but smooth) one.
+
+    The delay isn't changed at once, as that would make the interpolated values jump. Instead it drifts towards
+    its target by at most `adjust_rate` seconds every second, so time passes slightly slower or faster for a while
+    """
+    def __init__(
+        self, 
+        min_delay: float, 
+        max_delay: float, 
+        jitter_scale: float = 2, 
+        smoothing: float = 1/16, 
+        adjust_rate: float = 0.1
+    ):
+        assert 0 <= min_delay <= max_delay
+
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.jitter_scale = jitter_scale
+        "How many average deviations to keep as the margin"
+        self.smoothing = smoothing
+        self.adjust_rate = adjust_rate
+
+        self.last_arrival: Optional[float] = None
+        self.interval: Optional[float] = None
+        "The smoothed interval between arrivals"
+        self.jitter = 0.0
+        "The smoothed deviation of intervals from the average"
+
+        self.delay = min_delay
+
+    def push_arrival(self, time: float):
+        "Remember that a sample has arrived at the provided time"
+
+        if self.last_arrival is not None:
+            interval = time - self.last_arrival
+
+            if self.interval is None:
+                self.interval = interval
+            else:
+                self.jitter += (abs(interval - self.interval) - self.jitter) * self.smoothing
+                self.interval += (interval - self.interval) * self.smoothing
+
+        self.last_arrival = time
+
+    def get_target_delay(self) -> float:
+        if self.interval is None:
+            return self.min_delay
+        
+        target = self.interval + self.jitter * self.jitter_scale
+        return min(max(target, self.min_delay), self.max_delay)
+
+    def update(self, dt: float):
+        "Move the delay towards its target"
+
+        max_change = self.adjust_rate * dt
+        change = self.get_target_delay() - self.delay
+
+        self.delay += min(max(change, -max_change), max_change)
+
+    def get_delay(self) -> float:
+        return self.delay
+    
+    def get_jitter(self) -> float:
+        return self.jitter
+    
+    def reset(self):
+        self.last_arrival = None
+        self.interval = None
+        self.jitter = 0.0
+        self.delay = self.min_delay
 
 def compute_time_alpha(prelast: float, last: float, current: float) -> float:
     """
@@ -0,0 +1,341 @@
+"""
+## Network simulation
+
+A deterministic simulator of bad network conditions, for benchmarking and regression testing the netcode on a
+single machine. Unlike the testing mode of connections (see `HighUDPConnectionUnstable`), it delays packets,
+and everything it does is driven by a seeded random generator and the provided time, so the same traffic
+under the same seed always gets the same treatment.
+
+Every direction of a link is simulated separately (see `LinkSimulator`), in this order:
+1. Loss. Besides random loss, losses can come in bursts: the link switches between a good and a bad state
+(the Gilbert-Elliott model), and packets get lost much more often in the bad one.
+2. Bandwidth. Packets are sent one after another at the provided rate, so they wait for the ones before them.
+When the wait gets too long - new packets are dropped, like in a router's queue.
+3. Latency and jitter. Every packet gets delayed by the latency, plus a random amount of jitter. Jitter alone
+doesn't reorder packets (a packet can't arrive before the one that was sent before it), but a fraction of packets
+can be held for longer, so the packets behind them overtake them.
+4. Dublicates and corruption, the same as in the testing mode.
+
+There are 2 ways to use it:
+- `SimulatedSocket` wraps a socket of a `HighUDPServer` or a `HighUDPClient` in the same process (see their
+`simulate_network` methods). Only sending is simulated, so both ends should be simulated for both directions.
+- `NetworkRelay` is a standalone UDP proxy. Clients connect to the relay instead of the server, and it forwards
+packets both ways. It works with unmodified clients and servers (even in other processes), but since packets
+arrive from real sockets - it's only as deterministic as the timing of the traffic itself
+"""
+
+from typing import Callable, Optional
+
+from time import perf_counter
+
+import heapq
+import random
+import select
+import socket
+
+class NetworkConditions:
+    "The conditions of a single direction of a link. The defaults are a perfect link"
+
+    def __init__(
+        self,
+        latency: float = 0,
+        jitter: float = 0,
+        loss: float = 0,
+        burst_loss: float = 0,
+        burst_start: float = 0,
+        burst_end: float = 1,
+        reordering: float = 0,
+        reordering_delay: float = 0.05,
+        bandwidth: Optional[float] = None,
+        max_queue_delay: float = 0.25,
+        dublicates: float = 0,
+        corruption: float = 0
+    ):
+        """
+        Times are in seconds, the bandwidth is in bytes per second (`None` is unlimited), and everything
+        else is a probability between 0 and 1
+        """
+
+        self.latency = latency
+        "The base one-way delay"
+        self.jitter = jitter
+        "Every packet is delayed by up to this much on top of the latency"
+        self.loss = loss
+        "The probability to lose a packet in the good state"
+
+        self.burst_loss = burst_loss
+        "The probability to lose a packet in the bad state"
+        self.burst_start = burst_start
+        "The probability for every packet to switch the link to the bad state"
+        self.burst_end = burst_end
+        "The probability for every packet to switch the link back to the good state"
+
+        self.reordering = reordering
+        "The probability to hold a packet for longer, so the following ones overtake it"
+        self.reordering_delay = reordering_delay
+
+        self.bandwidth = bandwidth
+        self.max_queue_delay = max_queue_delay
+        "Packets that would wait for the bandwidth longer than this are dropped"
+
+        self.dublicates = dublicates
+        self.corruption = corruption
+
+class LinkSimulator:
+    "A single direction of a link. Packets are submitted when they're sent, and polled once they arrive"
+
+    def __init__(self, conditions: NetworkConditions, seed: int = 0):
+        self.conditions = conditions
+        self.rng = random.Random(seed)
+
+        self.in_flight: list[tuple[float, int, bytes]] = []
+        "A heap of packets with their arrival times (and submission order, for the packets that arrive at once)"
+        self.counter = 0
+
+        self.bursting = False
+        "Whether the link is in the bad state (see the burst loss)"
+        self.link_free_at = 0.0
+        "When the link will have sent everything submitted before (see the bandwidth)"
+        self.last_arrival = 0.0
+        "The arrival time of the latest packet that wasn't reordered"
+
+        self.dropped = 0
+        "The amount of lost packets (including the ones dropped for the bandwidth)"
+
+    def _is_lost(self) -> bool:
+        conditions, rng = self.conditions, self.rng
+
+        if self.bursting:
+            self.bursting = rng.random() >= conditions.burst_end
+        else:
+            self.bursting = rng.random() < conditions.burst_start
+
+        return rng.random() < (conditions.burst_loss if self.bursting else conditions.loss)
+
+    def _push(self, arrival: float, packet: bytes):
+        heapq.heappush(self.in_flight, (arrival, self.counter, packet))
+        self.counter += 1
+
+    def submit(self, now: float, packet: bytes):
+        "Send a packet through the link at the provided time"
+
+        conditions, rng = self.conditions, self.rng
+
+        if self._is_lost():
+            self.dropped += 1
+            return
+
+        sent_at = now
+        if conditions.bandwidth is not None:
+            sent_at = max(now, self.link_free_at)
+            if sent_at - now > conditions.max_queue_delay:
+                self.dropped += 1
+                return
+
+            self.link_free_at = sent_at + len(packet) / conditions.bandwidth
+
+        arrival = sent_at + conditions.latency + rng.random() * conditions.jitter
+
+        if rng.random() < conditions.reordering:
+            arrival += conditions.reordering_delay
+        else:
+            arrival = self.last_arrival = max(arrival, self.last_arrival)
+
+        if rng.random() < conditions.corruption:
+            packet = packet[::-1]
+
+        self._push(arrival, packet)
+        if rng.random() < conditions.dublicates:
+            self._push(arrival, packet)
+
+    def poll(self, now: float) -> list[bytes]:
+        "Take all packets that have arrived by the provided time, in the order of their arrival"
+
+        arrived = []
+        in_flight = self.in_flight
+
+        while in_flight and in_flight[0][0] <= now:
+            arrived.append(heapq.heappop(in_flight)[2])
+
+        return arrived
+
+    def get_next_arrival(self) -> Optional[float]:
+        "When the next packet arrives. `None` if there are no packets in flight"
+        return self.in_flight[0][0] if self.in_flight else None
+
+    def has_packets(self) -> bool:
+        return len(self.in_flight) > 0
+
+class SimulatedSocket:
+    """
+    A socket wrapper that sends packets through a simulated link. Everything except sending goes straight to
+    the wrapped socket. Sent packets are held until they arrive, so `flush` should be called regularly (the
+    network actors do it when ticking)
+
+    The time is taken from the provided clock, which can be replaced with a manual one to make the simulation
+    independent from the real time
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        conditions: NetworkConditions,
+        seed: int = 0,
+        clock: Callable[[], float] = perf_counter
+    ):
+        self.sock = sock
+        self.conditions = conditions
+        self.seed = seed
+        self.clock = clock
+
+        self.links: dict[tuple[str, int], LinkSimulator] = {}
+        "Every destination has its own link, seeded by the order they were first sent to"
+
+    def _get_link(self, addr: tuple[str, int]) -> LinkSimulator:
+        link = self.links.get(addr)
+        if link is None:
+            link = self.links[addr] = LinkSimulator(self.conditions, self.seed + len(self.links))
+
+        return link
+
+    def sendto(self, data: bytes, addr: tuple[str, int]) -> int:
+        self._get_link(addr).submit(self.clock(), bytes(data))
+        return len(data)
+
+    def flush(self):
+        "Actually send all packets that have arrived by now"
+
+        now = self.clock()
+        for addr, link in self.links.items():
+            for packet in link.poll(now):
+                try:
+                    self.sock.sendto(packet, addr)
+                except OSError:
+                    # The same as the actors themselves, we ignore errors like unreachable addresses
+                    pass
+
+    def __getattr__(self, name: str):
+        return getattr(self.sock, name)
+
+class NetworkRelay:
+    """
+    A UDP proxy between clients and a server, that simulates the network conditions in both directions.
+    Every client gets its own socket towards the server, so the server sees them as different addresses
+    """
+
+    RECV_BYTES = 2048
+
+    def __init__(
+        self,
+        addr: tuple[str, int],
+        target: tuple[str, int],
+        upstream: NetworkConditions,
+        downstream: NetworkConditions,
+        seed: int = 0,
+        clock: Callable[[], float] = perf_counter
+    ):
+        """
+        Upstream conditions are for packets from clients to the server, and downstream ones are for
+        packets from the server to clients
+        """
+        self.target = target
+        self.upstream = upstream
+        self.downstream = downstream
+        self.seed = seed
+        self.clock = clock
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(addr)
+        self.sock.setblocking(False)
+        self.addr = self.sock.getsockname()
+
+        self.clients: dict[tuple[str, int], tuple[socket.socket, LinkSimulator, LinkSimulator]] = {}
+        "Client addresses to their sockets towards the server, and their upstream and downstream links"
+        self.client_socks: dict[socket.socket, tuple[str, int]] = {}
+
+    def get_addr(self) -> tuple[str, int]:
+        "The address clients should connect to"
+        return self.addr
+
+    def _get_client(self, addr: tuple[str, int]) -> tuple[socket.socket, LinkSimulator, LinkSimulator]:
+        client = self.clients.get(addr)
+        if client is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.addr[0], 0))
+            sock.setblocking(False)
+
+            # Every client gets 2 links with their own seeds, in the order they have appeared
+            seed = self.seed + len(self.clients)*2
+            client = self.clients[addr] = (
+                sock,
+                LinkSimulator(self.upstream, seed),
+                LinkSimulator(self.downstream, seed+1)
+            )
+            self.client_socks[sock] = addr
+
+        return client
+
+    def _receive(self, sock: socket.socket) -> list[tuple[bytes, tuple[str, int]]]:
+        received = []
+        while True:
+            try:
+                received.append(sock.recvfrom(NetworkRelay.RECV_BYTES))
+            except BlockingIOError:
+                return received
+            except OSError:
+                continue
+
+    def _send(self, sock: socket.socket, packet: bytes, addr: tuple[str, int]):
+        try:
+            sock.sendto(packet, addr)
+        except OSError:
+            pass
+
+    def tick(self):
+        "Receive everything on all sockets, and forward the packets that have arrived"
+
+        now = self.clock()
+
+        for packet, addr in self._receive(self.sock):
+            self._get_client(addr)[1].submit(now, packet)
+
+        for sock, client_addr in self.client_socks.items():
+            for packet, addr in self._receive(sock):
+                if addr == self.target:
+                    self.clients[client_addr][2].submit(now, packet)
+
+        for client_addr, (sock, upstream, downstream) in self.clients.items():
+            for packet in upstream.poll(now):
+                self._send(sock, packet, self.target)
+            for packet in downstream.poll(now):
+                self._send(self.sock, packet, client_addr)
+
+    def get_next_arrival(self) -> Optional[float]:
+        "When the next packet should be forwarded. `None` if there are no packets in flight"
+
+        arrivals = [
+            arrival
+            for _, upstream, downstream in self.clients.values()
+            for arrival in (upstream.get_next_arrival(), downstream.get_next_arrival())
+            if arrival is not None
+        ]
+
+        return min(arrivals, default=None)
+
+    def run(self, poll_timeout: float = 0.1):
+        "Relay packets until interrupted, sleeping until either a packet is received or has to be forwarded"
+
+        while True:
+            timeout = poll_timeout
+            next_arrival = self.get_next_arrival()
+            if next_arrival is not None:
+                timeout = min(timeout, max(next_arrival - self.clock(), 0))
+
+            select.select((self.sock, *self.client_socks), (), (), timeout)
+            self.tick()
+
+    def close(self):
+        for sock in self.client_socks:
+            sock.close()
+
+        self.sock.close()
@@ -17,35 +17,42 @@ The solution we use here is extremely simple: before constructing a packet, we g
 insert it at the start: `[hash][data]`. The idea is, that a corrupted packet has almost non-existent chance of getting 
 through and still passing the checksum check if it was corrupted, which is ideal for us.
 
+The hash is computed over the packet's data first, and its header (sequence ID and type) gets folded in after.
+This way the same message sent to multiple connections (see `HighUDPServer.multicast`) only gets its data hashed
+once, even if every connection gives it a different sequence ID.
+
 ### Reliability
 The basic idea behind reliability is that we bind a unique sequence ID to every single packet we send.
 Then, we wait from the end-receiver for the acknowledgement packet. Acknowledgement packets are unreliable on their
 own, so they can as well fail to get delievered. So, the basic approach is to simply resend this acknowledgement
 again back.
 
-When, we have received our acknowledgement - we will register that seq ID as received. Because we maintain a large
-queue - we will not be able to remove it immediately. BUT, when we DO encounter the packet that was acknowledged - 
-we will just ignore it, and send any other packet
+When, we have received our acknowledgement - we will remove that seq ID from the unacknowledged ones. Because we
+maintain a large queue - we will not be able to remove the packet immediately. BUT, when we DO encounter the packet
+that was acknowledged - we will just ignore it, and send any other packet. Unacknowledged IDs are tracked exactly
+(not in a sequence window), since an acknowledgement can arrive long after newer ones, and it still has to count
 
 ### Dublicates
 It's not common to receive dublicate packets, especially when solving the reliability problem, as it requires
-one to resend the same packet multiple times. For this exact purpose we have a separate rotating set, but now
+one to resend the same packet multiple times. For this exact purpose we have a separate set, but now
 for received packets by us.
 When we encounter a new packet - we register it in this rotating set and send an acknowledgement. 
 If we encounter the same packet again - we acknowledge it again, but don't return its data to the end-user
 using this framework (because they don't need dublicates).
 
-### Rotating sets
-In this networking scheme we're using "rotating sets". These are sets that simply get rotated. The essential problem
-they solve is as follows: imagine a long connection with over thousands of packets sent and recived. The sequence
-ID is not infinite, and thus will need to wrap around one day. BUT, how? If all our acknowledged packets are still
-bound to it? Well, that's the point of the rotating set - it only keeps the most relevant items in it. Internally
-it achieves it with a large queue of N items. Every insertion will shift this queue to the left, adding the most
-relevant item to the right. Upon filling up the N available space - it's going to remove from its set all the items
-on the left side of the queue (with every insertion). This way, we only keep the entry that we need.
+### Sequence windows
+In this networking scheme we're using "sequence windows". The essential problem they solve is as follows: imagine
+a long connection with over thousands of packets sent and recived. The sequence ID is not infinite, and thus will
+need to wrap around one day. BUT, how? If all our acknowledged packets are still bound to it? Well, that's the point
+of the sequence window - it only keeps the most relevant IDs in it. Internally it's a ring of flags indexed by
+`seq % N`, and every time a newer ID gets inserted - the window slides forward, clearing the slots it skips.
+Comparisons between IDs are wraparound-aware, so ID 1 is correctly considered newer than ID 65535.
 
-A rotating set of thousands item is already enough for most cases, as it's not heavy on memory, while also keeps
-only the most relevant around.
+Received packets are the exception though. A window would have to guess about IDs that fell behind it - and a
+resend cycle can easily take longer than the window (large messages are split into hundreds of fragments). A packet
+that is acknowledged without its data being delivered is lost forever, so received IDs are tracked exactly instead.
+Reliable IDs are dense (every single one of them is used), so it's enough to remember the oldest ID we're still
+missing, and the few IDs that arrived after it (see `SequenceTracker`).
 
 ### Connection
 Since UDP doesn't understand the concept of a "connection" (it only throws messages in people's faces), we need
@@ -64,11 +71,88 @@ and thus we can end our communication.
 For a disconnection, we can either send a `Disconnection` message to end our communications immediately, or... we can
 just quit until the hearbeat thing fires... yes, that should do the trick
 
+### Round trip time
+Every connection also measures how long it takes for a packet to go to the other end and back. Once in a while 
+(`PING_RATE`) it sends an unreliable `Ping` packet with its own send time, and the other end immediately echoes it
+back in a `Pong` packet. When the echo arrives - the difference with the current time is a single sample. Samples 
+are smoothed like TCP does it (an exponential moving average), as a single sample can be delayed by anything. The 
+time the other end takes to tick is included, which is what the game on top of it actually experiences anyway.
+Both packets are tiny and rare, so they're sent right away instead of waiting in the queue behind other packets
+
+### Statistics
+Every connection counts what goes through it (see `ConnectionStats`): bytes and packets in both directions, reliable
+packets sent again, dublicates and the current depth of its queue. Pings double as a loss estimate - a ping that
+wasn't echoed by the time the next one is sent counts as lost (either way), and the result is smoothed the same
+way as the round trip time. Datagrams that fail the checksum can't be trusted to belong to anyone, so they're
+counted by the socket's owner (the server or the client) instead
+
+### Fragmentation
+A single packet can't be larger than `BYTES_PER_MESSAGE`, because larger datagrams get fragmented by the IP layer,
+and losing a single IP fragment loses the entire datagram. So instead, reliable messages larger than this limit
+get split by us into numbered fragments: `[group][group][index][count][chunk...]`. Every fragment is an ordinary
+reliable packet (with its own sequence ID and acknowledgement), so lost fragments get resent individually.
+
+The receiving side collects fragments of the same group into a buffer, and once all of them are present - joins
+them back into the original message. The amount of buffers per connection is bounded, so a misbehaving end can't
+make us hold onto endless amounts of partial messages. When there's no space for a new group - its fragments simply
+don't get acknowledged, thus the sender will retry them later. Fragments are acknowledged only once they're stored,
+and the sender resends the missing ones until they arrive, so a live group always makes progress. A buffer that hasn't
+received anything for `FRAGMENT_GROUP_TIMEOUT` can't complete anymore though (its sender is gone), so it gives its
+place to new groups. The same goes for a buffer whose group ID got reused by a different message.
+
+### Channels
+By default, reliable messages are "reliable unordered": they're guaranteed to arrive, but in any order. Messages
+that need more guarantees can be sent over numbered channels instead. Every channel has its own mode (see 
+`ChannelMode`) and its own sequence of channel IDs, which is appended at the end of the message: 
+`[data...][channel][channel seq][channel seq]`. Channels are configured per actor (both ends should use the
+same ones), and the channel zero (`DEFAULT_CHANNEL`) is the plain unordered one that doesn't need any trailer.
+
+Reliable ordered channels buffer messages that arrive early until the missing ones arrive, and deliver them all
+at once. Since every channel has its own sequence - a message that waits for a resend only blocks the messages
+of its own channel. The buffer is bounded: when it's full - new early messages don't get acknowledged, so they
+get resent later.
+
+### Compression
+Large messages can be compressed with zlib before being framed (the compression is picked per message). Since they're
+mostly tightly packed binary data, zlib alone doesn't do much for them, so the compressor is primed with a preset
+dictionary of typical payloads (both sides should use the same one, see `MessageCompressor`). A message is only sent 
+compressed when it's actually smaller that way, and compressed messages have their own packet types (the compressed
+variants of `Message`, `ChannelMessage` and `Fragment`). Messages get compressed as a whole before fragmentation,
+so a compressed message takes fewer fragments.
+
+### Rooms
+A single server socket can host multiple independent sessions, called rooms. A room looks exactly like a server
+to its user (it has its own connections, received messages, connection limits and callbacks), but all rooms
+share the socket of the server that opened them. When a connection request arrives - the server picks a room for
+it (either the one explicitly requested by the client, or the first one that accepts connections), and from
+then on all messages of this connection get routed to that room only.
+
+### Sharding
+A single server socket means that all packets are processed by a single process. On platforms that support 
+`SO_REUSEPORT` (Linux) multiple sharded servers (in different processes) can bind to the exact same address,
+and the kernel will split incoming packets between them. The split is done by hashing the source and destination
+addresses of a packet, so all packets of the same client always land on the same server - the one that has 
+accepted its connection. This only holds while the set of servers on that address stays the same, so sharded
+servers are supposed to live for as long as the whole group does.
+
+Since the kernel picks the server by the client's address, a client can't choose which sharded server it lands on.
+That's a problem for rooms: a client that asks for a specific room would end up on a random server, which doesn't
+have it. So sharded session hosts don't accept connections on the shared address at all. Every one of them hosts its
+rooms on its own address, and listens on the shared one with a `ShardEntrance`, which answers connection requests
+with a redirect to the address of the server that owns the requested room (or to its own server, if the client
+doesn't care about the room). The owning server is encoded in the upper bits of room IDs (see `get_room_shard`),
+so room IDs are unique within the whole group.
+
 ### Congestion control
 For congestion control we set up an initial amount of bytes we can send per tick. This means that per fixed tick,
 we absolutely can send multiple packets at the same time if we have them. This is a really simple congestion control
 however
 
+When congested, unsent messages wait in the queue. For unreliable messages that only carry the latest state this
+means stale states being delivered late, one after another. Such messages can be queued under a supersession key:
+a newer message under the same key takes the place of the older one that's still waiting, so the queue holds at
+most one message per key, and it's always the freshest one.
+
 ## Special sequence IDs
 Due to my laziness, I decided to maintain both packet types in the same message queue. This essentially means that
 all packets are treated equally, though at expense of 1 additional byte on transfer.
@@ -80,17 +164,26 @@ I'm going to come up with a separate structure for both.
 
 from typing import Optional, Callable, Iterable, Union
 
-from .circleset import CircleSet
+from .seqwindow import SequenceWindow, SequenceTracker, sequence_greater_than
+from .netsim import NetworkConditions, SimulatedSocket
 from collections import deque
 
 from platform import system as device_system
 from subprocess import run as run_process
 
 from enum import Enum, auto
+from itertools import count
 
 import socket
+import struct
+import zlib
+import select
+import asyncio
+import threading
 import random as rnd
 
+from time import perf_counter
+
 WRAP_IDS = 2**16
 
 BASE_UDP_HEADER_SIZE = 32
@@ -105,12 +198,75 @@ BYTE_ORDER = "little"
 BYTES_PER_MESSAGE = 1024
 """
 Because fragmentation can occur on large amounts of data - we're limiting here the amount of bytes we can send to this number.
-(Also I don't want to work on fragmentation anyway)
+Larger reliable messages get split into our own fragments instead (see the fragmentation section)
 """
 
+FRAGMENT_HEADER_SIZE = 4
+"`[group][group][index][count]`"
+
+FRAGMENT_CHUNK_SIZE = BYTES_PER_MESSAGE - FRAGMENT_HEADER_SIZE
+"The amount of message bytes a single fragment can carry, so that the fragment itself fits into `BYTES_PER_MESSAGE`"
+
+MAX_FRAGMENTS = 255
+"The fragment count is a single byte"
+
+MAX_FRAGMENTED_MESSAGE = FRAGMENT_CHUNK_SIZE * MAX_FRAGMENTS
+"The largest message that can be sent using fragmentation (almost 255KB)"
+
+MAX_FRAGMENT_GROUPS = 8
+"How many partially received messages a connection can hold at the same time"
+
+FRAGMENT_GROUP_TIMEOUT = 30
+"""
+If a partially received message doesn't get any new fragments in this amount of seconds - it can be discarded to make
+space for new ones. It's way longer than it takes to resend every fragment of `MAX_FRAGMENT_GROUPS` messages
+"""
+
+PACKET_HEADER = struct.Struct("<IHB")
+"The packet header: `[hash: 4][seq: 2][ty: 1]`, in `BYTE_ORDER` (little endian)"
+PACKET_HASH = struct.Struct("<I")
+
+DEFAULT_CHANNEL = 0
+"The channel messages are sent over unless told otherwise. It's unordered, and reliability is picked per message"
+
+CHANNEL_TRAILER = struct.Struct("<BH")
+"The trailer of channel messages: `[channel: 1][channel seq: 2]` (see the channels section)"
+
+MAX_CHANNELS = 255
+"The channel is a single byte, and the zero is the default channel"
+
+MAX_ORDERED_BUFFER = 64
+"How many early messages a reliable ordered channel can hold, while waiting for the missing ones"
+
+MIN_COMPRESSED_SIZE = 64
+"Messages smaller than this aren't worth compressing"
+
+COMPRESSION_LEVEL = 6
+
+PING_TIMESTAMP = struct.Struct("<d")
+"The payload of ping and pong packets: the time (from `time.perf_counter`) the ping was sent at"
+
+RTT_SMOOTHING = 1/8
+"How much a new round trip time sample changes the smoothed one (the same as in TCP)"
+
+LOSS_SMOOTHING = 1/8
+"How much every ping changes the smoothed loss estimate"
+
 RECV_BYTES = BYTES_PER_MESSAGE+64 
 # Sorry for the magic number, we're just compensating for headers and other possible garbage
 
+RECV_BATCH_SIZE = 64
+"How many datagrams are received into preallocated buffers before getting parsed"
+
+SEQUENCE_WINDOW_SIZE = 1024
+"How many of the latest sequence IDs a connection remembers for dublicate detection (and counting resends)"
+
+ROOM_SHARD_BITS = 6
+"How many upper bits of a (2 byte) room ID are reserved for the index of its server in a sharded group"
+
+MAX_SHARDS = 2**ROOM_SHARD_BITS
+ROOMS_PER_SHARD = 2**(16 - ROOM_SHARD_BITS)
+
 _global_loss_rate = 0
 _global_dublicates_rate = 0
 _global_corruption_rate = 0
@@ -145,12 +301,15 @@ def reset_unreliability():
     _global_dublicates_rate = 0
     _global_loss_rate = 0
 
-def fnv1_hash(data: bytes) -> int: 
-    "This is a Fowler-Noll-Vo hash function. For curious: python's `hash` uses a different salt every session, so it's unstable"
-    FNV_PRIME = 0x100000001B3
-    FNV_OFFSET =  0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+FNV_OFFSET =  0xCBF29CE484222325
+
+def fnv1_hash(data: bytes, ret_hash: int = FNV_OFFSET) -> int: 
+    """
+    This is a Fowler-Noll-Vo hash function. For curious: python's `hash` uses a different salt every session, so it's unstable.
+    Hashing can be continued from a previous hash, which is the same as hashing both parts together
+    """
 
-    ret_hash = FNV_OFFSET
     for byte in data:
         ret_hash = ((ret_hash * FNV_PRIME) ^ byte) & 0xFFFFFFFF
 
@@ -176,21 +335,36 @@ def get_current_ip() -> str:
     else:
         return socket.gethostbyname(socket.gethostname())
 
+def supports_sharding() -> bool:
+    "Can multiple server sockets share the same address on this platform? (see the sharding section)"
+    return hasattr(socket, "SO_REUSEPORT")
+
+def get_room_shard(room_id: int) -> int:
+    "The index of the sharded server that owns this room (always 0 for servers that aren't sharded)"
+    return room_id >> (16 - ROOM_SHARD_BITS)
+
 def make_async_socket(
     addr: tuple[str, int], 
     broadcaster: bool = False,
-    shared: bool = False
+    shared: bool = False,
+    sharded: bool = False
 ) -> socket.socket:
     """
     This function simply creates a new non-blocking UDP socket:
     - `addr`: the address on which create and bind this socket
     - `broadcaster`: can this socket send broadcasts? `True` if yes
     - `shared`: can this socket's address be reused? `True` if yes
+    - `sharded`: can multiple sockets (usually from different processes) listen on this address at the same time?
+    The system will split incoming packets between them (see the sharding section). Requires `SO_REUSEPORT`
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, shared)
 
+    if sharded:
+        assert supports_sharding(), "Sharded sockets require SO_REUSEPORT, which isn't supported on this platform"
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, True)
+
     sock.bind(addr)
     sock.setblocking(False)
 
@@ -224,10 +398,57 @@ class PacketType(Enum):
     It's still sent once via unreliable channel, so it's more of a higher chance.
     """
 
-def open_packet(b: bytes) -> Optional[tuple[int, PacketType, bytes]]:
-    "Tries opening a packet, and if succesful - returns its sequence ID, type and data"
+    Fragment = auto()
+    "A part of a large reliable message. See the fragmentation section"
+
+    ChannelMessage = auto()
+    "A data packet sent over a numbered channel. See the channels section"
+
+    CompressedMessage = auto()
+    "The same as `Message`, but its data is compressed. See the compression section"
+
+    CompressedChannelMessage = auto()
+    "The same as `ChannelMessage`, but its data (without the channel trailer) is compressed"
+
+    CompressedFragment = auto()
+    "A fragment of a compressed message"
+
+    Ping = auto()
+    "A request to echo the send time back. See the round trip time section"
 
-    assert len(b) >= 4+2+1, "[hash][hash][hash][hash][seq][seq][ty]...[data], not enough bytes!"
+    Pong = auto()
+    "The echoed `Ping` packet"
+
+    ConnectionRedirect = auto()
+    "The server asks the client to send its connection request to another port instead. See the sharding section"
+
+class ChannelMode(Enum):
+    Unreliable = auto()
+    "Messages can get lost, dublicated or arrive in any order"
+
+    UnreliableSequenced = auto()
+    "Messages can get lost, and messages that arrive after newer ones get dropped"
+
+    ReliableUnordered = auto()
+    "Messages are guaranteed to arrive, but in any order"
+
+    ReliableOrdered = auto()
+    "Messages are guaranteed to arrive, and in the same order they were sent"
+
+    def is_reliable(self) -> bool:
+        return self in (ChannelMode.ReliableUnordered, ChannelMode.ReliableOrdered)
+
+def open_packet(b: Union[bytes, memoryview]) -> Optional[tuple[int, PacketType, bytes]]:
+    """
+    Tries opening a packet, and if succesful - returns its sequence ID, type and data.
+    
+    The packet can be a memoryview over a receive buffer, in which case the header is parsed directly from the
+    buffer, and only the data itself gets copied out (as the buffer will be reused for the next packets)
+    """
+
+    if len(b) < 4+2+1:
+        # [hash][hash][hash][hash][seq][seq][ty]...[data], not enough bytes!
+        return
 
     data = b[4:]
     message_hash = int.from_bytes(b[:4], BYTE_ORDER)
@@ -239,21 +460,107 @@ def open_packet(b: bytes) -> Optional[tuple[int, PacketType, bytes]]:
     except ValueError:
         return
 
-    if message_hash != fnv1_hash(data):
+    if message_hash != fnv1_hash(data[:3], fnv1_hash(data[3:])):
         # The signatures should pass
         return
 
-    return message_id, message_ty, data[3:]
+    return message_id, message_ty, bytes(data[3:])
         
+class PacketWriter:
+    """
+    Builds packets in place, in a reusable buffer. The payload gets written right after the space reserved for
+    the packet header, and when finishing the packet - the header and the hash are written in front of it
+    (the hash is computed over a view of the buffer). This way building a packet doesn't concatenate anything,
+    and the only allocation is the finished packet itself.
+
+    The same payload can be finished multiple times (with different headers).
+    """
+    def __init__(self, capacity: int = RECV_BYTES):
+        self.buffer = bytearray(capacity)
+        self.offset = PACKET_HEADER.size
+
+    def reset(self):
+        "Start writing a new payload"
+        self.offset = PACKET_HEADER.size
+
+    def _reserve(self, size: int):
+        if self.offset + size > len(self.buffer):
+            self.buffer.extend(bytes(max(size, len(self.buffer))))
+
+    def write(self, data: bytes):
+        size = len(data)
+        self._reserve(size)
+
+        self.buffer[self.offset:self.offset+size] = data
+        self.offset += size
+
+    def write_byte(self, value: int):
+        self._reserve(1)
+
+        self.buffer[self.offset] = value
+        self.offset += 1
+
+    def pack(self, format_struct: struct.Struct, *values):
+        "Pack the values right into the buffer"
+        self._reserve(format_struct.size)
+
+        format_struct.pack_into(self.buffer, self.offset, *values)
+        self.offset += format_struct.size
+
+    def get_payload_size(self) -> int:
+        return self.offset - PACKET_HEADER.size
+
+    def get_payload(self) -> memoryview:
+        "A view over the written payload. Only valid until the next write"
+        return memoryview(self.buffer)[PACKET_HEADER.size:self.offset]
+
+    def hash_payload(self) -> int:
+        "The hash of the written payload. It can be reused when finishing the same payload multiple times"
+        with self.get_payload() as payload:
+            return fnv1_hash(payload)
+
+    def finish(
+        self, 
+        seq_id: int, 
+        ty: PacketType, 
+        payload_hash: Optional[int] = None, 
+        channel: Optional[tuple[int, int]] = None
+    ) -> bytes:
+        """
+        Write the packet header in front of the payload, and return the finished packet.
+        Channel messages also get the channel and its sequence ID written after the payload (see the channels section)
+        """
+
+        if payload_hash is None:
+            payload_hash = self.hash_payload()
+
+        end = self.offset
+        if channel is not None:
+            self._reserve(CHANNEL_TRAILER.size)
+            CHANNEL_TRAILER.pack_into(self.buffer, end, *channel)
+
+            with memoryview(self.buffer) as view:
+                payload_hash = fnv1_hash(view[end:end+CHANNEL_TRAILER.size], payload_hash)
+            end += CHANNEL_TRAILER.size
+
+        PACKET_HEADER.pack_into(self.buffer, 0, 0, seq_id, ty.value)
+
+        with memoryview(self.buffer) as view:
+            PACKET_HASH.pack_into(self.buffer, 0, fnv1_hash(view[PACKET_HASH.size:PACKET_HEADER.size], payload_hash))
+            return bytes(view[:end])
+
 def make_reliable_packet(id: int, ty: PacketType, data: bytes) -> bytes:
-    packet_id = id.to_bytes(2, BYTE_ORDER)
-    packet_ty = ty.value.to_bytes(1, BYTE_ORDER)
+    "Construct a packet in a single buffer (see `PacketWriter` for packets built from multiple parts)"
 
-    packet = packet_id + packet_ty + data
-    packet_hash = fnv1_hash(packet)
-    packet_hash = packet_hash.to_bytes(4, BYTE_ORDER)
+    packet = bytearray(PACKET_HEADER.size + len(data))
+    packet[PACKET_HEADER.size:] = data
 
-    return packet_hash + packet
+    PACKET_HEADER.pack_into(packet, 0, 0, id, ty.value)
+
+    with memoryview(packet) as view:
+        PACKET_HASH.pack_into(packet, 0, fnv1_hash(view[PACKET_HASH.size:PACKET_HEADER.size], fnv1_hash(data)))
+
+    return bytes(packet)
 
 def make_unreliable_packet(ty: PacketType, data: bytes) -> bytes:
     "The same as `make_reliable_packet`, but it simply sets its sequence ID as a zero"
@@ -266,37 +573,186 @@ def make_acknowledgement_packet(seq_id: int) -> bytes:
 def make_heartbeat_packet() -> bytes:
     return make_unreliable_packet(PacketType.Heartbeat, bytes())
 
-def make_connection_request_packet() -> bytes:
-    return make_unreliable_packet(PacketType.ConnectionRequest, bytes())
+def make_connection_request_packet(room_id: Optional[int] = None) -> bytes:
+    "A connection request can optionally ask for a specific room on the server"
+    room = bytes() if room_id is None else room_id.to_bytes(2, BYTE_ORDER)
+    return make_unreliable_packet(PacketType.ConnectionRequest, room)
 
 def make_connection_response_packet(accept: bool) -> bytes:
     return make_unreliable_packet(PacketType.ConnectionResponse, bytes([accept]))
 
+def make_connection_redirect_packet(port: int) -> bytes:
+    return make_unreliable_packet(PacketType.ConnectionRedirect, port.to_bytes(2, BYTE_ORDER))
+
 def make_broadcast_packet(data: bytes) -> bytes:
     return make_unreliable_packet(PacketType.Broadcast, data)
 
 def make_disconnection_packet() -> bytes:
     return make_unreliable_packet(PacketType.Disconnection, b"")
 
-def receive_packets(sock: socket.socket, message_size: int) -> Iterable[tuple[tuple[int, int, bytes], tuple[str, int]]]:
+def make_ping_packet(sent_at: float) -> bytes:
+    return make_unreliable_packet(PacketType.Ping, PING_TIMESTAMP.pack(sent_at))
+
+def make_pong_packet(ping_data: bytes) -> bytes:
+    return make_unreliable_packet(PacketType.Pong, ping_data)
+
+def make_fragments(group_id: int, data: bytes) -> Iterable[bytes]:
+    "Split the provided message into fragment payloads (without the packet header)"
+
+    count = (len(data) + FRAGMENT_CHUNK_SIZE - 1) // FRAGMENT_CHUNK_SIZE
+    assert count <= MAX_FRAGMENTS, f"The message exceeds the {MAX_FRAGMENTED_MESSAGE} byte limits"
+
+    group = group_id.to_bytes(2, BYTE_ORDER)
+    for index in range(count):
+        chunk = data[index*FRAGMENT_CHUNK_SIZE:(index+1)*FRAGMENT_CHUNK_SIZE]
+        yield group + bytes((index, count)) + chunk
+
+def open_fragment(data: bytes) -> Optional[tuple[int, int, int, bytes]]:
+    "Parse a fragment payload into its group ID, index, count and chunk. Returns `None` if it's malformed"
+
+    if len(data) < FRAGMENT_HEADER_SIZE:
+        return
+
+    group_id = int.from_bytes(data[:2], BYTE_ORDER)
+    index, count = data[2], data[3]
+
+    if count == 0 or index >= count:
+        return
+
+    return group_id, index, count, data[FRAGMENT_HEADER_SIZE:]
+
+class DatagramReceiver:
     """
-    An iterator over socket's received packets. Essentially, it will try to receive as many packets as it can
-    until hitting the `BlockingIOError` exception. If a packet is invalid (for example it contains corrupted data) - 
-    it will not get returned.
+    Receives datagrams in batches into a preallocated pool of buffers, instead of allocating a new bytes
+    object for every single datagram. Datagrams are parsed through memoryviews over these buffers, so the
+    only allocation per packet is its final data.
+
+    Python's standard library doesn't expose `recvmmsg`, so a batch here is a tight loop of `recvfrom_into`
+    calls, which still saves us the allocations and lets us parse a whole batch in one go.
     """
+    def __init__(self, message_size: int, batch_size: int = RECV_BATCH_SIZE):
+        self.buffers = tuple(bytearray(message_size) for _ in range(batch_size))
+        self.views = tuple(memoryview(buffer) for buffer in self.buffers)
 
-    while True:
-        try:
-            data, addr = sock.recvfrom(message_size)
-            if (packet := open_packet(data)) is not None:
-                yield packet, addr
-        except BlockingIOError:
-            break
-        except OSError:
-            # This is extremely dangerous, but we'll avoid all OS errors that we'll receive.
-            # In particular, we're avoiding the buffer-to-small errors, completely discarding any packets.
-            # Overall you can bash me for this, since this is a really stupid solution.
-            continue
+        self.sizes: list[int] = [0] * batch_size
+        self.addrs: list[tuple[str, int]] = [None] * batch_size
+
+        self.corrupted = 0
+        "The amount of received datagrams that weren't valid packets (see the statistics section)"
+
+    def _receive_batch(self, sock: socket.socket) -> tuple[int, bool]:
+        """
+        Fill as many buffers as possible. Returns the amount of received datagrams and whether the socket
+        has no more datagrams left
+        """
+        received = 0
+        batch_size = len(self.buffers)
+        recv_into = sock.recvfrom_into
+
+        while received < batch_size:
+            try:
+                self.sizes[received], self.addrs[received] = recv_into(self.buffers[received])
+                received += 1
+            except BlockingIOError:
+                return received, True
+            except OSError:
+                # This is extremely dangerous, but we'll avoid all OS errors that we'll receive.
+                # In particular, we're avoiding the buffer-to-small errors, completely discarding any packets.
+                # Overall you can bash me for this, since this is a really stupid solution.
+                continue
+
+        return received, False
+
+    def receive_packets(self, sock: socket.socket) -> Iterable[tuple[tuple[int, PacketType, bytes], tuple[str, int]]]:
+        """
+        An iterator over socket's received packets. Essentially, it will try to receive as many packets as it can
+        until hitting the `BlockingIOError` exception. If a packet is invalid (for example it contains corrupted data) - 
+        it will not get returned.
+        """
+        views, sizes, addrs = self.views, self.sizes, self.addrs
+
+        while True:
+            received, drained = self._receive_batch(sock)
+
+            for i in range(received):
+                if (packet := open_packet(views[i][:sizes[i]])) is not None:
+                    yield packet, addrs[i]
+                else:
+                    self.corrupted += 1
+
+            if drained:
+                break
+
+class ReceiverThread:
+    """
+    A background thread that continuously receives, validates and timestamps packets from a socket, so they
+    don't sit in the kernel buffer until the next tick. Received packets are put into a `deque` as
+    `(arrival_time, packet, addr)` tuples, which the owning thread consumes whenever it ticks. Appending and popping
+    from the different ends of a `deque` is thread-safe, so no locks are needed here.
+
+    Arrival times come from `time.perf_counter`.
+    """
+    POLL_TIMEOUT = 0.1
+    "How often the thread checks whether it should stop while there are no packets"
+
+    def __init__(self, sock: socket.socket, receiver: DatagramReceiver):
+        self.sock = sock
+        self.receiver = receiver
+
+        self.packets: deque[tuple[float, tuple[int, PacketType, bytes], tuple[str, int]]] = deque()
+
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        sock, packets = self.sock, self.packets
+
+        while self.running:
+            try:
+                ready, _, _ = select.select((sock, ), (), (), ReceiverThread.POLL_TIMEOUT)
+            except (OSError, ValueError):
+                # The socket was closed under us
+                break
+
+            if ready:
+                for packet, addr in self.receiver.receive_packets(sock):
+                    packets.append((perf_counter(), packet, addr))
+
+    def start(self):
+        assert not self.running, "The receiver thread is already running"
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="ReceiverThread", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        "Stop the thread and wait for it to finish. Any packets it has already received stay in the queue"
+        
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def is_running(self) -> bool:
+        return self.running
+
+class ServerDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    An asyncio protocol that feeds a `HighUDPServer` with packets the moment they arrive, instead of waiting
+    for the server to poll its socket. See `HighUDPServer.open_datagram_endpoint`
+    """
+    def __init__(self, server: "HighUDPServer"):
+        self.server = server
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]):
+        if (packet := open_packet(data)) is not None:
+            self.server._process_packet(addr, *packet, perf_counter())
+        else:
+            self.server.receiver.corrupted += 1
+
+    def error_received(self, exc: OSError):
+        # The same as in `DatagramReceiver`, we're ignoring all OS errors (like ICMP port unreachable on Windows)
+        pass
 
 def packet_sequence_counter(wrap_at: int):
     "A generator that produces packet sequence IDs."
@@ -326,35 +782,250 @@ class Timer:
         "Make this clock act immediately. Only usefil in specific cases"
         self.on_interval = 0
 
+class FragmentBuffer:
+    "Fragments of a single large message, collected until all of them are present"
+    def __init__(self, count: int):
+        self.chunks: list[Optional[bytes]] = [None] * count
+        self.missing = count
+
+        self.expires = Timer(FRAGMENT_GROUP_TIMEOUT, False)
+
+    def insert(self, index: int, chunk: bytes):
+        if self.chunks[index] is None:
+            self.missing -= 1
+        self.chunks[index] = chunk
+
+        self.expires.reset()
+
+    def fits(self, count: int) -> bool:
+        "Does a fragment with this fragment count belong to this buffer?"
+        return len(self.chunks) == count
+
+    def is_complete(self) -> bool:
+        return self.missing == 0
+
+    def assemble(self) -> bytes:
+        return b"".join(self.chunks)
+
+class MessageCompressor:
+    """
+    Compresses messages with zlib, primed with a preset dictionary. It's raw deflate without zlib's own header
+    and checksum, as packets are hashed anyway. Both sides of a connection should use the same dictionary
+    """
+    def __init__(self, zdict: bytes = b"", level: int = COMPRESSION_LEVEL):
+        options = {"zdict": zdict} if zdict else {}
+
+        # Priming with the dictionary isn't free, so we're priming once and copying the primed objects
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, **options)
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS, **options)
+
+    def compress(self, data: bytes) -> Optional[bytes]:
+        "Compress the message. `None` if it's not worth it (the message is too small, or it doesn't get smaller)"
+
+        if len(data) < MIN_COMPRESSED_SIZE:
+            return None
+
+        compressor = self.compressor.copy()
+        compressed = compressor.compress(data) + compressor.flush()
+
+        return compressed if len(compressed) < len(data) else None
+
+    def decompress(self, data: bytes) -> Optional[bytes]:
+        "Decompress the message. `None` if it's malformed, or if it decompresses into more than the largest possible message"
+
+        decompressor = self.decompressor.copy()
+        try:
+            message = decompressor.decompress(data, MAX_FRAGMENTED_MESSAGE)
+        except zlib.error:
+            return None
+
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            return None
+
+        return message
+
+class ChannelReceiver:
+    """
+    The receiving side of a numbered channel, which puts its messages in order (depending on its mode).
+    The message an ordered channel is waiting for is always accepted, so it can't get stuck - as long as
+    nobody acknowledges a packet without passing its message here
+    """
+    def __init__(self, mode: ChannelMode):
+        self.mode = mode
+
+        self.expected = 0
+        "The channel sequence ID of the next message we're waiting for"
+        self.buffer: dict[int, bytes] = {}
+        "Messages of an ordered channel that have arrived before the ones they follow"
+
+    def receive(self, channel_seq: int, message: bytes, force: bool = False) -> tuple[bool, list[bytes]]:
+        """
+        Returns whether the message was accepted (i.e. should be acknowledged), and all messages that can be
+        delivered now. Forced messages are always accepted, even when the buffer is full
+        """
+
+        if self.mode in (ChannelMode.Unreliable, ChannelMode.ReliableUnordered):
+            return True, [message]
+
+        if channel_seq != self.expected and not sequence_greater_than(channel_seq, self.expected, WRAP_IDS):
+            # It's either a dublicate, or it was outrun by newer messages
+            return True, []
+
+        if self.mode == ChannelMode.UnreliableSequenced:
+            self.expected = (channel_seq+1) % WRAP_IDS
+            return True, [message]
+
+        if channel_seq != self.expected:
+            if len(self.buffer) >= MAX_ORDERED_BUFFER and not force:
+                return False, []
+
+            self.buffer[channel_seq] = message
+            return True, []
+
+        delivered = [message]
+        self.expected = (self.expected+1) % WRAP_IDS
+
+        while self.expected in self.buffer:
+            delivered.append(self.buffer.pop(self.expected))
+            self.expected = (self.expected+1) % WRAP_IDS
+
+        return True, delivered
+
+class ConnectionStats:
+    """
+    What has gone through a connection (or multiple connections, when summed). All attributes are public, 
+    see the statistics section
+    """
+
+    COUNTERS = (
+        "bytes_sent", 
+        "packets_sent", 
+        "bytes_received", 
+        "packets_received", 
+        "resent", 
+        "dublicates", 
+        "corrupted"
+    )
+    "Attributes that only grow. Everything else is the current state"
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.packets_sent = 0
+        self.bytes_received = 0
+        self.packets_received = 0
+
+        self.resent = 0
+        "Reliable packets sent again, because their acknowledgements haven't arrived yet"
+        self.dublicates = 0
+        "Received reliable packets that were already received before"
+        self.corrupted = 0
+        "Received datagrams that weren't valid packets"
+
+        self.queue_depth = 0
+        "The amount of packets waiting in the queue after the last tick"
+
+        self.rtt: Optional[float] = None
+        "The smoothed round trip time in seconds, if it was measured at least once (see the round trip time section)"
+        self.loss = 0.0
+        "The smoothed fraction of pings that weren't echoed back"
+
+    def add(self, other: "ConnectionStats"):
+        "Add the counters and the queue depth of other stats to these ones"
+
+        for counter in ConnectionStats.COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+
+        self.queue_depth += other.queue_depth
+
+def sum_connection_stats(stats: Iterable[ConnectionStats]) -> ConnectionStats:
+    "Sum the stats of multiple connections. The round trip time and the loss are averaged instead"
+
+    total = ConnectionStats()
+    rtts, losses = [], []
+
+    for connection_stats in stats:
+        total.add(connection_stats)
+        losses.append(connection_stats.loss)
+
+        if connection_stats.rtt is not None:
+            rtts.append(connection_stats.rtt)
+
+    if rtts:
+        total.rtt = sum(rtts) / len(rtts)
+    if losses:
+        total.loss = sum(losses) / len(losses)
+
+    return total
+
 class HighUDPConnection:
     BYTES_PER_SECOND = 250_000 # Im being conservative here with 2Mbps or 250KB per second
     PACKETS_PER_SECOND = 200 # This is a pretty high number, so don't judge me! It's only a toy implementation!
 
     POSSIBLE_SILENCE_DURATION = 10 # It's possible to still have a persistent connection for 10 seconds in case of absense of heartbeat
     HEARTBEAT_RATE = 3.3 # Send a heartbeat every 3.3 seconds
+    PING_RATE = 1 # Measure the round trip time every second
+
+    def __init__(
+        self, 
+        sock: socket.socket, 
+        to_addr: tuple[str, int], 
+        label = "", 
+        channels: tuple[ChannelMode, ...] = (),
+        compressor: Optional[MessageCompressor] = None
+    ):
+        """
+        Channels are numbered from 1, in the order they're provided (see the channels section).
+        Without a compressor, messages are never compressed and compressed messages get dropped
+        """
+        assert len(channels) <= MAX_CHANNELS, f"A connection can only have up to {MAX_CHANNELS} channels"
 
-    def __init__(self, sock: socket.socket, to_addr: tuple[str, int], label = ""):
         self.connected_to = to_addr
         self.sock = sock
 
+        self.channels = channels
+        self.channel_counters = [0] * len(channels)
+        "The channel sequence IDs of the next messages sent over every channel"
+        self.channel_receivers = tuple(ChannelReceiver(mode) for mode in channels)
+
+        self.compressor = compressor
+
         self.id_counter = packet_sequence_counter(WRAP_IDS)
-        self.received_packets = CircleSet(1000)
+        self.fragment_group_counter = packet_sequence_counter(WRAP_IDS)
+
+        self.fragment_buffers: dict[int, FragmentBuffer] = {}
+        "Partially received large messages under their fragment group IDs"
+        self.received_packets = SequenceTracker(WRAP_IDS)
+        "Sequence IDs of all reliable packets we've received (reliable IDs start from 1, just like `id_counter`)"
 
-        self.acknowledged_packets = CircleSet(1000)
-        self.packet_queue: deque[tuple[int, bytes]] = deque()
+        self.unacknowledged_packets: set[int] = set()
+        """
+        Sequence IDs of reliable packets that are still waiting for their acknowledgements. Unlike a sequence window,
+        it doesn't forget old IDs, so a late acknowledgement of an old packet still stops it from being resent
+        """
+        self.sent_packets = SequenceWindow(SEQUENCE_WINDOW_SIZE, WRAP_IDS)
+        "Reliable packets that were sent at least once. Only used to count resends"
+        self.packet_queue: deque[tuple[int, bytes, Optional[int]]] = deque()
         """
-        This queue stores tuples with this data: (sequence_id, data, addr)
+        This queue stores tuples with this data: (sequence_id, packet, supersession key)
         We store the sequence ID, because all messages that are sent this way are reliable. We don't
         maintain any dictionaries - every message is immediately put at the end of the queue
-        when it's time to be sent. IF, however, the ID was already acknowledged in the set - the packet
-        gets ignored and doesn't get added to the end anymore.
+        when it's time to be sent. IF, however, the ID was already acknowledged (it's no longer among the
+        unacknowledged ones) - the packet gets ignored and doesn't get added to the end anymore.
         """
+        self.keyed_packets: dict[int, bytes] = {}
+        "The latest unsent packets under their supersession keys (see congestion control)"
 
         self.no_end_heartbeat = Timer(HighUDPConnection.POSSIBLE_SILENCE_DURATION, False)
         "The last packet received from the end-connection (be it heartbeat or any other packet)"
 
         self.next_self_heartbeat = Timer(HighUDPConnection.HEARTBEAT_RATE, False)
 
+        self.next_ping = Timer(HighUDPConnection.PING_RATE, True)
+        self.ping_sent_at: Optional[float] = None
+        "The timestamp of the last ping, if it wasn't echoed back yet"
+
+        self.stats = ConnectionStats()
+
         self.label = label
         "Labels help when debugging"
 
@@ -362,14 +1033,43 @@ class HighUDPConnection:
         "In a connection between address A and B (where A is our socket), this method returns the address of B"
         return self.connected_to
     
-    def _queue_message(self, seq_id: int, packet: bytes):
-        "Add this message to the queue. An internal method, as it requires ID assignment"
-        self.packet_queue.append((seq_id, packet))
+    def _queue_message(self, seq_id: int, packet: bytes, key: Optional[int] = None):
+        """
+        Add this message to the queue. An internal method, as it requires ID assignment.
+        Only unreliable messages can have a supersession key (see congestion control)
+        """
+
+        if key is not None:
+            assert seq_id == 0, "Only unreliable messages can be superseded"
+
+            superseded = key in self.keyed_packets
+            self.keyed_packets[key] = packet
+            if superseded:
+                # The new packet simply takes the place of the old one in the queue
+                return
+
+        if seq_id != 0:
+            self.unacknowledged_packets.add(seq_id)
+
+        self.packet_queue.append((seq_id, packet, key))
+
+    def _send_packets(self, packets: list[bytes]):
+        "Send a batch of packets in one go"
 
-    def _send_packet(self, data: bytes):
         # Reset our heartbeat, because we have sent a packet!
         self.next_self_heartbeat.reset()
-        self.sock.sendto(data, self.connected_to)
+
+        sendto, addr = self.sock.sendto, self.connected_to
+        sent_bytes = 0
+        for packet in packets:
+            sendto(packet, addr)
+            sent_bytes += len(packet)
+
+        self.stats.packets_sent += len(packets)
+        self.stats.bytes_sent += sent_bytes
+
+    def _send_packet(self, data: bytes):
+        self._send_packets((data, ))
 
     def disconnect(self):
         "Close this connection by also sending a disconnection packet"
@@ -379,18 +1079,107 @@ class HighUDPConnection:
 
         self.no_end_heartbeat.zero()
 
-    def queue_message(self, data: bytes, reliable: bool):
-        "This method will both send a message and register it to non-acknowledged dictionary"
-        assert len(data) <= BYTES_PER_MESSAGE, f"The message exceeds the {BYTES_PER_MESSAGE} byte limits"
+    def _next_channel_seq(self, channel: int, reliable: bool) -> int:
+        assert 0 < channel <= len(self.channels), f"Channel {channel} isn't configured"
+        assert reliable == self.channels[channel-1].is_reliable(), "The message reliability doesn't match its channel"
+
+        channel_seq = self.channel_counters[channel-1]
+        self.channel_counters[channel-1] = (channel_seq+1) % WRAP_IDS
+
+        return channel_seq
+
+    def queue_message(
+        self, 
+        data: bytes, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        """
+        This method will both send a message and register it to non-acknowledged dictionary.
+        Reliable messages larger than `BYTES_PER_MESSAGE` get split into fragments.
+        Unreliable messages can supersede their unsent predecessors under the same key.
+
+        Messages sent over numbered channels should have the same reliability as their channels.
+        Messages that should be compressed only get compressed when it saves bytes (see the compression section)
+        """
+
+        compressed = False
+        if compress and self.compressor is not None:
+            packed = self.compressor.compress(data)
+            if packed is not None:
+                data, compressed = packed, True
+
+        self._queue_data(data, reliable, key, channel, compressed)
+
+    def _queue_data(self, data: bytes, reliable: bool, key: Optional[int], channel: int, compressed: bool):
+        "Frame the message into a packet (or fragments). Compressed messages should already be compressed"
+
+        if channel != DEFAULT_CHANNEL:
+            ty = PacketType.CompressedChannelMessage if compressed else PacketType.ChannelMessage
+            data += CHANNEL_TRAILER.pack(channel, self._next_channel_seq(channel, reliable))
+        else:
+            ty = PacketType.CompressedMessage if compressed else PacketType.Message
+
+        if len(data) > BYTES_PER_MESSAGE:
+            assert reliable, f"The unreliable message exceeds the {BYTES_PER_MESSAGE} byte limits. Only reliable messages can get fragmented"
+
+            if channel == DEFAULT_CHANNEL:
+                # Assembled fragments always end with a channel trailer
+                data += CHANNEL_TRAILER.pack(DEFAULT_CHANNEL, 0)
+
+            self._queue_fragmented_message(data, PacketType.CompressedFragment if compressed else PacketType.Fragment)
+            return
 
         if reliable:
             new_id = next(self.id_counter)
-            packet = make_reliable_packet(new_id, PacketType.Message, data)
+            packet = make_reliable_packet(new_id, ty, data)
         else:
             new_id = 0
-            packet = make_unreliable_packet(PacketType.Message, data)
+            packet = make_unreliable_packet(ty, data)
+
+        self._queue_message(new_id, packet, key)
+
+    def queue_written_message(
+        self, 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        payload_hash: Optional[int] = None,
+        compress: bool = False
+    ):
+        """
+        The same as `queue_message`, but the message is framed right in the writer's buffer.
+        The payload hash can be provided when the same payload is sent to multiple connections
+        """
 
-        self._queue_message(new_id, packet)
+        trailer_size = 0 if channel == DEFAULT_CHANNEL else CHANNEL_TRAILER.size
+        payload_size = writer.get_payload_size()
+
+        if payload_size + trailer_size > BYTES_PER_MESSAGE or (
+            compress and self.compressor is not None and payload_size >= MIN_COMPRESSED_SIZE
+        ):
+            self.queue_message(bytes(writer.get_payload()), reliable, key, channel, compress)
+            return
+
+        new_id = next(self.id_counter) if reliable else 0
+
+        if channel == DEFAULT_CHANNEL:
+            packet = writer.finish(new_id, PacketType.Message, payload_hash)
+        else:
+            channel_seq = self._next_channel_seq(channel, reliable)
+            packet = writer.finish(new_id, PacketType.ChannelMessage, payload_hash, (channel, channel_seq))
+
+        self._queue_message(new_id, packet, key)
+
+    def _queue_fragmented_message(self, data: bytes, ty: PacketType = PacketType.Fragment):
+        group_id = next(self.fragment_group_counter)
+
+        for fragment in make_fragments(group_id, data):
+            new_id = next(self.id_counter)
+            self._queue_message(new_id, make_reliable_packet(new_id, ty, fragment))
 
     def _queue_heartbeat(self):
         self._queue_message(0, make_heartbeat_packet())
@@ -420,32 +1209,51 @@ class HighUDPConnection:
         # Some packets are large, so we need to ensure to send at least ONE per tick
         at_least_one = True
 
+        # All packets are collected first, and then sent as a single batch
+        outgoing: list[bytes] = []
+
         # We're swapping these 2 deques, because reliable packets will be added to the end again
         self.packet_queue, packet_queue = deque(), self.packet_queue
 
         while packet_queue and allowed_packet_amount > 0:
-            seq_id, packet = packet_queue.popleft()
-            if seq_id in self.acknowledged_packets:
+            seq_id, packet, key = packet_queue.popleft()
+            if seq_id != 0 and seq_id not in self.unacknowledged_packets:
                 continue
 
+            if key is not None:
+                # It might have been superseded by a newer one
+                packet = self.keyed_packets[key]
+
             packet_size = len(packet)
             if packet_size <= allowed_bytes or at_least_one:
                 at_least_one = False
                 allowed_bytes -= BASE_UDP_HEADER_SIZE + packet_size
                 allowed_packet_amount -= 1
 
-                self._send_packet(packet)
+                outgoing.append(packet)
+
+                if key is not None:
+                    del self.keyed_packets[key]
 
                 if seq_id != 0:
+                    if seq_id in self.sent_packets:
+                        self.stats.resent += 1
+                    else:
+                        self.sent_packets.add(seq_id)
+
                     # If sequence ID isn't zero - we're going to queue it again
                     self._queue_message(seq_id, packet)
             else:
                 # We don't have much more bandwidth, so we're putting it back for later
-                packet_queue.appendleft((seq_id, packet))
+                packet_queue.appendleft((seq_id, packet, key))
                 break
         
         # We need to join them back, as the packet queue might not be entirely consumed
         self.packet_queue = packet_queue+self.packet_queue
+        self.stats.queue_depth = len(self.packet_queue)
+
+        if outgoing:
+            self._send_packets(outgoing)
 
     def acknowledge_received_packet(self, seq_id: int):
         "The packet the receiver sent to us was received. This is important to avoid dublicates"
@@ -455,28 +1263,187 @@ class HighUDPConnection:
             self._queue_message(0, make_acknowledgement_packet(seq_id))
     
     def has_packet_been_received(self, seq_id: int) -> bool:
-        "A packet is received if it's ID is not 0 (unreliable), and it its ID is registered in the received database"
+        """
+        A packet is received if it's ID is not 0 (unreliable), and it its ID is registered in the received database
+        """
+        if seq_id == 0:
+            return False
+
         return seq_id in self.received_packets
 
+    def _receive_fragment(self, data: bytes) -> tuple[bool, Optional[bytes]]:
+        """
+        Put the fragment into its group's buffer. Returns whether the fragment was accepted (i.e. should be 
+        acknowledged), and the assembled message if this fragment was the last one missing
+        """
+        fragment = open_fragment(data)
+        if fragment is None:
+            # It's garbage, but acknowledging it is the only way to make the other side stop sending it
+            return True, None
+
+        group_id, index, count, chunk = fragment
+
+        buffer = self.fragment_buffers.get(group_id)
+        if buffer is None:
+            if len(self.fragment_buffers) >= MAX_FRAGMENT_GROUPS:
+                self._discard_expired_fragment_buffers()
+
+            if len(self.fragment_buffers) >= MAX_FRAGMENT_GROUPS:
+                # No space for a new message. We won't acknowledge it, so it will be resent later
+                return False, None
+
+            buffer = self.fragment_buffers[group_id] = FragmentBuffer(count)
+        elif not buffer.fits(count):
+            # The group ID has wrapped around, and the old message under it will never complete
+            buffer = self.fragment_buffers[group_id] = FragmentBuffer(count)
+
+        buffer.insert(index, chunk)
+
+        if buffer.is_complete():
+            del self.fragment_buffers[group_id]
+            return True, buffer.assemble()
+
+        return True, None
+
+    def _discard_expired_fragment_buffers(self):
+        "Discard partially received messages that haven't received anything for too long"
+
+        for group_id, buffer in tuple(self.fragment_buffers.items()):
+            if buffer.expires.has_finished():
+                del self.fragment_buffers[group_id]
+
+    def _decompress(self, data: bytes) -> Optional[bytes]:
+        return None if self.compressor is None else self.compressor.decompress(data)
+
+    def _receive_channel_message(
+        self, 
+        data: bytes, 
+        force: bool = False, 
+        compressed: bool = False
+    ) -> tuple[bool, list[bytes]]:
+        """
+        Pass the message to its channel. Returns whether the message was accepted (i.e. should be acknowledged),
+        and all messages that can be delivered now (see `ChannelReceiver`)
+        """
+
+        if len(data) < CHANNEL_TRAILER.size:
+            return True, []
+
+        channel, channel_seq = CHANNEL_TRAILER.unpack_from(data, len(data)-CHANNEL_TRAILER.size)
+        message = data[:-CHANNEL_TRAILER.size]
+
+        if compressed and (message := self._decompress(message)) is None:
+            return True, []
+
+        if channel == DEFAULT_CHANNEL:
+            return True, [message]
+        elif channel > len(self.channel_receivers):
+            # Garbage again
+            return True, []
+
+        return self.channel_receivers[channel-1].receive(channel_seq, message, force)
+
     def is_connected(self):
         "Returns whether the connection is still active"
         return not self.no_end_heartbeat.has_finished()
     
-    def process_packet(self, seq_id: int, ty: PacketType, data: bytes) -> Optional[bytes]:
-        "Process a packet, and if it's a message packet - return its bytes"
-        ret = None
+    def get_rtt(self) -> Optional[float]:
+        "The smoothed round trip time in seconds. `None` until the first measurement"
+        return self.stats.rtt
+    
+    def get_stats(self) -> ConnectionStats:
+        return self.stats
+    
+    def _update_loss(self, lost: bool):
+        self.stats.loss += (float(lost) - self.stats.loss) * LOSS_SMOOTHING
+
+    def _send_ping(self):
+        if self.ping_sent_at is not None:
+            # The previous one never came back
+            self._update_loss(True)
+
+        self.ping_sent_at = perf_counter()
+        self._send_packet(make_ping_packet(self.ping_sent_at))
+
+    def _receive_pong(self, data: bytes):
+        if len(data) != PING_TIMESTAMP.size:
+            return
+
+        sent_at = PING_TIMESTAMP.unpack(data)[0]
+        sample = perf_counter() - sent_at
+        if sample < 0:
+            # Not our timestamp
+            return
+        
+        if sent_at == self.ping_sent_at:
+            self.ping_sent_at = None
+            self._update_loss(False)
+
+        stats = self.stats
+        if stats.rtt is None:
+            stats.rtt = sample
+        else:
+            stats.rtt += (sample - stats.rtt) * RTT_SMOOTHING
+    
+    def process_packet(self, seq_id: int, ty: PacketType, data: bytes) -> list[bytes]:
+        """
+        Process a packet, and return all messages it has delivered. It's usually either none or one, but
+        a single message on an ordered channel can deliver all the messages that were waiting for it
+        """
+        ret = []
 
         self.no_end_heartbeat.reset()
 
+        self.stats.packets_received += 1
+        self.stats.bytes_received += PACKET_HEADER.size + len(data)
+
         if ty == PacketType.Acknowledgment:
             if len(data) == 2:
                 ack_id = int.from_bytes(data, BYTE_ORDER)
-                self.acknowledged_packets.add(ack_id)
+                self.unacknowledged_packets.discard(ack_id)
                 # print(f"{self.label}: Received acknowledgement for {ack_id}")
-        elif ty == PacketType.Message:
+        elif ty == PacketType.Message or ty == PacketType.CompressedMessage:
             if not self.has_packet_been_received(seq_id):
-                ret = data
+                message = data if ty == PacketType.Message else self._decompress(data)
+                if message is not None:
+                    ret = [message]
                 self.acknowledge_received_packet(seq_id)
+            elif seq_id != 0:
+                # A dublicate means that our previous acknowledgement might have been lost, so we're sending it again
+                self.stats.dublicates += 1
+                self._queue_message(0, make_acknowledgement_packet(seq_id))
+        elif ty == PacketType.ChannelMessage or ty == PacketType.CompressedChannelMessage:
+            if not self.has_packet_been_received(seq_id):
+                accepted, ret = self._receive_channel_message(
+                    data, 
+                    compressed=ty == PacketType.CompressedChannelMessage
+                )
+                if accepted:
+                    self.acknowledge_received_packet(seq_id)
+            elif seq_id != 0:
+                self.stats.dublicates += 1
+                self._queue_message(0, make_acknowledgement_packet(seq_id))
+        elif ty == PacketType.Fragment or ty == PacketType.CompressedFragment:
+            if not self.has_packet_been_received(seq_id):
+                accepted, message = self._receive_fragment(data)
+                if accepted:
+                    self.acknowledge_received_packet(seq_id)
+
+                if message is not None:
+                    # All fragments are already acknowledged, so the assembled message can't be refused anymore
+                    _, ret = self._receive_channel_message(
+                        message, 
+                        force=True, 
+                        compressed=ty == PacketType.CompressedFragment
+                    )
+            else:
+                self.stats.dublicates += 1
+                self._queue_message(0, make_acknowledgement_packet(seq_id))
+        elif ty == PacketType.Ping:
+            if len(data) == PING_TIMESTAMP.size:
+                self._send_packet(make_pong_packet(data))
+        elif ty == PacketType.Pong:
+            self._receive_pong(data)
         elif ty == PacketType.Disconnection:
             self.no_end_heartbeat.zero()
 
@@ -489,21 +1456,33 @@ class HighUDPConnection:
         if self.next_self_heartbeat.has_finished():
             self._queue_heartbeat()
 
+        self.next_ping.tick(dt)
+        if self.next_ping.has_finished():
+            self.next_ping.reset()
+            self._send_ping()
+
+        for buffer in self.fragment_buffers.values():
+            buffer.expires.tick(dt)
+
         self._send_queued_messages(dt)
 
 class HighUDPConnectionUnstable(HighUDPConnection):
     "Essentially the same as `HighUDPConnection`, but is used when testing unreliable conditions"
-    def __init__(self, sock, to_addr, label=""):
-        super().__init__(sock, to_addr, label)
+    def __init__(self, sock, to_addr, label="", channels=(), compressor=None):
+        super().__init__(sock, to_addr, label, channels, compressor)
 
-    def _send_packet(self, data: bytes):
-        for _ in range(2 if should_dublicate() else 1):
-            packet_to_send = data
-            if should_corrupt():
-                packet_to_send = packet_to_send[::-1]
+    def _send_packets(self, packets: list[bytes]):
+        unstable_packets = []
+        for data in packets:
+            for _ in range(2 if should_dublicate() else 1):
+                packet_to_send = data
+                if should_corrupt():
+                    packet_to_send = packet_to_send[::-1]
+
+                if not should_lose_packet():
+                    unstable_packets.append(data)
 
-            if not should_lose_packet():
-                super()._send_packet(data)
+        super()._send_packets(unstable_packets)
 
 def _maybe_fire(
     callback: Union[None, Callable[[tuple[str, int]], None]], 
@@ -518,20 +1497,61 @@ def _maybe_fire(
 
 class HighUDPServer:
     "A server is responsible for accepting connections from clients and maintaining their connections"
-    def __init__(self, addr: tuple[str, int], max_connections: int):
+    def __init__(
+        self, 
+        addr: tuple[str, int], 
+        max_connections: int, 
+        sharded: bool = False, 
+        channels: tuple[ChannelMode, ...] = (),
+        compressor: Optional[MessageCompressor] = None,
+        shard: int = 0
+    ):
+        """
+        A sharded server can share its address with other sharded servers (see the sharding section).
+        All connections of this server (including the ones in rooms) use the provided channels (see the channels section)
+        and the compressor (see the compression section). 
+        
+        `shard` is the index of this server in its sharded group, which gets encoded in the IDs of its rooms
+        """
+        assert 0 <= shard < MAX_SHARDS, "The shard index doesn't fit into room IDs"
+        
+        self.channels = channels
+        self.compressor = compressor
+
         self.max_connections = None
         self.set_max_connections(max_connections)
 
         self.accept_connections = True
 
         self.connections: dict[tuple[str, int], HighUDPConnection] = {}
+        self.closed_stats = ConnectionStats()
+        "The summed counters of all connections that were already removed"
 
-        self.sock = make_async_socket(addr)
+        self.sock = make_async_socket(addr, sharded=sharded)
         self.addr = self.sock.getsockname()
+        self.receiver = DatagramReceiver(RECV_BYTES)
 
         self._connection_cls: HighUDPConnection = HighUDPConnection
 
-        self.recv_queue: deque[bytes, tuple[tuple[str, int]]] = deque()
+        self.simulation: Optional[SimulatedSocket] = None
+        "The simulated link all packets are sent through, if any. See `simulate_network`"
+
+        self.recv_queue: deque[tuple[bytes, tuple[str, int], float]] = deque()
+
+        self.receiver_thread: Optional[ReceiverThread] = None
+        "An optional background thread that receives packets for us. See `start_receiver_thread`"
+
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        "An optional asyncio transport that delivers packets to us as they arrive. See `open_datagram_endpoint`"
+
+        self.last_arrival: float = 0
+        "The arrival time of the last packet returned from `recv`"
+
+        self.rooms: dict[int, HighUDPRoom] = {}
+        self.connection_rooms: dict[tuple[str, int], HighUDPRoom] = {}
+        "Connections that belong to rooms. All the other connections belong to the server itself"
+        self.shard = shard
+        self.room_id_counter = count(1)
 
         self.on_connection: Callable[[tuple[str, int]], None] = None
         "A callback that's fired when a client has connected. A public attribute"
@@ -548,6 +1568,19 @@ class HighUDPServer:
         """
         self._connection_cls = HighUDPConnectionUnstable if to else HighUDPConnection
 
+    def simulate_network(self, conditions: NetworkConditions, seed: int = 0, clock: Callable[[], float] = perf_counter):
+        """
+        Send all packets of this server (and its rooms) through simulated links, one per client (see the network 
+        simulation module). Simulated packets are sent when they arrive, checked every tick
+        """
+        assert self.transport is None, "Network simulation isn't supported with datagram endpoints"
+
+        raw_sock = self.sock if self.simulation is None else self.simulation.sock
+        self.sock = self.simulation = SimulatedSocket(raw_sock, conditions, seed, clock)
+
+        for connection in self.connections.values():
+            connection.sock = self.sock
+
     def set_max_connections(self, to: int):
         assert to >= 0, "A number of maximum connections should more than 2"
         self.max_connections = to
@@ -556,30 +1589,121 @@ class HighUDPServer:
         "Make this server be able to accept incoming connections. Doesn't affect the existing ones"
         self.accept_connections = to
 
-    def _connection_response(self, addr: tuple[str, int], response: bool):
+    def open_room(self, max_connections: int) -> "HighUDPRoom":
+        """
+        Open a new room on this server. Once a server has rooms - all new connections get assigned 
+        to rooms, and the server itself no longer accepts any
+        """
+        room = HighUDPRoom(self, self._next_room_id(), max_connections)
+        self.rooms[room.get_id()] = room
+
+        return room
+
+    def _next_room_id(self) -> int:
+        "Room IDs are never zero, and their upper bits are this server's shard index"
+
+        assert len(self.rooms) < ROOMS_PER_SHARD - 1, "Too many rooms on a single server"
+
+        while True:
+            local_id = next(self.room_id_counter) % ROOMS_PER_SHARD
+            room_id = (self.shard << (16 - ROOM_SHARD_BITS)) | local_id
+
+            if local_id != 0 and room_id not in self.rooms:
+                return room_id
+
+    def _close_room(self, room: "HighUDPRoom"):
+        for addr in room.get_connection_addresses():
+            self.disconnect(addr, False)
+
+        self.rooms.pop(room.get_id(), None)
+
+    def _pick_room(self, request: bytes) -> Optional["HighUDPRoom"]:
+        "Find a room for a new connection, based on its connection request. `None` if there's none available"
+
+        if len(request) == 2:
+            room = self.rooms.get(int.from_bytes(request, BYTE_ORDER))
+            return room if room is not None and room.can_accept_connection() else None
+        
+        for room in self.rooms.values():
+            if room.can_accept_connection():
+                return room
+        
+        return None
+
+    def _connection_response(self, addr: tuple[str, int], response: bool, room: Optional["HighUDPRoom"] = None):
         assert addr not in self.connections, "Can't overwrite an existing connection"
 
         if response:
             print("SERVER: Connection accepted for", addr)
 
 
-            self.connections[addr] = self._connection_cls(self.sock, addr, label="SERVER")
-            _maybe_fire(self.on_connection, addr)
+            self.connections[addr] = self._connection_cls(
+                self.sock, 
+                addr, 
+                label="SERVER", 
+                channels=self.channels, 
+                compressor=self.compressor
+            )
+            if room is not None:
+                self.connection_rooms[addr] = room
+                room.addrs.add(addr)
+                _maybe_fire(room.on_connection, addr)
+            else:
+                _maybe_fire(self.on_connection, addr)
         else:
             print("SERVER: Connection refused for", addr)
         
         self.sock.sendto(make_connection_response_packet(response), addr)
 
-    def _process_packet(self, addr: tuple[str, int], seq_id: int, ty: PacketType, data: bytes):
+    def start_receiver_thread(self):
+        """
+        Move packet receiving to a background thread. The server will still process packets only when ticking,
+        but they will no longer wait in the kernel buffer, and their arrival times will be precise
+        """
+        if self.receiver_thread is None:
+            self.receiver_thread = ReceiverThread(self.sock, self.receiver)
+            self.receiver_thread.start()
+
+    def stop_receiver_thread(self):
+        "Go back to receiving packets only when ticking"
+
+        if self.receiver_thread is not None:
+            self.receiver_thread.stop()
+            self.receiver_thread = None
+
+    async def open_datagram_endpoint(self, loop: asyncio.AbstractEventLoop):
+        """
+        Hand this server's socket over to the provided asyncio event loop. From now on, packets get processed
+        (acknowledged, deduplicated and so on) the moment the loop receives them, and ticking only sends
+        packets and maintains connections. This replaces the receiver thread if it's running.
+        """
+        assert self.transport is None, "The server already has a datagram endpoint"
+        assert self.simulation is None, "Network simulation isn't supported with datagram endpoints"
+
+        self.stop_receiver_thread()
+
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: ServerDatagramProtocol(self),
+            sock=self.sock
+        )
+
+    def _process_packet(self, addr: tuple[str, int], seq_id: int, ty: PacketType, data: bytes, arrival: float):
         if addr in self.connections:
-            data = self.connections[addr].process_packet(seq_id, ty, data)
-            if data is not None:
-                # If data is not None - our message is a message packet, thus we can add it to our internal queue
-                self.recv_queue.append((data, addr))
+            messages = self.connections[addr].process_packet(seq_id, ty, data)
+            if messages:
+                # Delivered messages are added to our internal queue (or the queue of the room this connection belongs to)
+                room = self.connection_rooms.get(addr)
+                recv_queue = self.recv_queue if room is None else room.recv_queue
+                for message in messages:
+                    recv_queue.append((message, addr, arrival))
         else:
             if ty == PacketType.ConnectionRequest:
-                response = self.accept_connections and len(self.connections) < self.max_connections
-                self._connection_response(addr, response)
+                if self.rooms:
+                    room = self._pick_room(data)
+                    self._connection_response(addr, room is not None, room)
+                else:
+                    response = self.accept_connections and len(self.connections) < self.max_connections
+                    self._connection_response(addr, response)
 
     def has_packets(self) -> bool:
         "Check if the server has any available packets"
@@ -590,11 +1714,111 @@ class HighUDPServer:
 
         assert self.has_packets(), "Nothing to receive"
 
-        return self.recv_queue.popleft()
+        data, addr, self.last_arrival = self.recv_queue.popleft()
+
+        return data, addr
+    
+    def get_last_arrival_time(self) -> float:
+        """
+        The time (from `time.perf_counter`) at which the packet last returned from `recv` has arrived.
+        Without the receiver thread this is the time of the tick that has received it.
+        """
+        return self.last_arrival
+    
+    def get_rtt(self, addr: tuple[str, int]) -> Optional[float]:
+        "The round trip time of the connection under the provided address. `None` if unknown or not connected"
+        connection = self.connections.get(addr)
+        return None if connection is None else connection.get_rtt()
+    
+    def get_stats(self, addr: tuple[str, int]) -> Optional[ConnectionStats]:
+        "The stats of the connection under the provided address. `None` if not connected"
+        connection = self.connections.get(addr)
+        return None if connection is None else connection.get_stats()
     
-    def send_to(self, addr: tuple[str, int], data: bytes, reliable: bool):
+    def _sum_stats(self, addrs: Iterable[tuple[str, int]], closed_stats: ConnectionStats) -> ConnectionStats:
+        total = sum_connection_stats(self.connections[addr].get_stats() for addr in addrs)
+        
+        for counter in ConnectionStats.COUNTERS:
+            setattr(total, counter, getattr(total, counter) + getattr(closed_stats, counter))
+
+        return total
+
+    def get_total_stats(self) -> ConnectionStats:
+        """
+        The stats of all connections (including the ones in rooms), summed together with the ones that were already 
+        removed (see `sum_connection_stats`). Corrupted datagrams are counted for the whole socket
+        """
+        total = self._sum_stats(self.connections, self.closed_stats)
+        total.corrupted += self.receiver.corrupted
+
+        return total
+    
+    def send_to(
+        self, 
+        addr: tuple[str, int], 
+        data: bytes, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
         if addr in self.connections:
-            self.connections[addr].queue_message(data, reliable)
+            self.connections[addr].queue_message(data, reliable, key, channel, compress)
+
+    def send_written_to(
+        self, 
+        addr: tuple[str, int], 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        "Send the message written in the packet writer (see `PacketWriter`)"
+        if addr in self.connections:
+            self.connections[addr].queue_written_message(writer, reliable, key, channel, compress=compress)
+
+    def multicast(
+        self, 
+        addrs: Iterable[tuple[str, int]], 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None,
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        """
+        Send the message written in the packet writer to all of these connections. Unreliable messages are framed
+        only once, and the same packet is sent to everyone. Reliable messages need their own sequence IDs on
+        every connection, so they only share the payload (and its hash) and differ in their headers
+        """
+
+        connections = [self.connections[addr] for addr in addrs if addr in self.connections]
+        if len(connections) == 0:
+            return
+
+        packed = None
+        if compress and self.compressor is not None and writer.get_payload_size() >= MIN_COMPRESSED_SIZE:
+            # Compressing is costly, so the message gets compressed only once for everyone
+            packed = self.compressor.compress(bytes(writer.get_payload()))
+
+        if packed is not None:
+            for connection in connections:
+                connection._queue_data(packed, reliable, key, channel, True)
+        elif writer.get_payload_size() + CHANNEL_TRAILER.size > BYTES_PER_MESSAGE:
+            # Fragmented messages are framed per fragment anyway
+            data = bytes(writer.get_payload())
+            for connection in connections:
+                connection.queue_message(data, reliable, key, channel)
+        elif not reliable and channel == DEFAULT_CHANNEL:
+            packet = writer.finish(0, PacketType.Message)
+            for connection in connections:
+                connection._queue_message(0, packet, key)
+        else:
+            # Sequence IDs are different on every connection
+            payload_hash = writer.hash_payload()
+            for connection in connections:
+                connection.queue_written_message(writer, reliable, key, channel, payload_hash)
 
     def get_connection_addresses(self) -> tuple[tuple[str, int], ...]:
         return tuple(self.connections.keys())
@@ -608,9 +1832,17 @@ class HighUDPServer:
         Delete the connection under the provided address and create fire the disconnection callback.
         This will panic if the connection isn't present
         """
-        del self.connections[addr]
+        stats = self.connections.pop(addr).get_stats()
+        stats.queue_depth = 0
+        self.closed_stats.add(stats)
+
+        room = self.connection_rooms.pop(addr, None)
+        if room is not None:
+            room.addrs.discard(addr)
+            room.closed_stats.add(stats)
+
         if fire_callback:
-            _maybe_fire(self.on_disconnection, addr)
+            _maybe_fire(self.on_disconnection if room is None else room.on_disconnection, addr)
     
     def disconnect(self, addr: tuple[str, int], fire_callback: bool = True):
         "Disconnect the provided address from the server if it's present"
@@ -619,34 +1851,280 @@ class HighUDPServer:
             self.connections[addr].disconnect()
             self._remove_connection(addr, fire_callback)
 
-    def tick(self, dt: float):
-        "Receive as many packets as possible and send your own packets"
+    def _receive(self):
+        "Process all packets that have arrived since the last tick"
+
+        if self.receiver_thread is not None:
+            packets = self.receiver_thread.packets
+            while packets:
+                arrival, packet, addr = packets.popleft()
+                self._process_packet(addr, *packet, arrival)
+        elif self.transport is not None:
+            # The event loop has already delivered everything to us
+            return
+        else:
+            arrival = perf_counter()
+            for packet, addr in self.receiver.receive_packets(self.sock):
+                self._process_packet(addr, *packet, arrival)
 
-        for packet, addr in receive_packets(self.sock, RECV_BYTES):
-            self._process_packet(addr, *packet)
-        
-        # removed_connections = []
-        for addr, connection in tuple(self.connections.items()):
+    def _tick_connections(self, addrs: Iterable[tuple[str, int]], dt: float):
+        for addr in tuple(addrs):
+            connection = self.connections[addr]
             connection.tick(dt)
 
             # If the connection is closed - we close it as well
             if not connection.is_connected():
                 self._remove_connection(addr, True)
+
+    def tick(self, dt: float):
+        """
+        Receive as many packets as possible and send your own packets.
+        Connections of rooms are ticked by their rooms instead
+        """
+
+        self._receive()
+        
+        if self.connection_rooms:
+            self._tick_connections((addr for addr in self.connections if addr not in self.connection_rooms), dt)
+        else:
+            self._tick_connections(self.connections, dt)
+
+        if self.simulation is not None:
+            self.simulation.flush()
             
     def close(self):
+        self.stop_receiver_thread()
+
         for connection in self.connections.values():
             connection.disconnect()
 
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+        self.rooms.clear()
+        self.connection_rooms.clear()
+
+        self.sock.close()
+
+class HighUDPRoom:
+    """
+    An independent session on a shared `HighUDPServer`. It provides the same interface as the server itself, 
+    but only sees the connections that were assigned to it. See the rooms section.
+    """
+    def __init__(self, server: HighUDPServer, room_id: int, max_connections: int):
+        self.server = server
+        self.room_id = room_id
+
+        self.max_connections = None
+        self.set_max_connections(max_connections)
+        self.accept_connections = True
+
+        self.addrs: set[tuple[str, int]] = set()
+        "The connections of this room. Managed by the server"
+        self.closed_stats = ConnectionStats()
+        "The summed counters of connections of this room that were already removed. Managed by the server"
+
+        self.recv_queue: deque[tuple[bytes, tuple[str, int], float]] = deque()
+        self.last_arrival: float = 0
+
+        self.on_connection: Callable[[tuple[str, int]], None] = None
+        "A callback that's fired when a client has connected to this room. A public attribute"
+        self.on_disconnection: Callable[[tuple[str, int]], None] = None
+        "A callback that's fired when a client has disconnected from this room. A public attribute"
+
+    def get_id(self) -> int:
+        "The ID clients can use to request this specific room"
+        return self.room_id
+
+    def get_addr(self) -> tuple[str, int]:
+        return self.server.get_addr()
+
+    def set_testing_mode(self, to: bool):
+        "This changes the testing mode of the entire server, not just this room"
+        self.server.set_testing_mode(to)
+
+    def set_max_connections(self, to: int):
+        assert to >= 0, "A number of maximum connections should more than 2"
+        self.max_connections = to
+
+    def accept_incoming_connections(self, to: bool):
+        "Make this room be able to accept incoming connections. Doesn't affect the existing ones"
+        self.accept_connections = to
+
+    def can_accept_connection(self) -> bool:
+        return self.accept_connections and len(self.addrs) < self.max_connections
+
+    def start_receiver_thread(self):
+        "Start the receiver thread of the shared server (if it's not running already)"
+        self.server.start_receiver_thread()
+
+    async def open_datagram_endpoint(self, loop: asyncio.AbstractEventLoop):
+        "Open the datagram endpoint of the shared server (if it's not opened already)"
+        if self.server.transport is None:
+            await self.server.open_datagram_endpoint(loop)
+
+    def has_packets(self) -> bool:
+        return len(self.recv_queue) > 0
+    
+    def recv(self) -> tuple[bytes, tuple[str, int]]:
+        "Receive a single packet (its address and data). Will panic if the room doesn't have any packets"
+
+        assert self.has_packets(), "Nothing to receive"
+
+        data, addr, self.last_arrival = self.recv_queue.popleft()
+
+        return data, addr
+    
+    def get_last_arrival_time(self) -> float:
+        return self.last_arrival
+    
+    def get_rtt(self, addr: tuple[str, int]) -> Optional[float]:
+        return self.server.get_rtt(addr) if addr in self.addrs else None
+    
+    def get_stats(self, addr: tuple[str, int]) -> Optional[ConnectionStats]:
+        return self.server.get_stats(addr) if addr in self.addrs else None
+    
+    def get_total_stats(self) -> ConnectionStats:
+        "The same as the server's, but only for this room. Corrupted datagrams can't be told apart, so they aren't counted"
+        return self.server._sum_stats(self.addrs, self.closed_stats)
+
+    def send_to(
+        self, 
+        addr: tuple[str, int], 
+        data: bytes, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        if addr in self.addrs:
+            self.server.send_to(addr, data, reliable, key, channel, compress)
+
+    def send_written_to(
+        self, 
+        addr: tuple[str, int], 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        if addr in self.addrs:
+            self.server.send_written_to(addr, writer, reliable, key, channel, compress)
+
+    def multicast(
+        self, 
+        addrs: Iterable[tuple[str, int]], 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None,
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        self.server.multicast((addr for addr in addrs if addr in self.addrs), writer, reliable, key, channel, compress)
+
+    def get_connection_addresses(self) -> tuple[tuple[str, int], ...]:
+        return tuple(self.addrs)
+
+    def has_connection_addr(self, addr: tuple[str, int]) -> bool:
+        return addr in self.addrs
+    
+    def disconnect(self, addr: tuple[str, int], fire_callback: bool = True):
+        if addr in self.addrs:
+            self.server.disconnect(addr, fire_callback)
+
+    def tick(self, dt: float):
+        """
+        Receive packets on the shared server (they get routed to their rooms) and tick the connections of
+        this room. Every room ticks its own connections, so the shared server itself doesn't need ticking.
+        """
+        self.server._receive()
+        self.server._tick_connections(self.addrs, dt)
+
+    def close(self):
+        "Disconnect all connections of this room and remove it from the server. The server's socket stays open"
+        self.server._close_room(self)
+
+class ShardEntrance:
+    """
+    The shared address of a sharded group of servers. It doesn't accept any connections itself - it only redirects
+    connection requests to the servers' own addresses, based on the requested room. See the sharding section
+    """
+    def __init__(self, addr: tuple[str, int], shard: int, shard_ports: tuple[int, ...]):
+        """
+        `shard` is the index of the server this entrance belongs to, and `shard_ports` are the ports of all servers 
+        of the group (by their shard index)
+        """
+        assert 0 <= shard < len(shard_ports) <= MAX_SHARDS, "Invalid shard index"
+
+        self.shard = shard
+        self.shard_ports = shard_ports
+
+        self.sock = make_async_socket(addr, sharded=True)
+        self.addr = self.sock.getsockname()
+        self.receiver = DatagramReceiver(RECV_BYTES)
+
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def get_addr(self) -> tuple[str, int]:
+        return self.addr
+
+    def get_redirect_port(self, request: bytes) -> Optional[int]:
+        "The port a connection request should be sent to instead. `None` if the requested room can't exist"
+
+        if len(request) < 2:
+            return self.shard_ports[self.shard]
+
+        shard = get_room_shard(int.from_bytes(request, BYTE_ORDER))
+        return self.shard_ports[shard] if shard < len(self.shard_ports) else None
+
+    async def open_datagram_endpoint(self, loop: asyncio.AbstractEventLoop):
+        "The same as the server's, requests get answered the moment they arrive"
+
+        assert self.transport is None, "The entrance already has a datagram endpoint"
+
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: ServerDatagramProtocol(self),
+            sock=self.sock
+        )
+
+    def _process_packet(self, addr: tuple[str, int], _seq_id: int, ty: PacketType, data: bytes, _arrival: float):
+        if ty != PacketType.ConnectionRequest:
+            return
+
+        port = self.get_redirect_port(data)
+        if port is None:
+            self.sock.sendto(make_connection_response_packet(False), addr)
+        else:
+            self.sock.sendto(make_connection_redirect_packet(port), addr)
+
+    def tick(self, _dt: float):
+        "Answer all requests that have arrived since the last tick. Not needed with a datagram endpoint"
+
+        if self.transport is None:
+            for packet, addr in self.receiver.receive_packets(self.sock):
+                self._process_packet(addr, *packet, 0)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
         self.sock.close()
 
 class HighUDPClient:
     "A client connects to servers"
 
     class ServerConnector:
-        def __init__(self, addr: tuple[str, int], attempts: int, attempts_delay: float):
+        def __init__(self, addr: tuple[str, int], attempts: int, attempts_delay: float, room_id: Optional[int]):
             self.addr = addr
+            self.room_id = room_id
             self.attempts = attempts
             self.next_attempt = Timer(attempts_delay, True)
+
+            self.redirected = False
+            "Only a single redirect is followed, so servers can't send us around in circles"
         
         def tick(self, dt: float) -> bool:
             "Consumes the connection attempt and returns whether it can continue (`True`) or not (`False`)"
@@ -663,7 +2141,16 @@ class HighUDPClient:
         def is_exhausted(self) -> bool:
             return self.attempts <= 0
 
-    def __init__(self, addr: tuple[str, int]):
+    def __init__(
+        self, 
+        addr: tuple[str, int], 
+        channels: tuple[ChannelMode, ...] = (), 
+        compressor: Optional[MessageCompressor] = None
+    ):
+        "The channels and the compression dictionary should match the server's ones"
+        self.channels = channels
+        self.compressor = compressor
+
         self.connection: HighUDPConnection = None
         self.connection_addr: tuple[str, int] = None
 
@@ -671,9 +2158,13 @@ class HighUDPClient:
 
         self.sock = make_async_socket(addr)
         self.addr = self.sock.getsockname()
+        self.receiver = DatagramReceiver(RECV_BYTES)
 
         self.recv_queue: deque[bytes] = deque()
 
+        self.simulation: Optional[SimulatedSocket] = None
+        "The simulated link all packets are sent through, if any. See `simulate_network`"
+
         self._connection_cls: HighUDPConnection = HighUDPConnection
         """
         To allow easy unreliable environment testing, the simplest solution was to create a simple
@@ -704,17 +2195,46 @@ class HighUDPClient:
         """
         self._connection_cls = HighUDPConnectionUnstable if to else HighUDPConnection
 
+    def simulate_network(self, conditions: NetworkConditions, seed: int = 0, clock: Callable[[], float] = perf_counter):
+        """
+        Send all packets of this client through a simulated link (see the network simulation module). 
+        Simulated packets are sent when they arrive, checked every tick
+        """
+
+        raw_sock = self.sock if self.simulation is None else self.simulation.sock
+        self.sock = self.simulation = SimulatedSocket(raw_sock, conditions, seed, clock)
+
+        if self.connection is not None:
+            self.connection.sock = self.sock
+
     def is_connected(self) -> bool:
         return self.connection is not None and self.connection.is_connected()
     
+    def get_rtt(self) -> Optional[float]:
+        "The round trip time to the server. `None` if unknown or not connected"
+        return None if self.connection is None else self.connection.get_rtt()
+    
+    def get_stats(self) -> ConnectionStats:
+        """
+        The stats of the current connection (empty if not connected). Corrupted datagrams are counted for the
+        whole socket
+        """
+        stats = sum_connection_stats(() if self.connection is None else (self.connection.get_stats(), ))
+        stats.corrupted += self.receiver.corrupted
+
+        return stats
+    
     def is_trying_to_connect(self) -> bool:
         return self.active_connector is not None
     
-    def connect(self, to: tuple[str, int], attempts: int, attempt_delay: float):
-        "Start a connection procedure. If a connection is already ongoing - it's going to get overwritten"
+    def connect(self, to: tuple[str, int], attempts: int, attempt_delay: float, room_id: Optional[int] = None):
+        """
+        Start a connection procedure. If a connection is already ongoing - it's going to get overwritten.
+        If the server hosts multiple rooms, a specific one can be requested with `room_id`
+        """
 
         assert not self.is_connected(), "Already is connected"
-        self.active_connector = HighUDPClient.ServerConnector(to, attempts, attempt_delay)
+        self.active_connector = HighUDPClient.ServerConnector(to, attempts, attempt_delay, room_id)
 
     def _continue_connection_establishing(self, dt: float):
         connector = self.active_connector
@@ -723,7 +2243,7 @@ class HighUDPClient:
         if retry:
             try:
                 self.sock.sendto(
-                    make_connection_request_packet(),
+                    make_connection_request_packet(connector.room_id),
                     connector.addr
                 )
             except OSError:
@@ -737,9 +2257,7 @@ class HighUDPClient:
 
     def _process_packet(self, seq_id: int, ty: PacketType, data: bytes):
         if self.connection is not None:
-            data = self.connection.process_packet(seq_id, ty, data)
-            if data is not None:
-                self.recv_queue.append(data)
+            self.recv_queue.extend(self.connection.process_packet(seq_id, ty, data))
         elif self.active_connector is not None:
             # ConnectionResponse only contains a single byte of data, which is True/False
             if ty == PacketType.ConnectionResponse:
@@ -747,13 +2265,26 @@ class HighUDPClient:
                     print("CLIENT: Connected to", self.active_connector.addr)
                     # Move to an active UDP connection
                     self.connection_addr = self.active_connector.addr
-                    self.connection = self._connection_cls(self.sock, self.connection_addr, label="CLIENT")
+                    self.connection = self._connection_cls(
+                        self.sock, 
+                        self.connection_addr, 
+                        label="CLIENT", 
+                        channels=self.channels,
+                        compressor=self.compressor
+                    )
                     _maybe_fire(self.on_connection)
                 else:
                     _maybe_fire(self.on_connection_fail)
 
                 # Remove this connector
                 self.active_connector = None
+            elif ty == PacketType.ConnectionRedirect and len(data) == 2 and not self.active_connector.redirected:
+                # The same request goes to the other port right away. It's still the same connection attempt
+                connector = self.active_connector
+                connector.addr = (connector.addr[0], int.from_bytes(data, BYTE_ORDER))
+                connector.redirected = True
+                connector.next_attempt.on_interval = 0
+                connector.attempts += 1
                     
     def has_packets(self) -> bool:
         "Check if the client has any available packets"
@@ -766,9 +2297,28 @@ class HighUDPClient:
 
         return self.recv_queue.popleft()
     
-    def send(self, data: bytes, reliable: bool):
+    def send(
+        self, 
+        data: bytes, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        if self.connection is not None:
+            self.connection.queue_message(data, reliable, key, channel, compress)
+
+    def send_written(
+        self, 
+        writer: PacketWriter, 
+        reliable: bool, 
+        key: Optional[int] = None, 
+        channel: int = DEFAULT_CHANNEL,
+        compress: bool = False
+    ):
+        "Send the message written in the packet writer (see `PacketWriter`)"
         if self.connection is not None:
-            self.connection.queue_message(data, reliable)
+            self.connection.queue_written_message(writer, reliable, key, channel, compress=compress)
 
     def _remove_connection(self, fire_callback: bool):
         "Remove the connection and optionally fire the binded callback"
@@ -788,7 +2338,7 @@ class HighUDPClient:
     def tick(self, dt: float):
         "Receive as many packets as possible and send your own packets"
 
-        for packet, addr in receive_packets(self.sock, RECV_BYTES):
+        for packet, addr in self.receiver.receive_packets(self.sock):
             # It should be either the server or a connector address
             if addr == self.connection_addr or (self.active_connector and self.active_connector.addr == addr):
                 self._process_packet(*packet)
@@ -801,6 +2351,9 @@ class HighUDPClient:
             # If there's no connection, but we still have a connection object - remove it
             self._remove_connection(True)
 
+        if self.simulation is not None:
+            self.simulation.flush()
+
     def close(self):
         if self.is_connected():
             self.connection.disconnect()
@@ -863,11 +2416,12 @@ class BroadcastReceiver:
         # multiple broadcast listeners accross multiple Python sessions. This is highly useful for
         # testing.
         self.sock = make_async_socket(addr, shared=True)
+        self.receiver = DatagramReceiver(BYTES_PER_MESSAGE)
         self.recv_queue: deque[tuple[bytes, tuple[str, int]]] = deque()
     
     def fetch(self):
         "Fetch for any new packets on this listener. Fetching will allow you to later get your packets using the `recv` method"
-        for (_, ty, data), addr in receive_packets(self.sock, BYTES_PER_MESSAGE):
+        for (_, ty, data), addr in self.receiver.receive_packets(self.sock):
             if ty == PacketType.Broadcast:
                 self.recv_queue.append((data, addr))
 
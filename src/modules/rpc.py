@@ -3,6 +3,7 @@ from plugin import Resources
 from itertools import count
 import struct
 from modules.network import *
+from modules.bitpack import BitSchema, BitpackError
 
 from typing import Callable, Optional
 
@@ -18,10 +19,19 @@ _rpc_id_counter = count(0, step=1)
 class RPCFormatError(Exception):
     "The arguments passed to the RPC were malformed, thus the RPC wasn't executed."
 
-def _register_rpc(rpc_func: Callable, serialize_call: Callable, is_reliable: bool):
+def _register_rpc(
+    rpc_func: Callable, 
+    serialize_call: Callable, 
+    is_reliable: bool, 
+    write_call: Optional[Callable] = None,
+    supersedes: bool = False,
+    channel: int = DEFAULT_CHANNEL,
+    compress: bool = False
+):
     """
     Registers an RPC function into the database and attaches some internal attributes
-    like its internal RPC ID and its `serialize_call` method. 
+    like its internal RPC ID, its `serialize_call` method and its `write_call` method (the same as `serialize_call`,
+    but it writes the arguments right into a `PacketWriter`). 
     """
     new_rpc_id = next(_rpc_id_counter)
     assert new_rpc_id < MAX_RPC_FUNC, f"Reached the maximum amount of RPC functions: {MAX_RPC_FUNC}"
@@ -31,10 +41,29 @@ def _register_rpc(rpc_func: Callable, serialize_call: Callable, is_reliable: boo
 
     rpc_func.__reliable = is_reliable
 
+    assert not (is_reliable and supersedes), "Only unreliable RPCs can supersede their previous calls"
+    rpc_func.__supersedes = supersedes
+
+    rpc_func.__channel = channel
+
+    rpc_func.__compress = compress
+
     # We'll assign its helper `serialize_call` method 
     rpc_func.serialize_call = serialize_call
 
-def rpc(struct_format: str, reliable: bool = DEFAULT_RPC_RELIABILITY):
+    if write_call is None:
+        def write_call(writer: PacketWriter, *args):
+            writer.write(serialize_call(*args))
+
+    rpc_func.write_call = write_call
+
+def rpc(
+    struct_format: str, 
+    reliable: bool = DEFAULT_RPC_RELIABILITY, 
+    supersedes: bool = False, 
+    channel: int = DEFAULT_CHANNEL,
+    compress: bool = False
+):
     """
     A function decorator that essentially transforms a system into a network system that will only 
     accept arguments in a form of bytes. What this essentially allows us to do, is make it possible
@@ -82,6 +111,13 @@ def rpc(struct_format: str, reliable: bool = DEFAULT_RPC_RELIABILITY):
     at runtime.
     5. While Python's `struct` will convert the given data into bytes - it could still highly likely be garbage data,
     so make sure to sanitize it. Actually, sanitize everything, because you can never trust a client's input.
+    6. Unreliable RPCs that only carry the latest state (like syncronizing time) can be marked with `supersedes`.
+    A new call of such RPC replaces its previous call if it's still waiting to be sent (when congested),
+    so they don't pile up and get delivered late one after another.
+    7. RPCs can be sent over numbered network channels (see the channels section of the network module), for
+    example to keep them in order. The channel's mode should have the same reliability as the RPC.
+    8. RPCs that carry a lot of data can be marked with `compress`. Their calls get compressed whenever it saves
+    bytes (see the compression section of the network module).
     """
     def decorator(func):
         format_struct = struct.Struct(ENDIAN+struct_format)
@@ -96,12 +132,51 @@ def rpc(struct_format: str, reliable: bool = DEFAULT_RPC_RELIABILITY):
             "Serialize provided arguments into bytes that can be used to call the RPC function"
             return format_struct.pack(*args)
 
-        _register_rpc(rpc_func, serialize_call, reliable)
+        def write_call(writer: PacketWriter, *args):
+            writer.pack(format_struct, *args)
+
+        _register_rpc(rpc_func, serialize_call, reliable, write_call, supersedes, channel, compress)
 
         return rpc_func
     return decorator
 
-def rpc_raw(reliable: bool = DEFAULT_RPC_RELIABILITY):
+def rpc_bits(
+    schema: BitSchema, 
+    reliable: bool = DEFAULT_RPC_RELIABILITY, 
+    supersedes: bool = False, 
+    channel: int = DEFAULT_CHANNEL,
+    compress: bool = False
+):
+    """
+    The same as `rpc`, but instead of a `struct` format it takes a bit schema (see the bitpack module).
+    Every field only takes as many bits as it needs, and values get quantized (and clamped) according to their
+    fields. Keep in mind that the function receives the quantized values, not the exact ones that were sent:
+    ```
+    @rpc_bits(BitSchema(Int(-100, 100), Bool()))
+    def my_rpc(_, a: int, b: bool):
+        ...
+    ```
+    """
+    def decorator(func):
+        def rpc_func(resources: Resources, serialized_arguments: bytes):
+            try:
+                parsed_args = schema.unpack(serialized_arguments)
+            except BitpackError:
+                raise RPCFormatError()
+            
+            func(resources, *parsed_args)
+
+        _register_rpc(rpc_func, schema.pack, reliable, supersedes=supersedes, channel=channel, compress=compress)
+
+        return rpc_func
+    return decorator
+
+def rpc_raw(
+    reliable: bool = DEFAULT_RPC_RELIABILITY, 
+    supersedes: bool = False, 
+    channel: int = DEFAULT_CHANNEL,
+    compress: bool = False
+):
     """
     Before you use this RPC decorator, you should first read about the `rpc`.
     This decorator solely exists for edge cases, like managing growable structures in RPC's. If you have a consistent
@@ -130,8 +205,11 @@ def rpc_raw(reliable: bool = DEFAULT_RPC_RELIABILITY):
         # We can't avoid this method due to common API
         def serialize_call(args: bytes) -> bytes:
             return args
+
+        def write_call(writer: PacketWriter, args: bytes):
+            writer.write(args)
         
-        _register_rpc(func, serialize_call, is_reliable)
+        _register_rpc(func, serialize_call, is_reliable, write_call, supersedes, channel, compress)
 
         return func
     
@@ -156,8 +234,38 @@ def is_rpc_reliable(func: Callable) -> bool:
 
     return func.__reliable
 
+def get_rpc_supersession_key(func: Callable) -> Optional[int]:
+    """
+    The key under which the RPC's calls supersede each other in the connection's send queue (see `rpc`).
+    `None` if the RPC doesn't supersede its calls
+    """
+    assert is_rpc(func)
+
+    return func.__rpc_id if func.__supersedes else None
+
+def get_rpc_channel(func: Callable) -> int:
+    "The network channel the RPC is sent over"
+    assert is_rpc(func)
+
+    return func.__channel
+
+def is_rpc_compressed(func: Callable) -> bool:
+    "Should the RPC's calls be compressed (when it saves bytes)?"
+    assert is_rpc(func)
+
+    return func.__compress
+
 def serialize_call(func: Callable, args: tuple) -> bytes:
     "Constructs an entire binary RPC call, according to the RPC protocol: `[id][args][args][args]...`"
     rpc_id = get_rpc_id(func)
 
-    return bytes([rpc_id]) + func.serialize_call(*args)
\ No newline at end of file
+    return bytes([rpc_id]) + func.serialize_call(*args)
+
+def write_call(writer: PacketWriter, func: Callable, args: tuple):
+    """
+    The same as `serialize_call`, but the call is written right into the packet writer (which gets reset first),
+    without any intermediate bytes. The writer can then be sent as is (see `PacketWriter`)
+    """
+    writer.reset()
+    writer.write_byte(get_rpc_id(func))
+    func.write_call(writer, *args)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+A sliding window over wrapping sequence IDs.
+
+Sequence IDs in our networking wrap around (see `WRAP_IDS` in the network module), so a plain "bigger
+than" comparison stops working the moment the counter rolls over. The helpers here compare sequence IDs
+the same way TCP does: if 2 IDs are less than half of the sequence space apart, the bigger one is newer.
+If they're more than half apart - the smaller one has already wrapped around, so it's the newer one.
+
+The window itself is a ring of flags indexed by `seq % size`. It only remembers the last `size` sequence
+IDs (relative to the newest one it has seen), which makes both insertion and membership tests O(1).
+
+When forgetting old IDs isn't an option, `SequenceTracker` remembers all of them - as long as the sequence
+is dense (every ID gets used one after another), it only has to store the gaps.
+"""
+
+def sequence_greater_than(a: int, b: int, wrap_at: int) -> bool:
+    "Is the sequence ID `a` newer than `b`? This takes the wrap around into account"
+
+    half = wrap_at // 2
+
+    return (a > b and a - b <= half) or (a < b and b - a > half)
+
+def sequence_distance(newer: int, older: int, wrap_at: int) -> int:
+    "The amount of steps it takes to go from `older` to `newer`, going forwards through the wrap around"
+
+    return (newer - older) % wrap_at
+
+class SequenceWindow:
+    """
+    A set of the most recent sequence IDs. It's a replacement for `CircleSet` specifically made for
+    sequence IDs: it knows which IDs are newer or older, and doesn't need to scan anything to answer
+    whether an ID is present.
+
+    Every ID that is older than the newest one by `size` or more is considered *stale*. Stale IDs are
+    never stored, and the window can't tell whether they were inserted or not - that's for the user
+    to decide (or to use a `SequenceTracker` instead).
+    """
+    def __init__(self, size: int, wrap_at: int):
+        assert size > 0, "A sequence window needs at least a single slot"
+        assert wrap_at % size == 0, "The sequence space should be divisible by the window size, else slots would overlap on wrap around"
+        assert size <= wrap_at // 2, "The window can't be larger than half of the sequence space"
+
+        self.size = size
+        self.wrap_at = wrap_at
+
+        self.flags = bytearray(size)
+        self.latest: int = None
+        "The newest sequence ID inserted into this window. `None` if nothing was inserted yet"
+
+    def _advance_to(self, seq_id: int):
+        "Move the newest ID of this window forward, clearing all the slots we skip on the way"
+
+        distance = sequence_distance(seq_id, self.latest, self.wrap_at)
+
+        if distance >= self.size:
+            # We have jumped over the entire window, so nothing in it is relevant anymore
+            self.flags = bytearray(self.size)
+        else:
+            # The ring is cleared in at most 2 slices: until the end of the ring and from its start
+            start = (self.latest + 1) % self.size
+            end = start + distance
+
+            if end <= self.size:
+                self.flags[start:end] = bytes(distance)
+            else:
+                self.flags[start:] = bytes(self.size - start)
+                self.flags[:end - self.size] = bytes(end - self.size)
+
+        self.latest = seq_id
+
+    def is_stale(self, seq_id: int) -> bool:
+        "Is this ID too old to be tracked by the window?"
+
+        if self.latest is None or sequence_greater_than(seq_id, self.latest, self.wrap_at):
+            return False
+
+        return sequence_distance(self.latest, seq_id, self.wrap_at) >= self.size
+
+    def add(self, seq_id: int):
+        "Insert a sequence ID. Stale IDs are ignored"
+
+        if self.latest is None:
+            self.latest = seq_id
+        elif sequence_greater_than(seq_id, self.latest, self.wrap_at):
+            self._advance_to(seq_id)
+        elif self.is_stale(seq_id):
+            return
+
+        self.flags[seq_id % self.size] = 1
+
+    def __contains__(self, seq_id: int) -> bool:
+        if self.latest is None or sequence_greater_than(seq_id, self.latest, self.wrap_at):
+            return False
+        elif sequence_distance(self.latest, seq_id, self.wrap_at) >= self.size:
+            return False
+
+        return self.flags[seq_id % self.size] == 1
+
+class SequenceTracker:
+    """
+    An exact set of sequence IDs from a dense sequence, like the reliable packets of a connection: every ID
+    gets used, so sooner or later every one of them gets inserted. Instead of the newest IDs it tracks the
+    oldest one that is still missing - everything before it was already inserted. IDs inserted after a gap
+    are kept separately, until the gap closes.
+
+    Unlike a window it never forgets an ID, so it can always tell a late first arrival from a dublicate.
+    It only needs that the inserted IDs are never more than half of the sequence space ahead of the gap.
+    """
+    def __init__(self, wrap_at: int, first: int = 1):
+        self.wrap_at = wrap_at
+        self.first = first
+        "The sequence restarts from this ID after the wrap around (IDs before it are never used)"
+
+        self.missing = first
+        "The oldest ID that wasn't inserted yet"
+        self.ahead: set[int] = set()
+        "IDs that were inserted after `missing`"
+
+    def _next(self, seq_id: int) -> int:
+        seq_id = (seq_id + 1) % self.wrap_at
+        return seq_id if seq_id >= self.first else self.first
+
+    def add(self, seq_id: int):
+        if seq_id == self.missing:
+            self.missing = self._next(self.missing)
+
+            while self.missing in self.ahead:
+                self.ahead.remove(self.missing)
+                self.missing = self._next(self.missing)
+        elif seq_id not in self:
+            self.ahead.add(seq_id)
+
+    def __contains__(self, seq_id: int) -> bool:
+        return sequence_greater_than(self.missing, seq_id, self.wrap_at) or seq_id in self.ahead
@@ -0,0 +1,247 @@
+"""
+Delta compressed state snapshots.
+
+A snapshot is the state of all syncronized entities at some point in time: a dictionary of entity UIDs
+to tuples of their (already quantized) field values. Instead of sending full snapshots every time, the
+sender encodes a snapshot against a *baseline* - an older snapshot that the receiver has acknowledged,
+and thus is guaranteed to have. Only changed entities get sent, and only with their changed fields.
+
+### Format
+```
+[snapshot id: 2][baseline id: 2] ([uid: 2][mask: 1][changed fields...])*
+```
+Every bit in the mask represents a field (in the order the fields were described), and only the fields
+with their bits set are present after the mask. Entities that have disappeared since the baseline
+are sent with only the `REMOVED_BIT` set.
+
+A baseline ID of `NO_BASELINE` means that the snapshot is full (its entities are sent with all fields),
+so it can be decoded without having anything. Since every entity of a full snapshot has the same size,
+full snapshots are encoded and decoded in bulk with numpy structured arrays. Snapshot IDs wrap around the same way network
+sequence IDs do, and `NO_BASELINE` itself is never used as a snapshot ID.
+"""
+
+from .seqwindow import sequence_greater_than
+
+from typing import Optional, Iterable
+
+import struct
+import numpy as np
+
+ENDIAN = "!"
+
+NUMPY_TYPES = {
+    "b": ">i1", "B": "u1", "?": "?",
+    "h": ">i2", "H": ">u2",
+    "i": ">i4", "I": ">u4",
+    "f": ">f4", "d": ">f8"
+}
+"Big-endian (the same as `ENDIAN`) numpy equivalents of `struct` format characters"
+
+SNAPSHOT_HEADER = struct.Struct(ENDIAN+"HH")
+ENTITY_HEADER = struct.Struct(ENDIAN+"HB")
+
+WRAP_SNAPSHOT_IDS = 2**16
+NO_BASELINE = 0
+
+REMOVED_BIT = 1 << 7
+"The mask bit that tells that an entity is no longer in the snapshot"
+
+MAX_SNAPSHOT_FIELDS = 7
+"The last bit of the mask is the removal bit, so the rest can be used by fields"
+
+class SnapshotFormatError(Exception):
+    "The snapshot data was malformed, or its baseline doesn't match"
+
+class SnapshotSchema:
+    """
+    Describes the fields of every entity in a snapshot, using `struct` format characters
+    (for example `("h", "h", "B", "?")`).
+    """
+    def __init__(self, *fields: str):
+        assert 0 < len(fields) <= MAX_SNAPSHOT_FIELDS, f"A snapshot can contain from 1 to {MAX_SNAPSHOT_FIELDS} fields"
+
+        self.fields = fields
+        self.full_mask = (1 << len(fields)) - 1
+
+        # Every possible field combination gets its own precompiled struct
+        self.structs = tuple(
+            struct.Struct(ENDIAN+"".join(field for i, field in enumerate(fields) if mask & (1 << i)))
+            for mask in range(self.full_mask+1)
+        )
+
+        # Full snapshots have a constant size per entity, so they're encoded and decoded as numpy arrays
+        self.full_dtype = np.dtype(
+            [("uid", NUMPY_TYPES["H"]), ("mask", NUMPY_TYPES["B"])] + 
+            [(f"field{i}", NUMPY_TYPES[field]) for i, field in enumerate(fields)]
+        )
+        assert self.full_dtype.itemsize == ENTITY_HEADER.size + self.structs[self.full_mask].size
+
+    def get_changed_mask(self, old: tuple, new: tuple) -> int:
+        mask = 0
+        for i, (old_value, new_value) in enumerate(zip(old, new)):
+            if old_value != new_value:
+                mask |= 1 << i
+
+        return mask
+
+    def encode(
+        self,
+        snapshot_id: int,
+        snapshot: dict[int, tuple],
+        baseline_id: int = NO_BASELINE,
+        baseline: Optional[dict[int, tuple]] = None,
+    ) -> bytes:
+        "Encode a snapshot against a baseline. Without a baseline - the snapshot is encoded in full"
+
+        assert snapshot_id != NO_BASELINE, "This snapshot ID is reserved"
+
+        if baseline is None:
+            return self._encode_full(snapshot_id, snapshot)
+
+        data = bytearray(SNAPSHOT_HEADER.pack(snapshot_id, baseline_id))
+
+        for uid, values in snapshot.items():
+            old_values = baseline.get(uid)
+            mask = self.full_mask if old_values is None else self.get_changed_mask(old_values, values)
+
+            if mask == 0:
+                continue
+
+            data += ENTITY_HEADER.pack(uid, mask)
+            data += self.structs[mask].pack(*(value for i, value in enumerate(values) if mask & (1 << i)))
+
+        for uid in baseline.keys() - snapshot.keys():
+            data += ENTITY_HEADER.pack(uid, REMOVED_BIT)
+
+        return bytes(data)
+
+    def _encode_full(self, snapshot_id: int, snapshot: dict[int, tuple]) -> bytes:
+        entities = np.empty(len(snapshot), self.full_dtype)
+        entities["uid"] = tuple(snapshot.keys())
+        entities["mask"] = self.full_mask
+
+        if len(snapshot) > 0:
+            for i, column in enumerate(zip(*snapshot.values())):
+                entities[f"field{i}"] = column
+
+        return SNAPSHOT_HEADER.pack(snapshot_id, NO_BASELINE) + entities.tobytes()
+
+    def _decode_full(self, data: bytes) -> Optional[dict[int, tuple]]:
+        "Decode a full snapshot without any per-entity parsing. `None` if it's not a proper full snapshot"
+
+        if (len(data) - SNAPSHOT_HEADER.size) % self.full_dtype.itemsize != 0:
+            return None
+
+        entities = np.frombuffer(data, self.full_dtype, offset=SNAPSHOT_HEADER.size)
+        if not np.all(entities["mask"] == self.full_mask):
+            return None
+
+        columns = (entities[f"field{i}"].tolist() for i in range(len(self.fields)))
+
+        return dict(zip(entities["uid"].tolist(), zip(*columns)))
+
+    def decode_header(self, data: bytes) -> tuple[int, int]:
+        "Get the snapshot and baseline IDs of the encoded snapshot"
+
+        try:
+            return SNAPSHOT_HEADER.unpack_from(data)
+        except struct.error:
+            raise SnapshotFormatError("The snapshot is too short")
+
+    def decode(self, data: bytes, baseline: Optional[dict[int, tuple]] = None) -> dict[int, tuple]:
+        """
+        Decode the snapshot, by applying its changes to the baseline it was encoded against.
+        Full snapshots don't need a baseline
+        """
+
+        _, baseline_id = self.decode_header(data)
+
+        if baseline_id == NO_BASELINE:
+            snapshot = self._decode_full(data)
+            if snapshot is not None:
+                return snapshot
+            
+            baseline = {}
+        elif baseline is None:
+            raise SnapshotFormatError("The snapshot was encoded against a baseline, but it wasn't provided")
+
+        snapshot = dict(baseline)
+        offset = SNAPSHOT_HEADER.size
+
+        try:
+            while offset < len(data):
+                uid, mask = ENTITY_HEADER.unpack_from(data, offset)
+                offset += ENTITY_HEADER.size
+
+                if mask & REMOVED_BIT:
+                    snapshot.pop(uid, None)
+                    continue
+
+                values = self.structs[mask].unpack_from(data, offset)
+                offset += self.structs[mask].size
+
+                if mask == self.full_mask:
+                    snapshot[uid] = values
+                    continue
+
+                old_values = snapshot.get(uid)
+                if old_values is None:
+                    raise SnapshotFormatError("A partial entity update without a baseline entity")
+
+                new_values = list(old_values)
+                changed = iter(values)
+                for i in range(len(self.fields)):
+                    if mask & (1 << i):
+                        new_values[i] = next(changed)
+
+                snapshot[uid] = tuple(new_values)
+        except (struct.error, IndexError):
+            raise SnapshotFormatError("Failed to parse the snapshot")
+
+        return snapshot
+
+def next_snapshot_id(snapshot_id: Optional[int]) -> int:
+    "The snapshot ID that comes after this one (`None` if there's none yet). Skips `NO_BASELINE`"
+
+    if snapshot_id is None:
+        return 1
+
+    next_id = (snapshot_id + 1) % WRAP_SNAPSHOT_IDS
+    return next_id if next_id != NO_BASELINE else 1
+
+class SnapshotHistory:
+    """
+    Keeps the last `size` snapshots by their IDs, so they can be used as baselines.
+    It also generates snapshot IDs (when used by the sender)
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.snapshots: dict[int, dict[int, tuple]] = {}
+        self.latest: Optional[int] = None
+
+    def next_id(self) -> int:
+        "The ID that comes after the latest one"
+        return next_snapshot_id(self.latest)
+
+    def is_newer(self, snapshot_id: int) -> bool:
+        "Is this ID newer than the latest snapshot in the history?"
+        return self.latest is None or sequence_greater_than(snapshot_id, self.latest, WRAP_SNAPSHOT_IDS)
+
+    def push(self, snapshot_id: int, snapshot: dict[int, tuple]):
+        "Insert a snapshot. It will become the latest one, and the oldest snapshots will get forgotten"
+
+        self.snapshots[snapshot_id] = snapshot
+        self.latest = snapshot_id
+
+        # Dictionaries keep their insertion order, so the first ones are the oldest
+        while len(self.snapshots) > self.size:
+            del self.snapshots[next(iter(self.snapshots))]
+
+    def get(self, snapshot_id: int) -> Optional[dict[int, tuple]]:
+        return self.snapshots.get(snapshot_id)
+
+    def get_ids(self) -> Iterable[int]:
+        return self.snapshots.keys()
+
+    def get_latest(self) -> Optional[dict[int, tuple]]:
+        return None if self.latest is None else self.snapshots[self.latest]
@@ -54,4 +54,42 @@ class Tilemap:
             if (tile := self.get_tile(tx, ty)) != 0:
                 neighbours[ind] = tile
 
-        return tuple(neighbours)
\ No newline at end of file
+        return tuple(neighbours)
+
+    def is_line_blocked(self, start: tuple[float, float], end: tuple[float, float], blocking: set[int]) -> bool:
+        """
+        Check whether a line between 2 points (in tile coordinates) crosses any of the blocking tiles.
+        Points outside of the grid are considered blocked.
+
+        This walks through every tile the line crosses (a DDA traversal), so it's precise.
+        """
+
+        x, y = int(np.floor(start[0])), int(np.floor(start[1]))
+        end_x, end_y = int(np.floor(end[0])), int(np.floor(end[1]))
+        dx, dy = end[0]-start[0], end[1]-start[1]
+
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+
+        # How far along the line (from 0 to 1) we have to go to cross a single tile on each axis,
+        # and where the next crossing of each axis is
+        delta_x = abs(1/dx) if dx != 0 else np.inf
+        delta_y = abs(1/dy) if dy != 0 else np.inf
+        next_x = ((x+1-start[0]) if dx > 0 else (start[0]-x)) * delta_x
+        next_y = ((y+1-start[1]) if dy > 0 else (start[1]-y)) * delta_y
+
+        w, h = self.get_size()
+
+        # Every step crosses exactly one tile border, so the line visits this many tiles
+        for _ in range(abs(end_x-x) + abs(end_y-y) + 1):
+            if not (0 <= x < w and 0 <= y < h) or self.tiles[y][x] in blocking:
+                return True
+
+            if next_x < next_y:
+                x += step_x
+                next_x += delta_x
+            else:
+                y += step_y
+                next_y += delta_y
+
+        return False
@@ -0,0 +1,63 @@
+"""
+A local relay that simulates bad network conditions between game clients and a server (see the network simulation
+module). Clients should connect to the relay's address instead of the server's.
+
+For example, 100ms of latency with 20ms of jitter, 2% loss and occasional loss bursts in both directions:
+```
+python netsim.py --target 192.168.0.2:5000 --latency 0.1 --jitter 0.02 --loss 0.02 --burst-start 0.01 --burst-loss 0.5
+```
+"""
+
+from modules.netsim import NetworkRelay, NetworkConditions
+from modules.network import get_current_ip
+
+from argparse import ArgumentParser
+
+def parse_addr(addr: str) -> tuple[str, int]:
+    ip, port = addr.rsplit(":", 1)
+    return ip, int(port)
+
+def main():
+    parser = ArgumentParser(description="Relay packets to a server through a simulated network")
+    parser.add_argument("--target", type=parse_addr, required=True, help="The server's address (ip:port)")
+    parser.add_argument("--port", type=int, default=0, help="The port to listen on (0 picks any free port)")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of all random decisions")
+
+    # Both directions get the same conditions
+    parser.add_argument("--latency", type=float, default=0, help="One-way latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="Random delay on top of the latency, in seconds")
+    parser.add_argument("--loss", type=float, default=0, help="The probability to lose a packet")
+    parser.add_argument("--burst-start", type=float, default=0, help="The probability for a loss burst to start")
+    parser.add_argument("--burst-end", type=float, default=0.25, help="The probability for a loss burst to end")
+    parser.add_argument("--burst-loss", type=float, default=0, help="The probability to lose a packet during a burst")
+    parser.add_argument("--reordering", type=float, default=0, help="The probability to delay a packet behind the next ones")
+    parser.add_argument("--bandwidth", type=float, default=None, help="The bandwidth in bytes per second")
+    parser.add_argument("--dublicates", type=float, default=0, help="The probability to dublicate a packet")
+    parser.add_argument("--corruption", type=float, default=0, help="The probability to corrupt a packet")
+    args = parser.parse_args()
+
+    conditions = NetworkConditions(
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        burst_loss=args.burst_loss,
+        burst_start=args.burst_start,
+        burst_end=args.burst_end,
+        reordering=args.reordering,
+        bandwidth=args.bandwidth,
+        dublicates=args.dublicates,
+        corruption=args.corruption
+    )
+
+    relay = NetworkRelay((get_current_ip(), args.port), args.target, conditions, conditions, args.seed)
+    print("Relaying", relay.get_addr(), "to", args.target)
+
+    try:
+        relay.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.close()
+
+if __name__ == "__main__":
+    main()
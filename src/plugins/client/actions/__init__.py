@@ -8,9 +8,8 @@ from plugins.shared.services.network import Client
 from plugins.shared.actions import ActionDispatcher, Action
 
 from plugins.rpcs.server import *
-from plugins.rpcs.pack import pack_velocity, pack_angle
 
-from typing import Callable, Optional, Any
+from typing import Callable, Optional, Any, Sequence
 
 class ClientAction(Action):
     """
@@ -26,24 +25,15 @@ class ClientAction(Action):
         self.args: tuple[Any, ...] = args
 
 class ControlAction(ClientAction):
-    "Tell the player the position and velocity of your player"
-
-    def __init__(
-        self, 
-        pos: tuple[int, int], 
-        vel: tuple[float, float],
-        angle: float,
-        angle_vel: float,
-        is_shooting: bool 
-    ):
+    """
+    Send the latest control inputs of your player (see `control_player_rpc`), and how far in the past we see 
+    other players (the server rewinds them by as much when checking our shots)
+    """
+
+    def __init__(self, latest_tick: int, inputs: Sequence[bytes], snapshot_delay: float):
         super().__init__(
             control_player_rpc, 
-            (
-                int(pos[0]), int(pos[1]), *pack_velocity(*vel),
-                pack_angle(angle), 
-                int(angle_vel), 
-                is_shooting
-            )
+            (CONTROL_INPUTS_HEADER.pack(latest_tick, len(inputs), pack_snapshot_delay(snapshot_delay)) + b"".join(inputs), )
         )
 
 class SignalPlayerReadyAction(ClientAction):
@@ -55,6 +45,24 @@ class SignalPlayerReadyAction(ClientAction):
             (is_ready, )
         )
 
+class AcknowledgeSnapshotAction(ClientAction):
+    "Tell the server that we have received a players snapshot, so it can send the next ones relative to it"
+
+    def __init__(self, snapshot_id: int):
+        super().__init__(
+            acknowledge_snapshot_rpc,
+            (snapshot_id, )
+        )
+
+class RequestTimeSyncAction(ClientAction):
+    "Ask the server for its time. The current time of our clock gets echoed back (see `ServerTime`)"
+
+    def __init__(self, client_time: float):
+        super().__init__(
+            request_time_sync_rpc,
+            (client_time, )
+        )
+
 class ClientActionDispatcher(ActionDispatcher):
     """
     A dispatcher is a command dispatcher for network actions. You push your actions directly here,
@@ -1,4 +1,5 @@
-from modules.inteprolation import Interpolated, InterpolatedDegrees, compute_time_alpha
+from modules.inteprolation import Interpolated, InterpolatedDegrees, SnapshotBuffer, SnapshotBufferDegrees
+from plugins.shared.constants import MAX_EXTRAPOLATION_TIME
 from plugins.shared.components import *
 
 @component
@@ -52,22 +53,18 @@ class InterpolatedPosition:
     
     This component however shouldn't be applied to the client, as it controls their own movement
     without much jitter.
+
+    Positions are kept in a jitter buffer, so a late or lost packet doesn't make the entity snap
+    (see `SnapshotBuffer`)
     """
     def __init__(self):
-        self.interpolated = Interpolated(pg.Vector2(0, 0))
-
-        self.time: tuple[float, float] = (0, 0)
-        "The time used when interpolating. It gets swapped every time a new position gets introduced."
+        self.interpolated = SnapshotBuffer(pg.Vector2(0, 0), max_extrapolation=MAX_EXTRAPOLATION_TIME)
 
     def push_position(self, time: float, new_x: float, new_y: float):
-        self.interpolated.push_value(pg.Vector2(new_x, new_y))
-        self.time = (self.time[-1], time)
+        self.interpolated.push_sample(time, pg.Vector2(new_x, new_y))
 
     def get_interpolated(self, current_time: float) -> pg.Vector2:
-        prelast, last = self.time
-        alpha = compute_time_alpha(prelast, last, current_time)
-
-        return self.interpolated.get_interpolated(alpha)
+        return self.interpolated.get_interpolated(current_time)
 
 @component
 class InterpolatedAngle:
@@ -75,22 +72,13 @@ class InterpolatedAngle:
     Essentially the same as `InterpolatedPosition`, but for angles (directions)
     """
     def __init__(self):
-        self.interpolated = InterpolatedDegrees(0)
-
-        self.time: tuple[float, float] = (0, 0)
-        "The time used when interpolating. It gets swapped every time a new position gets introduced."
+        self.interpolated = SnapshotBufferDegrees(0, max_extrapolation=MAX_EXTRAPOLATION_TIME)
 
     def push_angle(self, time: float, new_angle: float):
-        self.interpolated.push_value(new_angle)
-
-        self.time = (self.time[-1], time)
+        self.interpolated.push_sample(time, new_angle)
 
     def get_interpolated(self, current_time: float) -> float:
-        prelast, last = self.time
-
-        alpha = compute_time_alpha(prelast, last, current_time)
-
-        return self.interpolated.get_interpolated(alpha)
+        return self.interpolated.get_interpolated(current_time)
 
 @component
 class PerspectiveAttachment:
@@ -16,9 +16,11 @@ def on_spawn_diamonds_command(resources: Resources, command: SpawnDiamondsComman
     world = resources[WorldECS]
     assets = resources[AssetManager]
 
-    for (uid, pos) in command.diamonds:
+    diamonds = command.diamonds
+
+    for uid, posx, posy in zip(diamonds["uid"].tolist(), diamonds["x"].tolist(), diamonds["y"].tolist()):
         world.create_entity(
-            *make_client_diamond(uid, pos, assets)
+            *make_client_diamond(uid, (posx, posy), assets)
         )
 
 class DiamondHandlersPlugin(Plugin):
@@ -1,7 +1,8 @@
-from plugin import Plugin, Resources
+from plugin import Plugin, Resources, EventWriter
 
 from core.ecs import WorldECS
 from core.events import ComponentsAddedEvent
+from core.time import Clock
 
 from plugins.client.components import *
 
@@ -9,37 +10,117 @@ from plugins.client.commands import *
 
 from plugins.shared.services.uidman import EntityUIDManager
 
-from plugins.client.services.session import ServerTime
+from plugins.client.services.session import ServerTime, ReceivedSnapshots, InputHistory, SnapshotDelay
+from plugins.client.actions import ClientActionDispatcher, AcknowledgeSnapshotAction
+from plugins.rpcs.pack import unpack_angle
 from plugins.client.components import MainPlayer
 
-from plugins.shared.constants import SNAP_PLAYER_POSITION_DISTANCE
+from plugins.shared.services.collisions import resolve_static_collisions
+from plugins.shared.systems.base import move_entity, rotate_entity
+from plugins.shared.systems.player import orient_player
+
+import numpy as np
+
+PREDICTION_TOLERANCE = 0.5
+"""
+How far (in pixels) our predicted position can be from the server's before we replay our inputs.
+Other players aren't replayed (we don't know where they were), so pushing them around is usually corrected this way
+"""
+
+ANGLE_PREDICTION_TOLERANCE = 0.01
+"The same as `PREDICTION_TOLERANCE`, but for angles (in radians)"
+
+def on_sync_players_snapshot_command(resources: Resources, command: SyncPlayersSnapshotCommand):
+    "Decode a players snapshot, acknowledge it and sync all players in it"
+
+    snapshot = resources[ReceivedSnapshots].receive(command.snapshot_id, command.baseline_id, command.data)
+    if snapshot is None:
+        return
+    
+    resources[ClientActionDispatcher].dispatch_action(AcknowledgeSnapshotAction(command.snapshot_id))
+    resources[SnapshotDelay].push_arrival(resources[ServerTime].get_current_time())
+
+    if len(snapshot) > 0:
+        resources[EventWriter].push_event(SyncPlayersCommand(tuple(
+            (uid, (posx, posy), unpack_angle(angle), is_shooting)
+            for uid, (posx, posy, angle, is_shooting) in snapshot.items()
+        )))
 
 def on_sync_players_command(resources: Resources, command: SyncPlayersCommand):
     "Apply net syncronization on all requested players"
 
     world = resources[WorldECS]
     uidman = resources[EntityUIDManager]
-    server_timer = resources[ServerTime]
-    server_time = resources[ServerTime].get_current_time() + server_timer.get_server_offset()
+    server_time = resources[ServerTime].get_server_time()
 
     for (uid, new_pos, new_angle, is_shooting) in command.entries:
         ent = uidman.get_ent(uid)
         if ent is None:
             continue
         
-        is_main = world.has_component(ent, MainPlayer)
-        if is_main and world.has_component(ent, Position):
-            pos = world.get_component(ent, Position)
-
-            if pos.get_position().distance_to(new_pos) > SNAP_PLAYER_POSITION_DISTANCE:
-                pos.set_position(*new_pos)
-        elif world.has_components(ent, InterpolatedPosition, InterpolatedAngle, PlayerController):
+        if world.has_component(ent, MainPlayer):
+            # Our own player is predicted, and corrected with `SyncPlayerStateCommand` instead
+            continue
+        
+        if world.has_components(ent, InterpolatedPosition, InterpolatedAngle, PlayerController):
 
             pos, angle, controller = world.get_components(ent, InterpolatedPosition, InterpolatedAngle, PlayerController)
             pos.push_position(server_time, *new_pos)
             angle.push_angle(server_time, new_angle)
             controller.is_shooting = is_shooting
 
+def on_sync_player_state_command(resources: Resources, command: SyncPlayerStateCommand):
+    """
+    Compare the server's state of our player with the one we have predicted for the same input tick. If they
+    differ - return to the server's state, and replay all our inputs that the server hasn't applied yet, using the same
+    code the simulation does
+    """
+
+    world = resources[WorldECS]
+    history = resources[InputHistory]
+    dt = resources[Clock].get_fixed_delta()
+
+    predicted = history.get(command.input_tick)
+    if predicted is None:
+        # Either too old, or from before our current player
+        return
+    
+    angle_error = abs(predicted.angle - command.angle) % (2*np.pi)
+    angle_error = min(angle_error, 2*np.pi - angle_error)
+
+    if predicted.pos.distance_to(command.pos) <= PREDICTION_TOLERANCE and angle_error <= ANGLE_PREDICTION_TOLERANCE:
+        return
+
+    for ent, (pos, vel, angle, angle_vel, controller) in world.query_components(
+        Position, 
+        Velocity, 
+        Angle, 
+        AngleVelocity, 
+        PlayerController, 
+        including=MainPlayer
+    ):
+        pos.set_position(*command.pos)
+        angle.set_angle(command.angle)
+        predicted.set_state(pos.get_position(), angle.get_angle())
+
+        collider = world.get_component(ent, DynCollider) if world.has_component(ent, DynCollider) else None
+
+        for replayed in history.get_after(command.input_tick):
+            controller.forward_dir = replayed.forward_dir
+            controller.horizontal_dir = replayed.horizontal_dir
+            angle_vel.set_velocity(replayed.turn_dir)
+
+            orient_player(controller, vel, angle)
+            move_entity(pos, vel, dt)
+            rotate_entity(angle, angle_vel, dt)
+
+            if collider is not None:
+                resolve_static_collisions(resources, pos, collider)
+
+            replayed.set_state(pos.get_position(), angle.get_angle())
+
+        break
+
 def on_kill_entity_command(resources: Resources, command: KillEntityCommand):
     "When we receive an entity kill command from the server - we should kill said entity"
 
@@ -77,7 +158,9 @@ def on_sync_health_command(resources: Resources, command: SyncHealthCommand):
 
 class SessionHandlersPlugin(Plugin):
     def build(self, app):
+        app.add_event_listener(SyncPlayersSnapshotCommand, on_sync_players_snapshot_command)
         app.add_event_listener(SyncPlayersCommand, on_sync_players_command)
+        app.add_event_listener(SyncPlayerStateCommand, on_sync_player_state_command)
         app.add_event_listener(KillEntityCommand, on_kill_entity_command)
 
         app.add_event_listener(ComponentsAddedEvent, on_new_main_player)
@@ -0,0 +1,408 @@
+"""
+Headless load-generating bots, for stress testing servers (see `loadbot.py`).
+
+Every bot is a real game client: it connects with the same `Client`, RPCs, channels and compressor, sends its
+inputs and acknowledgements through the client action dispatcher, and decodes the players snapshots it receives.
+It only skips everything that isn't needed to talk to the server: there's no display, no rendering and no ECS world.
+Since bots don't run an app, they read the events pushed by their RPCs themselves.
+
+Bots can't see inside the server, so the server's load is measured from the outside:
+- Latency is the round trip time of time sync requests (see `ServerTime`). Requests are answered when the server
+processes them, so unlike pings at the network layer (which are reported as well) - it includes the time they wait
+for the server's tick.
+- The server's tick is measured by the interval between the snapshots it sends. A server that can't keep up
+with its fixed ticks sends its snapshots late, and in bursts.
+
+Bots measure everything on their own ticks, so the measurements are only as precise as the bots' tick rate. If
+the bots themselves fall behind (their tick time gets close to the fixed delta) - spread them across more processes
+"""
+
+from plugin import Resources, EventWriter
+
+from plugins.shared.services.network import Client, RPCCallerAddress
+from plugins.shared.events.network import ServerConnectedEvent, ServerDisonnectedEvent, ServerConnectionFailEvent
+
+from plugins.client.actions import (
+    ClientActionDispatcher,
+    ControlAction,
+    SignalPlayerReadyAction,
+    AcknowledgeSnapshotAction,
+    RequestTimeSyncAction
+)
+from plugins.client.services.session import ReceivedSnapshots, InputHistory, ServerTime
+
+from plugins.rpcs.client import CLIENT_RPCS, SyncPlayersSnapshotCommand, SyncTimeCommand
+from plugins.rpcs.channels import CHANNELS
+from plugins.rpcs.compression import COMPRESSOR
+from plugins.shared.constants import INTERPOLATION_TIME_DELAY
+
+from modules.network import ConnectionStats, sum_connection_stats
+
+from typing import Optional, Sequence, Union, Callable
+from time import perf_counter, sleep
+
+import numpy as np
+import random
+
+INPUT_SEND_RATE = 1/20
+"How often bots send their inputs, the same as real clients"
+
+ControlInput = tuple[int, int, int, bool]
+"Forward, horizontal and turning directions (from -1 to 1), and whether the player is shooting"
+
+class RandomInputs:
+    "Random controls, held for a random amount of time each, like a restless player"
+
+    def __init__(self, rng: random.Random, min_hold: float = 0.2, max_hold: float = 1.5, shoot_chance: float = 0.3):
+        self.rng = rng
+        self.min_hold = min_hold
+        self.max_hold = max_hold
+        self.shoot_chance = shoot_chance
+
+        self.current: ControlInput = (0, 0, 0, False)
+        self.hold = 0.0
+
+    def next_input(self, dt: float) -> ControlInput:
+        "The input of the next fixed tick"
+
+        self.hold -= dt
+        if self.hold <= 0:
+            rng = self.rng
+            self.current = (rng.randint(-1, 1), rng.randint(-1, 1), rng.randint(-1, 1), rng.random() < self.shoot_chance)
+            self.hold = rng.uniform(self.min_hold, self.max_hold)
+
+        return self.current
+
+class ScriptedInputs:
+    "Controls that follow a script of steps in a loop (see `load_input_script`)"
+
+    def __init__(self, steps: Sequence[tuple[float, ControlInput]], offset: float = 0):
+        """
+        Every step is its duration (in seconds) and the input held during it. Bots with different offsets
+        (in seconds) play the same script, but out of sync
+        """
+        assert len(steps) > 0 and all(duration > 0 for duration, _ in steps), "A script needs steps that take time"
+
+        self.steps = steps
+        self.time = offset % sum(duration for duration, _ in steps)
+
+    def next_input(self, dt: float) -> ControlInput:
+        "The input of the next fixed tick"
+
+        self.time = (self.time + dt) % sum(duration for duration, _ in self.steps)
+
+        elapsed = 0
+        for duration, control in self.steps:
+            elapsed += duration
+            if self.time < elapsed:
+                return control
+
+        return self.steps[-1][1]
+
+InputBehaviour = Union[RandomInputs, ScriptedInputs]
+
+def load_input_script(path: str) -> list[tuple[float, ControlInput]]:
+    """
+    Load the steps of an input script. Every line is a step: its duration in seconds, the forward, horizontal
+    and turning directions, and whether to shoot (0 or 1). Empty lines and lines starting with `#` are skipped.
+    For example, walking in circles while shooting every other second:
+    ```
+    # duration forward horizontal turn shoot
+    1 1 0 1 0
+    1 1 0 1 1
+    ```
+    """
+
+    steps = []
+    with open(path) as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                duration, forward_dir, horizontal_dir, turn_dir, is_shooting = line.split()
+                control = (int(forward_dir), int(horizontal_dir), int(turn_dir), bool(int(is_shooting)))
+                steps.append((float(duration), control))
+            except ValueError:
+                raise ValueError(f"Line {line_number} of the input script should have 5 numbers: {line}")
+
+            assert all(-1 <= direction <= 1 for direction in control[:3]), f"Line {line_number}: directions are from -1 to 1"
+
+    return steps
+
+class LoadBot:
+    """
+    A single simulated player. It has its own resources, so the RPCs of different bots don't mix.
+    After connecting it signals that it's ready (after `ready_after` seconds, or never if it's `None`),
+    and then keeps sending the inputs of its behaviour
+    """
+
+    def __init__(
+        self,
+        addr: tuple[str, int],
+        behaviour: InputBehaviour,
+        room_id: Optional[int] = None,
+        ready_after: Optional[float] = 0
+    ):
+        self.resources = Resources()
+        self.resources.insert(EventWriter())
+        self.resources.insert(RPCCallerAddress())
+
+        self.client = Client(self.resources, CLIENT_RPCS, CHANNELS, COMPRESSOR)
+        self.resources.insert(self.client)
+
+        self.dispatcher = ClientActionDispatcher(self.resources)
+        self.snapshots = ReceivedSnapshots()
+        self.inputs = InputHistory()
+
+        self.behaviour = behaviour
+        self.ready_after = ready_after
+
+        self.connected = False
+        self.failed = False
+        "Failed to connect, or got disconnected later"
+        self.stats = ConnectionStats()
+        "The latest statistics of the connection. They stay after disconnecting"
+
+        self.connected_time = 0.0
+        "For how long the bot is connected"
+        self.next_input_send = 0.0
+        self.next_time_sync = 0.0
+        self.signaled_ready = False
+
+        self.last_snapshot_at: Optional[float] = None
+        self.snapshot_intervals: list[float] = []
+        "Since the last report, in seconds"
+        self.latencies: list[float] = []
+        "Round trip times of time sync requests since the last report, in seconds"
+
+        self.client.try_connect(addr, room_id)
+
+    def is_active(self) -> bool:
+        "Whether the bot is still connecting or connected"
+        return not self.failed
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def get_stats(self) -> ConnectionStats:
+        return self.stats
+
+    def take_samples(self) -> tuple[list[float], list[float]]:
+        "Take the snapshot intervals and latencies measured since the last call"
+
+        samples = self.snapshot_intervals, self.latencies
+        self.snapshot_intervals, self.latencies = [], []
+
+        return samples
+
+    def _on_snapshot(self, command: SyncPlayersSnapshotCommand):
+        # Same as real clients, only decoded snapshots get acknowledged
+        if self.snapshots.receive(command.snapshot_id, command.baseline_id, command.data) is None:
+            return
+
+        self.dispatcher.dispatch_action(AcknowledgeSnapshotAction(command.snapshot_id))
+
+        now = perf_counter()
+        if self.last_snapshot_at is not None:
+            self.snapshot_intervals.append(now - self.last_snapshot_at)
+        self.last_snapshot_at = now
+
+    def _handle_events(self):
+        ewriter = self.resources[EventWriter]
+
+        for event in ewriter.read_events():
+            if isinstance(event, SyncPlayersSnapshotCommand):
+                self._on_snapshot(event)
+            elif isinstance(event, SyncTimeCommand):
+                self.latencies.append(perf_counter() - event.client_time)
+            elif isinstance(event, ServerConnectedEvent):
+                self.connected = True
+            elif isinstance(event, (ServerDisonnectedEvent, ServerConnectionFailEvent)):
+                self.connected = False
+                self.failed = True
+
+        ewriter.clear_events()
+
+    def _send_actions(self, dt: float):
+        self.connected_time += dt
+
+        self.inputs.push(*self.behaviour.next_input(dt))
+
+        if self.connected_time >= self.next_input_send:
+            self.next_input_send += INPUT_SEND_RATE
+            # Bots don't interpolate anything, so they report the shortest delay
+            self.dispatcher.dispatch_action(ControlAction(
+                self.inputs.get_latest_tick(), 
+                self.inputs.get_inputs(), 
+                INTERPOLATION_TIME_DELAY
+            ))
+
+        if self.connected_time >= self.next_time_sync:
+            self.next_time_sync += ServerTime.SYNC_RATE
+            self.dispatcher.dispatch_action(RequestTimeSyncAction(perf_counter()))
+
+        if not self.signaled_ready and self.ready_after is not None and self.connected_time >= self.ready_after:
+            self.signaled_ready = True
+            self.dispatcher.dispatch_action(SignalPlayerReadyAction(True))
+
+    def tick(self, dt: float):
+        "A single fixed tick: receive everything, react to it, and send our own actions"
+
+        if self.failed:
+            return
+
+        self.client.tick(dt)
+        if self.client.is_connected():
+            self.stats = self.client.get_stats()
+
+        self._handle_events()
+
+        if self.connected:
+            self._send_actions(dt)
+
+    def close(self):
+        self.client.close()
+
+def _format_percentiles(samples: list[float], percentiles: tuple[int, ...] = (50, 95, 99)) -> str:
+    "Percentiles of samples in seconds, formatted in milliseconds"
+
+    if not samples:
+        return " ".join(f"p{percentile} -" for percentile in percentiles)
+
+    values = np.percentile(samples, percentiles) * 1000
+    return " ".join(f"p{percentile} {value:.0f}ms" for percentile, value in zip(percentiles, values))
+
+class BotSwarm:
+    """
+    Many bots in a single process, spawned gradually (a real crowd doesn't connect within a single tick).
+    Every report covers the time since the previous one
+    """
+
+    def __init__(
+        self,
+        addr: tuple[str, int],
+        bots: int,
+        make_behaviour: Callable[[random.Random], InputBehaviour],
+        room_id: Optional[int] = None,
+        ready_after: Optional[float] = 0,
+        spawn_rate: float = 10,
+        seed: int = 0
+    ):
+        """
+        Every bot gets a behaviour from `make_behaviour`, with its own random generator (seeded by the bot's index).
+        The spawn rate is in bots per second
+        """
+        self.addr = addr
+        self.bot_count = bots
+        self.make_behaviour = make_behaviour
+        self.room_id = room_id
+        self.ready_after = ready_after
+        self.spawn_rate = spawn_rate
+        self.seed = seed
+
+        self.bots: list[LoadBot] = []
+        self.spawn_credit = 1.0
+        "The first bot spawns right away"
+
+        self.time = 0.0
+        self.tick_times: list[float] = []
+        "How long every tick of all bots took since the last report, in seconds"
+
+        self.last_report_time = 0.0
+        self.last_stats = ConnectionStats()
+
+    def _spawn_bots(self, dt: float):
+        self.spawn_credit += self.spawn_rate * dt
+
+        while self.spawn_credit >= 1 and len(self.bots) < self.bot_count:
+            self.spawn_credit -= 1
+
+            rng = random.Random(self.seed + len(self.bots))
+            self.bots.append(LoadBot(self.addr, self.make_behaviour(rng), self.room_id, self.ready_after))
+
+    def tick(self, dt: float):
+        started_at = perf_counter()
+
+        self.time += dt
+        self._spawn_bots(dt)
+
+        for bot in self.bots:
+            if not bot.is_active():
+                continue
+
+            bot.tick(dt)
+
+        self.tick_times.append(perf_counter() - started_at)
+
+    def _get_total_stats(self) -> ConnectionStats:
+        # The round trip time and the loss are only averaged between connected bots, but failed ones still count
+        # for the traffic they've made
+        total = sum_connection_stats(bot.get_stats() for bot in self.bots if bot.is_connected())
+        for bot in self.bots:
+            if not bot.is_connected():
+                total.add(bot.get_stats())
+
+        return total
+
+    def report(self) -> str:
+        "A single line summary of everything since the previous report"
+
+        elapsed = max(self.time - self.last_report_time, 1e-9)
+        self.last_report_time = self.time
+
+        stats = self._get_total_stats()
+        last_stats, self.last_stats = self.last_stats, stats
+
+        snapshot_intervals, latencies = [], []
+        for bot in self.bots:
+            intervals, bot_latencies = bot.take_samples()
+            snapshot_intervals.extend(intervals)
+            latencies.extend(bot_latencies)
+
+        tick_times, self.tick_times = self.tick_times, []
+
+        connected = sum(bot.is_connected() for bot in self.bots)
+        failed = sum(not bot.is_active() for bot in self.bots)
+        snapshot_rate = len(snapshot_intervals) / elapsed / max(connected, 1)
+
+        return (
+            f"[{self.time:7.1f}s] bots {connected}/{self.bot_count} ({failed} failed)"
+            f" | up {(stats.bytes_sent - last_stats.bytes_sent) / elapsed / 1024:.1f} kB/s"
+            f" down {(stats.bytes_received - last_stats.bytes_received) / elapsed / 1024:.1f} kB/s"
+            f" resent {(stats.resent - last_stats.resent) / elapsed:.1f}/s loss {stats.loss*100:.1f}%"
+            f" | ping {'-' if stats.rtt is None else f'{stats.rtt*1000:.0f}ms'} latency {_format_percentiles(latencies)}"
+            f" | snapshots {snapshot_rate:.1f}/s interval {_format_percentiles(snapshot_intervals, (50, 99, 100))}"
+            f" | bot tick {_format_percentiles(tick_times, (50, 99))}"
+        )
+
+    def close(self):
+        for bot in self.bots:
+            bot.close()
+
+def run_swarm(swarm: BotSwarm, fixed_fps: int, duration: Optional[float] = None, report_rate: float = 5):
+    """
+    Tick the swarm at a fixed rate and print a report every `report_rate` seconds, until the duration passes
+    (or forever if it's `None`). If the bots fall far behind - they skip the missed ticks instead of catching up
+    """
+
+    dt = 1/fixed_fps
+    next_tick = perf_counter()
+    next_report = report_rate
+
+    while duration is None or swarm.time < duration:
+        now = perf_counter()
+        if now < next_tick:
+            sleep(next_tick - now)
+            continue
+
+        swarm.tick(dt)
+
+        next_tick += dt
+        if perf_counter() - next_tick > 1:
+            next_tick = perf_counter()
+
+        if swarm.time >= next_report:
+            next_report += report_rate
+            print(swarm.report())
@@ -10,7 +10,7 @@ from plugins.shared.services.network import clean_network_actors, Client
 
 from plugins.server import ServerExecutor
 
-from plugins.client.services.session import ServerTime
+from plugins.client.services.session import ServerTime, ReceivedSnapshots, InputHistory, SnapshotDelay
 
 from .gui import *
 
@@ -55,6 +55,9 @@ class IngameScene(SceneBundle):
 
         # Reset and stop our server time
         resources[ServerTime].stop_and_reset()
+        resources[ReceivedSnapshots].reset()
+        resources[InputHistory].reset()
+        resources[SnapshotDelay].reset()
 
 class IngamePlugin(Plugin):
     def build(self, app):
@@ -12,6 +12,8 @@ from plugins.client.events import ServerConnectedEvent
 from plugins.client.commands import ClearGUICommand, ReplaceGUICommand, CheckoutScene, CheckoutSceneCommand
 
 from plugins.rpcs.client import CLIENT_RPCS
+from plugins.rpcs.channels import CHANNELS
+from plugins.rpcs.compression import COMPRESSOR
 
 from plugins.rpcs.listener import AvailableServerCommand
 
@@ -52,9 +54,9 @@ class MainMenuGUI:
         )
 
         def start_game_session():
-            new_client = Client(self.resources, CLIENT_RPCS)
-            addr = self.resources[ServerExecutor].start_server()
-            new_client.try_connect(addr)
+            new_client = Client(self.resources, CLIENT_RPCS, CHANNELS, COMPRESSOR)
+            addr, room_id = self.resources[ServerExecutor].start_server()
+            new_client.try_connect(addr, room_id)
             insert_network_actor(self.resources, new_client)            
 
         create_btn = (TextButton(font, "Create Game", (0.5, 0.5), MainMenuGUI.BUTTON_SIZE, text_scale=0.5)
@@ -114,8 +116,8 @@ def on_connection_accepted(resources: Resources, _: ServerConnectedEvent):
 def on_available_server(resources: Resources, command: AvailableServerCommand):
     "The currently lazy approach is to simply automatically connect to any available server this client sees."
 
-    new_client = Client(resources, CLIENT_RPCS)
-    new_client.try_connect(command.addr)
+    new_client = Client(resources, CLIENT_RPCS, CHANNELS, COMPRESSOR)
+    new_client.try_connect(command.addr, command.room_id)
     insert_network_actor(resources, new_client)
 
 class MainMenuGUIPlugin(Plugin):
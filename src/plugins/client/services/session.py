@@ -2,21 +2,37 @@
 
 from core.time import Clock
 
-from plugins.client.commands import SyncTimeCommand
+from plugins.client.commands import SyncTimeCommand, SYNC_PLAYERS_SCHEMA
+from plugins.rpcs.server import CONTROL_PLAYER_SCHEMA, INPUT_REDUNDANCY, WRAP_INPUT_TICKS
+
+from modules.snapshot import SnapshotHistory, SnapshotFormatError, NO_BASELINE
+from modules.inteprolation import InterpolationDelay
+from modules.clocksync import ClockSync
+
+from plugins.shared.constants import INTERPOLATION_TIME_DELAY, MAX_INTERPOLATION_TIME_DELAY
 
 from plugin import Plugin, Resources, Schedule
 
 from collections import deque
+from itertools import islice
+from typing import Optional
+
+import pygame as pg
 
 class ServerTime:
-    SERVER_OFFSETS = 5
-    "We will store 5 different offsets and average them"
+    """
+    Our clock, and the estimated offset of the server's clock from it. We periodically ask the server for
+    its time, and take the round trip time of every request into account (see the clock sync module)
+    """
+
+    SYNC_RATE = 1
+    "How often (in seconds) we ask the server for its time"
 
     def __init__(self):
         self.current_time = 0
         self.ticking = False
 
-        self.server_offsets: deque[float] = deque()
+        self.server_clock = ClockSync()
 
     def start(self):
         "Start this clock"
@@ -27,49 +43,183 @@ class ServerTime:
         self.ticking = False
         self.current_time = 0
 
-        self.server_offsets.clear()
+        self.server_clock.reset()
+
+    def is_ticking(self) -> bool:
+        return self.ticking
 
     def tick(self, dt: float):
         if self.ticking:
             self.current_time += dt
+            self.server_clock.update(dt)
 
-    def sync_time(self, new_time: float):
+    def sync_time(self, sent_at: float, server_received_at: float, server_sent_at: float):
         """
-        Syncronize this time with the server's. It takes 2 arguments: the timestamp (to know when
-        the packet command was issued) and the current server time.
+        Syncronize this time with the server's, using the server's answer to our request sent at `sent_at`
+        (by our clock). Answers to requests from before a reset are ignored
         """
 
-        # Add the difference as the last entry
-        self.server_offsets.append(new_time-self.current_time)
-
-        # If we have more than the maximum amount of offsets - remove the oldest one
-        if len(self.server_offsets) > ServerTime.SERVER_OFFSETS:
-            self.server_offsets.popleft()
-
-    def _get_average_offset(self) -> float:
-        "Return the average server offset. Will raise an exception if the queue is empty"
-
-        return sum(self.server_offsets) / len(self.server_offsets)
+        if self.ticking and sent_at <= self.current_time:
+            self.server_clock.push_sample(sent_at, server_received_at, server_sent_at, self.current_time)
 
     def get_server_offset(self) -> float:
         "Get the current server offset. If not yet received - returns 0"
 
-        return self._get_average_offset() if len(self.server_offsets) > 0 else 0
+        return self.server_clock.get_offset()
+
+    def get_server_time(self) -> float:
+        "Our estimate of the server's current time"
+
+        return self.current_time + self.get_server_offset()
 
     def get_current_time(self) -> float:
         return self.current_time
 
+class SnapshotDelay(InterpolationDelay):
+    "How far in the past we interpolate other entities. It adapts to the jitter of received snapshots"
+
+    def __init__(self):
+        super().__init__(INTERPOLATION_TIME_DELAY, MAX_INTERPOLATION_TIME_DELAY)
+
+class ReceivedSnapshots:
+    """
+    The players snapshots we have received from the server. Since the server sends only the changes
+    since one of our older snapshots - we have to remember them (see the snapshot module)
+    """
+    HISTORY_SIZE = 32
+    "Should be at least as large as the server's history"
+
+    def __init__(self):
+        self.history = SnapshotHistory(ReceivedSnapshots.HISTORY_SIZE)
+
+    def receive(self, snapshot_id: int, baseline_id: int, data: bytes) -> Optional[dict[int, tuple]]:
+        """
+        Decode and remember a received snapshot. Returns `None` if the snapshot is older than the latest one,
+        or if we no longer have its baseline (the server will then encode the next one against an older one)
+        """
+
+        if not self.history.is_newer(snapshot_id):
+            return None
+        
+        baseline = None
+        if baseline_id != NO_BASELINE:
+            baseline = self.history.get(baseline_id)
+            if baseline is None:
+                return None
+
+        try:
+            snapshot = SYNC_PLAYERS_SCHEMA.decode(data, baseline)
+        except SnapshotFormatError:
+            print("Failed to decode a players snapshot")
+            return None
+
+        self.history.push(snapshot_id, snapshot)
+
+        return snapshot
+    
+    def reset(self):
+        self.history = SnapshotHistory(ReceivedSnapshots.HISTORY_SIZE)
+
+class PredictedInput:
+    "The control input of our player during a single fixed tick, and the state we have predicted after it"
+
+    def __init__(self, tick: int, packed: bytes):
+        self.tick = tick
+        self.packed = packed
+
+        # We use exactly what the server will unpack, so both simulate the same thing
+        self.forward_dir, self.horizontal_dir, self.turn_dir, self.is_shooting = CONTROL_PLAYER_SCHEMA.unpack(packed)
+
+        self.pos = pg.Vector2(0, 0)
+        self.angle = 0.0
+
+    def set_state(self, pos: pg.Vector2, angle: float):
+        self.pos.update(pos)
+        self.angle = angle
+
+class InputHistory:
+    """
+    A ring buffer of the latest control inputs of our player, with the states we have predicted after them.
+    The latest few are sent with every control packet, so the server still gets them even if some packets
+    get lost. 
+    
+    The server then tells which of our inputs it has applied, and where that got our player. If our prediction 
+    of that tick was wrong - we return to the server's state and replay all inputs after it
+    """
+    HISTORY_SIZE = 64
+    "About 2 seconds of inputs. Should cover the round trip time, or late states can't be reconciled"
+
+    def __init__(self):
+        self.tick = 0
+        self.inputs: deque[PredictedInput] = deque(maxlen=InputHistory.HISTORY_SIZE)
+
+    def push(self, forward_dir: int, horizontal_dir: int, turn_dir: int, is_shooting: bool) -> PredictedInput:
+        "Push the input of the next tick. The oldest input gets forgotten"
+
+        self.tick = (self.tick+1) % WRAP_INPUT_TICKS
+
+        predicted = PredictedInput(
+            self.tick, 
+            CONTROL_PLAYER_SCHEMA.pack(forward_dir, horizontal_dir, turn_dir, is_shooting)
+        )
+        self.inputs.append(predicted)
+
+        return predicted
+
+    def get_latest_tick(self) -> int:
+        return self.tick
+    
+    def get_latest(self) -> Optional[PredictedInput]:
+        return self.inputs[-1] if self.inputs else None
+
+    def get_inputs(self) -> tuple[bytes, ...]:
+        "The latest `INPUT_REDUNDANCY` packed inputs, from the oldest to the latest"
+
+        start = max(0, len(self.inputs)-INPUT_REDUNDANCY)
+        return tuple(predicted.packed for predicted in islice(self.inputs, start, None))
+    
+    def _get_index(self, tick: int) -> Optional[int]:
+        if not self.inputs:
+            return None
+
+        # Ticks in the buffer are consecutive
+        index = (tick - self.inputs[0].tick) % WRAP_INPUT_TICKS
+        return index if index < len(self.inputs) else None
+
+    def get(self, tick: int) -> Optional[PredictedInput]:
+        "Get the input of the provided tick, if it's still remembered"
+
+        index = self._get_index(tick)
+        return self.inputs[index] if index is not None else None
+
+    def get_after(self, tick: int) -> tuple[PredictedInput, ...]:
+        "All inputs after the provided tick, from the oldest to the latest (empty if the tick isn't remembered)"
+
+        index = self._get_index(tick)
+        if index is None:
+            return ()
+
+        return tuple(islice(self.inputs, index+1, None))
+
+    def reset(self):
+        self.tick = 0
+        self.inputs.clear()
+
 def tick_server_time(resources: Resources):
     "Tick the clock every frame. If it's running of course, in any other case it doesn't do anything."
 
     dt = resources[Clock].get_delta()
     resources[ServerTime].tick(dt)
+    resources[SnapshotDelay].update(dt)
 
 def on_sync_time_command(resources: Resources, command: SyncTimeCommand):
-    resources[ServerTime].sync_time(command.time)
+    resources[ServerTime].sync_time(command.client_time, command.server_received_at, command.server_sent_at)
 
 class SessionPlugin(Plugin):
     def build(self, app):
         app.insert_resource(ServerTime())
+        app.insert_resource(ReceivedSnapshots())
+        app.insert_resource(SnapshotDelay())
+        app.insert_resource(InputHistory())
         app.add_systems(Schedule.First, tick_server_time)
         app.add_event_listener(SyncTimeCommand, on_sync_time_command)
\ No newline at end of file
@@ -6,8 +6,11 @@ from core.telemetry import Telemetry
 
 from core.graphics import FontGPU
 
+from math import isnan
+
 from plugins.client.interfaces.gui_widgets import Label
 from plugins.client.services.gui import GUIManager
+from plugins.shared.services.telemetry import NetworkTelemetry
 
 class TelemetryState:
     def __init__(self, assets: AssetManager, gui: GUIManager):
@@ -18,6 +21,9 @@ class TelemetryState:
 
         self.draw_calls_label = (Label(self.font, "Draw calls {{}}", (0, 1), text_scale=0.3)
             .attached_to(self.fps_label))
+        
+        self.network_label = (Label(self.font, "Network {{}}", (0, 1), text_scale=0.3)
+            .attached_to(self.draw_calls_label))
 
         gui.attach_elements(self.fps_label)
 
@@ -34,6 +40,16 @@ def update_counters(resources: Resources):
         f"Draw calls{{ 3D {telemetry.render3d_dcs}, 2D: {telemetry.render2d_dcs}, Sprite: {telemetry.sprite_dcs}}}"
     )
 
+    network = resources[NetworkTelemetry]
+    rtt = network.get_latest("rtt")
+    if rtt is not None:
+        state.network_label.set_text(
+            f"Network{{ RTT: {'?' if isnan(rtt) else int(rtt*1000)}ms, "
+            f"In: {network.get_latest('bytes_received')/1000:.1f}KB/s, "
+            f"Out: {network.get_latest('bytes_sent')/1000:.1f}KB/s, "
+            f"Loss: {network.get_latest('loss')*100:.0f}%}}"
+        )
+
 def create_telemetry(resources: Resources):
     resources.insert(TelemetryState(resources[AssetManager], resources[GUIManager]))
 
@@ -6,16 +6,7 @@ from core.ecs import WorldECS
 from plugins.client.commands import *
 from plugins.client.components import *
 
-from plugins.client.services.session import ServerTime
-
-INTERPOLATION_TIME_DELAY = 0.05
-"""
-This is the time we're going to subtract when interpolating network positions. Why?
-Because it will make our clients move like they're in the past. Ideally we would like to live in
-the past, so that all motion doesn't seem to immediate for us.
-
-We have to play with this constant to see what works best
-"""
+from plugins.client.services.session import ServerTime, SnapshotDelay
 
 
 def update_render_components(resources: Resources):
@@ -45,21 +36,17 @@ def interpolate_render_components(resources: Resources):
 
 def interpolate_network_components(resources: Resources):
     world = resources[WorldECS]
-    server_timer = resources[ServerTime]
-
-
-    server_time = (server_timer.get_current_time() + server_timer.get_server_offset()) - INTERPOLATION_TIME_DELAY
+    # We render other entities in the past, far enough to (usually) have snapshots on both sides
+    server_time = resources[ServerTime].get_server_time() - resources[SnapshotDelay].get_delay()
 
     # Interpolate positions
     for _, (pos, interpos) in world.query_components(Position, InterpolatedPosition):
-        interpos.get_interpolated(server_time)
         pos.set_position(
             *interpos.get_interpolated(server_time)
         )
 
     # Interpolate angles
     for _, (angle, interangle) in world.query_components(Angle, InterpolatedAngle):
-        interangle.get_interpolated(server_time)
         angle.set_angle(interangle.get_interpolated(server_time))
 
 class InterpolationSystemsPlugin(Plugin):
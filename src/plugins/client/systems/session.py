@@ -4,7 +4,8 @@ from core.time import schedule_systems_seconds
 from core.ecs import WorldECS
 from core.input import InputManager
 
-from ..actions import ClientActionDispatcher, ControlAction
+from ..actions import ClientActionDispatcher, ControlAction, RequestTimeSyncAction
+from ..services.session import InputHistory, ServerTime, SnapshotDelay
 
 from plugins.shared.components import *
 
@@ -19,33 +20,70 @@ class InputAction:
 
     Shoot = "shoot"
 
-def control_player(resources: Resources):
+def control_player_system(resources: Resources):
+    """
+    Every fixed tick, remember the input of our player and apply it right away. We don't wait for the server,
+    since it applies the same input the same way (see `InputHistory`)
+    """
+
     input = resources[InputManager]
     world = resources[WorldECS]
-    action_dispatcher = resources[ClientActionDispatcher]
+    history = resources[InputHistory]
 
     for ent, (controller, angle_vel) in world.query_components(PlayerController, AngleVelocity, including=MainPlayer):
-        angle_vel.set_velocity(input[InputAction.TurnRight]-input[InputAction.TurnLeft])
-        controller.forward_dir = input[InputAction.Forward]-input[InputAction.Backwards]
-        controller.horizontal_dir = input[InputAction.Right]-input[InputAction.Left]
+        predicted = history.push(
+            input[InputAction.Forward]-input[InputAction.Backwards],
+            input[InputAction.Right]-input[InputAction.Left],
+            input[InputAction.TurnRight]-input[InputAction.TurnLeft],
+            input[InputAction.Shoot]
+        )
 
-        controller.is_shooting = input[InputAction.Shoot]
+        controller.forward_dir = predicted.forward_dir
+        controller.horizontal_dir = predicted.horizontal_dir
+        controller.is_shooting = predicted.is_shooting
+        angle_vel.set_velocity(predicted.turn_dir)
 
+        break
 
-        pos, vel, angle, angle_vel = world.get_components(ent, Position, Velocity, Angle, AngleVelocity)
-        pos = pos.get_position()
-        vel = vel.get_velocity()
+def record_predicted_state_system(resources: Resources):
+    "Once the tick is simulated, remember where the latest input has got our player"
 
-        action_dispatcher.dispatch_action(ControlAction(
-            (pos.x, pos.y), 
-            (vel.x, vel.y), 
-            angle.get_angle(), 
-            angle_vel.get_velocity(),
-            controller.is_shooting
-        ))
+    world = resources[WorldECS]
+    predicted = resources[InputHistory].get_latest()
+
+    if predicted is None:
+        return
+
+    for _, (pos, angle) in world.query_components(Position, Angle, including=MainPlayer):
+        predicted.set_state(pos.get_position(), angle.get_angle())
 
         break
 
+def send_inputs(resources: Resources):
+    history = resources[InputHistory]
+    inputs = history.get_inputs()
+
+    if len(inputs) > 0:
+        resources[ClientActionDispatcher].dispatch_action(ControlAction(
+            history.get_latest_tick(), 
+            inputs, 
+            resources[SnapshotDelay].get_delay()
+        ))
+
+def request_time_sync(resources: Resources):
+    server_time = resources[ServerTime]
+
+    if server_time.is_ticking():
+        resources[ClientActionDispatcher].dispatch_action(RequestTimeSyncAction(server_time.get_current_time()))
+
 class SessionSystemsPlugin(Plugin):
     def build(self, app):
-        schedule_systems_seconds(app, (control_player, 1/20, True))
\ No newline at end of file
+        # Our input is applied before players get oriented, and the results are recorded after collisions
+        app.add_systems(Schedule.FixedUpdate, control_player_system, priority=-2)
+        app.add_systems(Schedule.FixedUpdate, record_predicted_state_system, priority=2)
+
+        schedule_systems_seconds(
+            app, 
+            (send_inputs, 1/20, True),
+            (request_time_sync, ServerTime.SYNC_RATE, True)
+        )
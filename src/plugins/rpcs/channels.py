@@ -0,0 +1,13 @@
+"""
+The numbered network channels used by the game (see the channels section of the network module). 
+The server and its clients should always use the same channels
+"""
+
+from modules.network import ChannelMode
+
+ENTITY_CHANNEL = 1
+"Spawning, crookifying and killing of entities. It's ordered, so an entity can't get killed before it was spawned"
+
+CHANNELS = (
+    ChannelMode.ReliableOrdered, # ENTITY_CHANNEL
+)
@@ -1,11 +1,27 @@
 from plugin import Resources, event, EventWriter
 
-from plugins.shared.services.network import ENDIAN, rpc, rpc_raw
+from plugins.shared.services.network import rpc, rpc_raw, rpc_bits
 from plugins.shared.interfaces.stage import GameNotification
 
-from .pack import unpack_angle
+from .pack import unpack_angle, POSITION_FIELD
+from .channels import ENTITY_CHANNEL
 
-import struct
+from modules.bitpack import BitSchema, UInt, Bool
+
+from modules.snapshot import SnapshotSchema, SnapshotFormatError
+
+import numpy as np
+
+@event
+class SyncPlayersSnapshotCommand:
+    """
+    The server has sent a snapshot of all players. It's delta compressed against an older snapshot
+    (the baseline), so it has to be decoded first (see the snapshot module)
+    """
+    def __init__(self, snapshot_id: int, baseline_id: int, data: bytes):
+        self.snapshot_id = snapshot_id
+        self.baseline_id = baseline_id
+        self.data = data
 
 @event
 class SyncPlayersCommand:
@@ -30,9 +46,10 @@ class SpawnPlayerCommand:
 @event
 class SpawnDiamondsCommand:
     """
-    The command to spawn diamonds. It contains a tuple of tuples: `(uid, (posx, posy))`
+    The command to spawn diamonds. It contains a structured array of `SPAWN_DIAMONDS_DTYPE`
+    (with `uid`, `x` and `y` fields)
     """
-    def __init__(self, diamonds: tuple[tuple[int, tuple[int, int]]]):
+    def __init__(self, diamonds: np.ndarray):
         self.diamonds = diamonds
 
 @event
@@ -47,11 +64,27 @@ class CrookifyPolicemanCommand:
     def __init__(self, uid: int):
         self.uid = uid
 
+@event
+class SyncPlayerStateCommand:
+    """
+    The server's state of our own player, right after it has processed our input of the provided tick.
+    The client compares it with its own prediction of that tick (see `InputHistory`)
+    """
+    def __init__(self, input_tick: int, pos: tuple[float, float], angle: float):
+        self.input_tick = input_tick
+        self.pos = pos
+        self.angle = angle
+
 @event
 class SyncTimeCommand:
-    "The command to syncronize the current client's time with this new one"
-    def __init__(self, time: float):
-        self.time = time
+    """
+    The server's answer to our time sync request: the time we have sent the request at (by our clock), and
+    the server's times when it has received the request and when it has answered it
+    """
+    def __init__(self, client_time: float, server_received_at: float, server_sent_at: float):
+        self.client_time = client_time
+        self.server_received_at = server_received_at
+        self.server_sent_at = server_sent_at
 
 @event
 class SyncHealthCommand:
@@ -77,46 +110,38 @@ class GameNotificationCommand:
 MOVE_PLAYERS_LIMIT = 127
 "We can transfer only 127 players per packet for now"
 
-SYNC_PLAYERS_FORMAT = struct.Struct(ENDIAN+"HhhB?")
+SYNC_PLAYERS_SCHEMA = SnapshotSchema("h", "h", "B", "?")
 """
-Components:
-- Player's UID: 2 bytes unsigned int, `H`
+Player snapshots are keyed by player UIDs. Fields:
 - Player's Position: 2 2-byte signed ints, `2h`
 - Player's Angle: 1-byte unsigned int, `B`
 - Player's shooting status: 1-byte boolean `?`
 """
 
-SPAWN_DIAMONDS_FORMAT = struct.Struct(ENDIAN+"Hhh")
+SPAWN_DIAMONDS_DTYPE = np.dtype([("uid", ">u2"), ("x", ">i2"), ("y", ">i2")])
 """
-Components:
-- Entity UID: 2 bytes unsigned int, `H`
-- Entity Position: 2 2-byte signed ints, `2h`
+A numpy structured type (big-endian, like all RPCs), so the whole payload is decoded at once. Components:
+- Entity UID: 2 bytes unsigned int
+- Entity Position: 2 2-byte signed ints
 """
 
-@rpc_raw
+@rpc_raw(supersedes=True, compress=True)
 def sync_players_rpc(resources: Resources, data: bytes):
     """
     Sync all players on the client side. This will both set their position, angle and shooting status.
+    The data is a delta compressed snapshot, which is decoded by the client's snapshot handler
     """
     ewriter = resources[EventWriter]
 
-    moved_entries = []
     try:
-        for (uid, posx, posy, angle, is_shooting) in SYNC_PLAYERS_FORMAT.iter_unpack(data):
-            moved_entries.append((
-                uid, 
-                (posx, posy), 
-                unpack_angle(angle),
-                is_shooting
-            ))
-    except struct.error:
+        snapshot_id, baseline_id = SYNC_PLAYERS_SCHEMA.decode_header(data)
+    except SnapshotFormatError:
         print("Failed to parse players movement packet")
         return
     
-    if len(moved_entries) > 0:
-        ewriter.push_event(SyncPlayersCommand(tuple(moved_entries)))
+    ewriter.push_event(SyncPlayersSnapshotCommand(snapshot_id, baseline_id, data))
 
-@rpc("Hhh?", reliable=True)
+@rpc_bits(BitSchema(UInt(16), POSITION_FIELD, POSITION_FIELD, Bool()), reliable=True, channel=ENTITY_CHANNEL)
 def spawn_player_rpc(resources: Resources, uid: int, posx: int, posy: int, is_main: bool):
     ewriter = resources[EventWriter]
 
@@ -124,39 +149,45 @@ def spawn_player_rpc(resources: Resources, uid: int, posx: int, posy: int, is_ma
         uid, (posx, posy), is_main
     ))
 
-@rpc_raw(reliable=True)
+@rpc_raw(reliable=True, channel=ENTITY_CHANNEL, compress=True)
 def spawn_diamonds_rpc(resources: Resources, data: bytes):
     ewriter = resources[EventWriter]
 
-    new_diamonds = ()
-    try:
-        new_diamonds = tuple(
-            (uid, (posx, posy)) for uid, posx, posy in SPAWN_DIAMONDS_FORMAT.iter_unpack(data)
-        )
-    except struct.error:
-        print("Failed to parse the entity movement packet")
+    if len(data) % SPAWN_DIAMONDS_DTYPE.itemsize != 0:
+        print("Failed to parse the diamond spawn packet")
         return
     
+    # This doesn't copy anything, the array is a view over the received data
+    new_diamonds = np.frombuffer(data, SPAWN_DIAMONDS_DTYPE)
+    
     if len(new_diamonds) > 0:
         ewriter.push_event(SpawnDiamondsCommand(new_diamonds))
 
-@rpc("H", reliable=True)
+@rpc("H", reliable=True, channel=ENTITY_CHANNEL)
 def kill_entity_rpc(resources: Resources, uid: int):
     ewriter = resources[EventWriter]
 
     ewriter.push_event(KillEntityCommand(uid))
 
-@rpc("H", reliable=True)
+@rpc("H", reliable=True, channel=ENTITY_CHANNEL)
 def crookify_policeman_rpc(resources: Resources, uid: int):
     ewriter = resources[EventWriter]
 
     ewriter.push_event(CrookifyPolicemanCommand(uid))
 
-@rpc("f")
-def sync_time_rpc(resources: Resources, time: float):
-    resources[EventWriter].push_event(SyncTimeCommand(time))
+@rpc("Hfff", supersedes=True)
+def sync_player_state_rpc(resources: Resources, input_tick: int, posx: float, posy: float, angle: float):
+    """
+    Sent together with the players snapshot. Positions aren't quantized here, since the client replays
+    its inputs from this exact state
+    """
+    resources[EventWriter].push_event(SyncPlayerStateCommand(input_tick, (posx, posy), angle))
+
+@rpc("ddd")
+def sync_time_rpc(resources: Resources, client_time: float, server_received_at: float, server_sent_at: float):
+    resources[EventWriter].push_event(SyncTimeCommand(client_time, server_received_at, server_sent_at))
 
-@rpc("f")
+@rpc("f", supersedes=True)
 def sync_player_health_rpc(resources: Resources, health: float):
     resources[EventWriter].push_event(SyncHealthCommand(health))
 
@@ -178,6 +209,7 @@ def game_notification_rpc(resources: Resources, notification: int):
 
 CLIENT_RPCS = (
     sync_players_rpc,
+    sync_player_state_rpc,
     spawn_player_rpc,
     spawn_diamonds_rpc,
     kill_entity_rpc,
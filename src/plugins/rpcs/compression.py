@@ -0,0 +1,33 @@
+"""
+The compression dictionary used by the game (see the compression section of the network module). 
+The server and its clients should always use the same dictionary
+"""
+
+from modules.network import MessageCompressor
+
+from .client import SPAWN_DIAMONDS_DTYPE, SYNC_PLAYERS_SCHEMA
+
+import numpy as np
+
+TYPICAL_TILE_SIZE = 48
+"Entities are usually placed on the map's grid"
+
+def make_compression_dictionary() -> bytes:
+    """
+    The dictionary is made of typical payloads of our bulk RPCs: full player snapshots and diamond spawns.
+    Zlib prefers the strings at the end of its dictionary, so the most common payloads go last
+    """
+
+    snapshot = {
+        uid: (uid * TYPICAL_TILE_SIZE, TYPICAL_TILE_SIZE, 0, False)
+        for uid in range(1, 6)
+    }
+
+    diamonds = np.zeros(64, SPAWN_DIAMONDS_DTYPE)
+    diamonds["uid"] = np.arange(6, 70)
+    diamonds["x"] = (np.arange(64) % 16) * TYPICAL_TILE_SIZE + TYPICAL_TILE_SIZE // 2
+    diamonds["y"] = (np.arange(64) // 16) * TYPICAL_TILE_SIZE + TYPICAL_TILE_SIZE // 2
+
+    return SYNC_PLAYERS_SCHEMA.encode(1, snapshot) + diamonds.tobytes()
+
+COMPRESSOR = MessageCompressor(make_compression_dictionary())
@@ -2,31 +2,47 @@ from plugin import Resources, EventWriter, event
 
 from plugins.shared.services.network import rpc
 
+from typing import Optional
+
+# Same as the server RPCs, the listener's RPC is defined after all the others (see the server RPCs)
+import plugins.rpcs.server
+
 LISTENER_PORT = 1567
 
+NO_ROOM_ID = 0
+"Broadcast by servers that don't run on rooms. Rooms are numbered from 1 (see rooms in the network module)"
+
 @event
 class AvailableServerCommand:
     """
-    Servers that haven't started the game once in a while broadcast messages of availability
+    Servers that haven't started the game once in a while broadcast messages of availability. Servers that
+    run on rooms of a shared socket also tell their room ID, so clients join that exact room
     """
-    def __init__(self, addr: tuple[str, int], max_players: int, players: int):
+    def __init__(self, addr: tuple[str, int], max_players: int, players: int, room_id: Optional[int] = None):
         self.addr = addr
         self.max_players = max_players
         self.players = players
+        self.room_id = room_id
 
-@rpc("4BH2B")
+@rpc("4BH2BH")
 def notify_available_server_rpc(
     resources: Resources, 
     ip_a: int, ip_b: int, ip_c: int, ip_d: int, 
     port: int,
     max_players: int, 
-    players: int
+    players: int,
+    room_id: int
 ):
     ip, port = f"{ip_a}.{ip_b}.{ip_c}.{ip_d}", port
 
     print(f"Found server: {ip}:{port}")
 
-    resources[EventWriter].push_event(AvailableServerCommand((ip, port), max_players, players))
+    resources[EventWriter].push_event(AvailableServerCommand(
+        (ip, port), 
+        max_players, 
+        players,
+        None if room_id == NO_ROOM_ID else room_id
+    ))
 
 
 LISTENER_RPCS = (
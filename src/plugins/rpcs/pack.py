@@ -1,7 +1,15 @@
 "The module related to byte packing specific data into bytes"
 
+from modules.bitpack import Int, UInt
+
 import numpy as np
 
+POSITION_FIELD = Int(-4096, 4095)
+"Positions in bit schemas take 13 bits, which is enough for maps up to 85 tiles wide"
+
+ANGLE_FIELD = UInt(8)
+"An angle packed with `pack_angle`"
+
 def pack_angle(angle: float) -> int:
     "Convert an angle in radians into a number between 0 and 255"
 
@@ -1,31 +1,39 @@
 from plugin import Resources, EventWriter, event
 
-from plugins.shared.services.network import rpc, rpc_raw, RPCCallerAddress
-from .pack import unpack_velocity, unpack_angle
+from plugins.shared.services.network import rpc, rpc_raw, rpc_bits, RPCCallerAddress, RPCFormatError, Server
+from modules.bitpack import BitSchema, Bool, Int
 
-from modules.utils import clamp
+# RPC IDs are given in the order RPCs get defined, so every process has to define them in the same order,
+# whatever it imports first (a dedicated server imports these before the client ones, unlike the game)
+import plugins.rpcs.client
+
+import struct
 
 @event
 class ControlPlayerCommand:
     """
-    A player under a specific address (client) has requested to move to a certain point, with
-    a specific velocity
+    A player under a specific address (client) has pressed its controls during one of its ticks. The server
+    simulates the movement itself, so only the directions are sent
     """
     def __init__(
         self, 
         addr: tuple[str, int], 
-        pos: tuple[int, int], 
-        vel: tuple[float, float],
-        angle: float,
-        angle_vel: float,
-        is_shooting: bool
+        tick: int,
+        forward_dir: int,
+        horizontal_dir: int,
+        turn_dir: int,
+        is_shooting: bool,
+        snapshot_delay: float
     ):
         self.addr = addr
-        self.pos = pos
-        self.vel = vel
-        self.angle = angle
-        self.angle_vel = angle_vel
+        self.tick = tick
+        "The client's input tick. Every input is received multiple times, so it should only be applied once"
+        self.forward_dir = forward_dir
+        self.horizontal_dir = horizontal_dir
+        self.turn_dir = turn_dir
         self.is_shooting = is_shooting
+        self.snapshot_delay = snapshot_delay
+        "How far in the past (in seconds) the client was seeing other players when it has sent this input"
 
 @event
 class SignalPlayerReadyCommand:
@@ -35,6 +43,33 @@ class SignalPlayerReadyCommand:
         self.addr: tuple[str, int] = addr 
         self.is_ready: bool = is_ready
 
+@event
+class AcknowledgeSnapshotCommand:
+    "A client has received a players snapshot, so it can be used as a baseline for the next ones"
+
+    def __init__(self, addr: tuple[str, int], snapshot_id: int):
+        self.addr: tuple[str, int] = addr
+        self.snapshot_id: int = snapshot_id
+
+@event
+class RequestTimeSyncCommand:
+    """
+    A client asks for the server's time. The server answers with the time it has received the request at and
+    the time it sends the answer at, echoing the client's time
+    """
+
+    def __init__(self, addr: tuple[str, int], client_time: float, arrived_at: float):
+        self.addr: tuple[str, int] = addr
+        self.client_time: float = client_time
+        self.arrived_at: float = arrived_at
+        "The `time.perf_counter` time the request has arrived at"
+
+@rpc("H", supersedes=True)
+def acknowledge_snapshot_rpc(resources: Resources, snapshot_id: int):
+    caller_addr = resources[RPCCallerAddress].get_addr()
+
+    resources[EventWriter].push_event(AcknowledgeSnapshotCommand(caller_addr, snapshot_id))
+
 @rpc("?")
 def signal_ready_rpc(resources: Resources, is_ready: bool):
     ewriter = resources[EventWriter]
@@ -43,29 +78,87 @@ def signal_ready_rpc(resources: Resources, is_ready: bool):
 
     ewriter.push_event(SignalPlayerReadyCommand(caller_addr, is_ready))
 
-@rpc("2hB?Bb?")
-def control_player_rpc(
-    resources: Resources, 
-    pos_x: int, pos_y: int, 
-    vel_angle: int, vel_length: bool,
-    angle: int, angle_vel: float,
-    is_shooting: bool
-):
-    ewriter = resources[EventWriter]
+@rpc("d")
+def request_time_sync_rpc(resources: Resources, client_time: float):
+    "Unreliable, since a resent request would arrive late and make the client's estimate worse"
 
     caller_addr = resources[RPCCallerAddress].get_addr()
 
-    ewriter.push_event(ControlPlayerCommand(
-        caller_addr,
-        (pos_x, pos_y),
-        unpack_velocity(vel_angle, vel_length),
-        unpack_angle(angle),
-        clamp(angle_vel, -1, 1),
-        is_shooting
+    resources[EventWriter].push_event(RequestTimeSyncCommand(
+        caller_addr, 
+        client_time, 
+        resources[Server].get_last_arrival_time()
     ))
 
+CONTROL_PLAYER_SCHEMA = BitSchema(Int(-1, 1), Int(-1, 1), Int(-1, 1), Bool())
+"""
+Components:
+- Player's forward and horizontal movement directions: 2 2-bit integers from -1 to 1
+- Player's turning direction: a 2-bit integer from -1 to 1
+- Player's shooting status: 1 bit
+
+In total it's a single byte. Positions aren't sent at all, the server simulates them from these inputs
+"""
+
+INPUT_REDUNDANCY = 8
+"""
+Every control packet carries the inputs of this many latest ticks, so losing a packet doesn't lose its input
+(the next packet brings it again). With the header it's 12 bytes
+"""
+
+CONTROL_INPUTS_HEADER = struct.Struct("!HBB")
+"""
+The tick of the latest input, the amount of inputs in the packet and the client's current interpolation delay 
+(in milliseconds, see `pack_snapshot_delay`)
+"""
+
+def pack_snapshot_delay(delay: float) -> int:
+    "The interpolation delay in whole milliseconds. Delays never get close to a quarter of a second, but it's clamped"
+    return min(max(round(delay * 1000), 0), 255)
+
+WRAP_INPUT_TICKS = 2**16
+
+@rpc_raw(supersedes=True)
+def control_player_rpc(resources: Resources, data: bytes):
+    """
+    The client's latest inputs: `[latest tick: 2][count: 1][snapshot delay: 1]`, followed by up to `INPUT_REDUNDANCY` 
+    inputs (packed with `CONTROL_PLAYER_SCHEMA`) of consecutive fixed ticks, from the oldest to the latest.
+
+    Every input is pushed as a separate command, and it's up to the server to skip the ones it already has.
+    Since every packet contains all the latest inputs - an unsent packet can be superseded by a newer one
+    """
+    ewriter = resources[EventWriter]
+
+    try:
+        latest_tick, count, snapshot_delay_ms = CONTROL_INPUTS_HEADER.unpack_from(data)
+    except struct.error:
+        raise RPCFormatError()
+
+    if not (0 < count <= INPUT_REDUNDANCY) or len(data) != CONTROL_INPUTS_HEADER.size + count*CONTROL_PLAYER_SCHEMA.size:
+        raise RPCFormatError()
+
+    caller_addr = resources[RPCCallerAddress].get_addr()
+
+    for i in range(count):
+        offset = CONTROL_INPUTS_HEADER.size + i*CONTROL_PLAYER_SCHEMA.size
+        forward_dir, horizontal_dir, turn_dir, is_shooting = CONTROL_PLAYER_SCHEMA.unpack(
+            data[offset:offset+CONTROL_PLAYER_SCHEMA.size]
+        )
+
+        ewriter.push_event(ControlPlayerCommand(
+            caller_addr,
+            (latest_tick - (count-1-i)) % WRAP_INPUT_TICKS,
+            forward_dir,
+            horizontal_dir,
+            turn_dir,
+            is_shooting,
+            snapshot_delay_ms / 1000
+        ))
+
 SERVER_RPCS = (
     control_player_rpc,
-    signal_ready_rpc
+    signal_ready_rpc,
+    acknowledge_snapshot_rpc,
+    request_time_sync_rpc
 )
 "The RPCs used by the server"
\ No newline at end of file
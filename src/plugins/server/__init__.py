@@ -1,27 +1,54 @@
 from plugin import *
 
 from .runner import run_server_process, ServerController
+from .pool import ServerPool
+
+from app_config import CONFIG
+
+from typing import Optional
 
 class ServerExecutor:
+    """
+    Starts and stops the server for the local game. By default every game gets a fresh server process,
+    but when `server_pool_workers` is configured - games are handed out by a pool of prewarmed workers instead
+    """
     def __init__(self):
         self.server_controller = ServerController()
         self.server_process = None
+
+        self.pool: Optional[ServerPool] = None
+        self.pool_session: Optional[tuple[int, int]] = None
+
+        if CONFIG.server_pool_workers > 0:
+            # The workers start preparing their sessions right away, long before anyone creates a game
+            self.pool = ServerPool(CONFIG.server_pool_workers, CONFIG.server_pool_spare_sessions)
     
-    def start_server(self) -> tuple[str, int]:
-        "Start a new server process (if not already present) and return its address"
+    def start_server(self) -> tuple[tuple[str, int], Optional[int]]:
+        "Start a new server (if not already present) and return its address with the room ID to connect to"
         
-        assert self.server_process is None, "The server is still running, can't start another one"
+        assert not self.is_running(), "The server is still running, can't start another one"
 
         print("Starting the server!")
+
+        if self.pool is not None:
+            addr, room_id, self.pool_session = self.pool.start_session()
+            return addr, room_id
+
         self.server_process, addr = run_server_process(self.server_controller)
 
-        return addr
+        return addr, None
 
     def stop_server(self):
-        assert self.server_process is not None, "The server isn't running, can't stop"
+        assert self.is_running(), "The server isn't running, can't stop"
 
         print("Stopping the server...")
 
+        if self.pool is not None:
+            # The worker will close the session on its own, no need to wait for it
+            self.pool.stop_session(self.pool_session)
+            self.pool_session = None
+            return
+
         self.server_controller.make_quit()
 
         self.server_process.join()
@@ -34,15 +61,22 @@ class ServerExecutor:
     def is_running(self) -> bool:
         "Is the server process running?"
 
-        return self.server_process is not None
+        return self.server_process is not None or self.pool_session is not None
+
+    def close(self):
+        "Stop the running server, and the pool's workers if there are any"
+
+        if self.is_running():
+            self.stop_server()
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
 def quit_close_server(resources: Resources):
     "When quitting the app, it's important to first close the server"
 
-    executor = resources[ServerExecutor]
-
-    if executor.is_running():
-        executor.stop_server()
+    resources[ServerExecutor].close()
 
 class ServerManagementPlugin(Plugin):
     def build(self, app):
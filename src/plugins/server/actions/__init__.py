@@ -14,6 +14,8 @@ from plugins.rpcs.pack import pack_angle
 
 from typing import Callable, Optional, Any
 
+import numpy as np
+
 class ServerAction(Action):
     """
     An action describes a procedure called from systems and addressed to remote receivers.
@@ -29,20 +31,21 @@ class ServerAction(Action):
         self.to: Optional[tuple[int]] = to
 
 class SyncPlayersAction(ServerAction):
-    def __init__(self, entries: tuple[tuple[int, tuple[int, int], float, bool]]):
-        data = bytes()
-        for (uid, pos, angle, is_shooting) in entries:
-            data += SYNC_PLAYERS_FORMAT.pack(
-                uid, 
-                int(pos[0]), 
-                int(pos[1]),
-                pack_angle(angle),
-                is_shooting
-            )
-
+    "Send a players snapshot to a client. Snapshots are encoded per client (see `ClientSnapshots`)"
+    def __init__(self, client: int, snapshot: bytes):
         super().__init__(
             sync_players_rpc, 
-            (data, )
+            (snapshot, ),
+            to=(client, )
+        )
+
+class SyncPlayerStateAction(ServerAction):
+    "Tell a client where its player is, after the server has processed its input of the provided tick"
+    def __init__(self, client: int, input_tick: int, pos: tuple[float, float], angle: float):
+        super().__init__(
+            sync_player_state_rpc,
+            (input_tick, pos[0], pos[1], angle),
+            to=(client, )
         )
 
 class SpawnPlayerAction(ServerAction):
@@ -66,11 +69,14 @@ class SpawnPlayerAction(ServerAction):
         )
 
 class SpawnDiamondsAction(ServerAction):
-    "Spawn diamonds on the clients"
-    def __init__(self, diamonds: tuple[tuple[int, tuple[int, int]]]):
-        data = bytes()
-        for (uid, (posx, posy)) in diamonds:
-            data += SPAWN_DIAMONDS_FORMAT.pack(uid, int(posx), int(posy))
+    "Spawn diamonds on the clients. It takes an array of UIDs and an array of their positions (of `(N, 2)` shape)"
+    def __init__(self, uids: np.ndarray, positions: np.ndarray):
+        diamonds = np.empty(len(uids), SPAWN_DIAMONDS_DTYPE)
+        diamonds["uid"] = uids
+        diamonds["x"] = positions[:, 0]
+        diamonds["y"] = positions[:, 1]
+
+        data = diamonds.tobytes()
 
         super().__init__(
             spawn_diamonds_rpc, 
@@ -97,12 +103,15 @@ class CrookifyPolicemanAction(ServerAction):
         )
 
 class SyncTimeAction(ServerAction):
-    "An action that gets fired when a network entity gets killed (removed from the ECS world)"
-    def __init__(self, time: float):
+    """
+    Answer a client's time sync request with the times we've received it and answered it at, echoing the time 
+    the client has sent it at
+    """
+    def __init__(self, client: int, client_time: float, received_at: float, sent_at: float):
         super().__init__(
             sync_time_rpc,
-            (time, ),
-            to=None
+            (client_time, received_at, sent_at),
+            to=(client, )
         )
 
 class SyncHealthAction(ServerAction):
@@ -2,4 +2,11 @@ from plugin import event
 
 @event
 class StopServerBroadcastingCommand:
-    "A command that's issued whenever the server would like to stop issuing broadcasts"
\ No newline at end of file
+    "A command that's issued whenever the server would like to stop issuing broadcasts"
+
+@event
+class StartServerBroadcastingCommand:
+    """
+    A command that tells a session to start issuing broadcasts. Sessions of a session host only advertise
+    themselves once they're handed out, while standalone servers broadcast from the start
+    """
\ No newline at end of file
@@ -1,3 +1,18 @@
 BROADCAST_FREQUENCY = 5
 
-MAX_PLAYERS = 5
\ No newline at end of file
+MAX_PLAYERS = 5
+
+RELEVANCY_DISTANCE = 384
+"Entities further than this (8 tiles of the map) from a player are considered irrelevant to them"
+
+RELEVANCY_PRIORITY_RATE = 0.25
+"""
+How much priority an irrelevant entity accumulates every sync (scaled down with the distance). Once it 
+reaches 1 - the entity gets sent anyway. With 0.25 hidden entities nearby get updated every 4th sync
+"""
+
+MAX_REWIND_TIME = 0.5
+"""
+The furthest back in time the server rewinds players for hit detection. Players with a larger latency will
+have to lead their shots a bit
+"""
\ No newline at end of file
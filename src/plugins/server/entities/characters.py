@@ -6,6 +6,7 @@ def make_server_policeman(
     uid: int, 
     pos: tuple[float, float]
 ) -> tuple:
-    components = make_policeman(uid, pos) + (OwnedByClient(owned_by), )
+    # Players shoot at what they see on their screens, which is in the past for the server
+    components = make_policeman(uid, pos) + (OwnedByClient(owned_by), LagCompensated())
     
     return components
@@ -1,21 +1,25 @@
 from plugin import Plugin, Resources
 
 from core.ecs import WorldECS
+from core.time import Clock
 
 from plugins.server.events import RemovedNetworkEntityEvent
 from plugins.server.components import *
 
-from plugins.server.commands import ControlPlayerCommand
+from plugins.server.commands import ControlPlayerCommand, RequestTimeSyncCommand
 
 from plugins.server.actions import *
 
 from plugins.server.services.clientlist import ClientList
+from plugins.server.services.inputs import ClientInputs
 
-from plugins.shared.constants import SNAP_PLAYER_POSITION_DISTANCE
-
+from time import perf_counter
 
 def on_control_player_command(resources: Resources, command: ControlPlayerCommand):
-    world = resources[WorldECS]
+    """
+    Queue the received input. It isn't applied right away, every fixed tick applies one input
+    (see `apply_client_inputs_system`), exactly like the client has predicted it
+    """
     clientlist = resources[ClientList]
 
     if not clientlist.contains_client_addr(command.addr):
@@ -23,34 +27,31 @@ def on_control_player_command(resources: Resources, command: ControlPlayerComman
 
     client_ent = clientlist.get_client_ent(command.addr)
 
-    if not world.has_component(client_ent, OwnsEntity):
-        return
-
-    player_ent = world.get_component(client_ent, OwnsEntity).get_ent()
-    
-    if not world.contains_entity(player_ent):
-        return
+    # Inputs are sent multiple times, and they should be applied only once, and in order
+    resources[ClientInputs].push(client_ent, command)
 
-    pos, vel, angle, angle_vel, controller = world.get_components(
-        player_ent, 
-        Position, 
-        Velocity, 
-        Angle, 
-        AngleVelocity,
-        PlayerController
-    )
+def on_request_time_sync_command(resources: Resources, command: RequestTimeSyncCommand):
+    """
+    Answer with the time the request has arrived at, and the time the answer is going to leave at (answers are sent
+    on the next network tick). The client subtracts the time in between, so waiting here doesn't count as latency
+    """
 
-    # If the distance between server-side position and player's position is less than
-    # the stap distance - we're going to accept its movement packet
-    new_pos = command.pos
-    if pos.get_position().distance_to(new_pos) <= SNAP_PLAYER_POSITION_DISTANCE:
-        pos.set_position(*new_pos)
+    clientlist = resources[ClientList]
+    clock = resources[Clock]
 
-    vel.set_velocity(*command.vel)
-    angle.set_angle(command.angle)
-    angle_vel.set_velocity(command.angle_vel)
+    if not clientlist.contains_client_addr(command.addr):
+        return
+    
+    # The clock's time is from the start of this frame, and the arrival time is from `time.perf_counter`
+    current_time = clock.get_execution_time()
+    received_at = current_time - (perf_counter() - command.arrived_at)
 
-    controller.is_shooting = command.is_shooting
+    resources[ServerActionDispatcher].dispatch_action(SyncTimeAction(
+        clientlist.get_client_ent(command.addr),
+        command.client_time,
+        received_at,
+        current_time + clock.get_time_until_fixed_update()
+    ))
 
 def on_network_entity_removal(resources: Resources, event: RemovedNetworkEntityEvent):
     """
@@ -87,4 +88,5 @@ def on_network_entity_removal(resources: Resources, event: RemovedNetworkEntityE
 class BaseHandlersPlugin(Plugin):
     def build(self, app):
         app.add_event_listener(ControlPlayerCommand, on_control_player_command)
+        app.add_event_listener(RequestTimeSyncCommand, on_request_time_sync_command)
         app.add_event_listener(RemovedNetworkEntityEvent, on_network_entity_removal)
\ No newline at end of file
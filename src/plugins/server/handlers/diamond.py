@@ -11,6 +11,8 @@ from plugins.server.services.state import GameState, CurrentGameState, LightsOn
 
 from plugins.shared.entities import make_diamond
 
+import numpy as np
+
 def on_diamond_pickup(resources: Resources, event: DiamondPickedUpEvent):
     world = resources[WorldECS]
     state = resources[CurrentGameState]
@@ -56,7 +58,8 @@ def on_start_game_command(resources: Resources, _):
         diamond_entries.append((uid, diamond_pos))
         world.create_entity(*make_diamond(uid, diamond_pos))
 
-    action_dispatcher.dispatch_action(SpawnDiamondsAction(tuple(diamond_entries)))
+    uids, positions = zip(*diamond_entries)
+    action_dispatcher.dispatch_action(SpawnDiamondsAction(np.array(uids), np.array(positions)))
 
 class DiamondHandlersPlugin(Plugin):
     def build(self, app):
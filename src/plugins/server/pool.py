@@ -0,0 +1,163 @@
+"""
+A pool of prewarmed server worker processes.
+
+Starting a separate server process for every game means importing everything, building all plugins and
+loading the map every single time someone creates a game. Instead, the pool starts its workers once, and
+every worker is a session host (see the sessions module) that keeps a few sessions already built and
+waiting for players.
+
+The pool itself is a lightweight dispatcher: workers report every session they prepare or close, so
+the pool always knows which sessions are available and how loaded every worker is. Handing out a session
+doesn't need to wait for a worker's reply - the pool picks an available session of the least loaded
+worker and simply tells the worker that it's reserved now.
+"""
+
+from .sessions import SessionHost
+
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import Connection, wait
+
+from collections import deque
+from typing import Optional
+
+import asyncio
+
+WORKER_STARTUP_TIMEOUT = 30
+"How long can we wait for a worker to prepare a session before giving up"
+
+def _run_worker(conn: Connection, spare_sessions: int):
+    host = SessionHost(spare_sessions)
+
+    host.on_session_opened = lambda room_id: conn.send(("opened", room_id))
+    host.on_session_closed = lambda room_id: conn.send(("closed", room_id))
+
+    def handle_commands():
+        while conn.poll():
+            command, *args = conn.recv()
+
+            if command == "reserve":
+                host.reserve_session(*args)
+            elif command == "close":
+                host.close_session(*args)
+            elif command == "quit":
+                host.make_quit()
+
+    conn.send(("ready", host.get_addr()))
+
+    try:
+        asyncio.run(host.run(handle_commands))
+    except KeyboardInterrupt:
+        pass
+
+class PoolWorker:
+    "The dispatcher's view of a single worker process"
+    def __init__(self, spare_sessions: int):
+        self.conn, worker_conn = Pipe()
+        self.process = Process(target=_run_worker, args=(worker_conn, spare_sessions), daemon=True)
+        self.process.start()
+
+        self.addr: Optional[tuple[str, int]] = None
+        "The address of the worker's socket. Known once the worker is ready"
+
+        self.available: deque[int] = deque()
+        "Prepared sessions that weren't handed out yet"
+        self.reserved: set[int] = set()
+        "Sessions that were handed out and are still running"
+
+    def get_load(self) -> int:
+        return len(self.reserved)
+
+    def handle_messages(self):
+        while self.conn.poll():
+            message, arg = self.conn.recv()
+
+            if message == "ready":
+                self.addr = arg
+            elif message == "opened":
+                self.available.append(arg)
+            elif message == "closed":
+                self.reserved.discard(arg)
+                if arg in self.available:
+                    self.available.remove(arg)
+
+    def reserve(self) -> int:
+        room_id = self.available.popleft()
+        self.reserved.add(room_id)
+        self.conn.send(("reserve", room_id))
+
+        return room_id
+
+    def close_session(self, room_id: int):
+        if room_id in self.reserved:
+            self.conn.send(("close", room_id))
+
+    def close(self):
+        try:
+            self.conn.send(("quit",))
+        except (BrokenPipeError, OSError):
+            pass
+
+        self.process.join()
+        self.conn.close()
+
+class ServerPool:
+    """
+    Starts `workers` worker processes (ideally one per CPU core), each keeping `spare_sessions` sessions
+    ready. Sessions are handed out with `start_session`, and are identified by their worker and room ID.
+    """
+    def __init__(self, workers: int, spare_sessions: int = 1):
+        assert workers > 0, "A server pool needs at least a single worker"
+        assert spare_sessions > 0, "Workers should keep at least a single session ready"
+
+        self.workers = [PoolWorker(spare_sessions) for _ in range(workers)]
+
+    def _handle_messages(self):
+        for worker in self.workers:
+            worker.handle_messages()
+
+    def _pick_worker(self) -> Optional[PoolWorker]:
+        "The least loaded worker that has an available session"
+
+        candidates = [worker for worker in self.workers if worker.addr is not None and worker.available]
+
+        return min(candidates, key=PoolWorker.get_load, default=None)
+
+    def start_session(self) -> tuple[tuple[str, int], int, tuple[int, int]]:
+        """
+        Hand out an available session. Returns the address to connect to, the room ID to request and the
+        session's handle (used to stop it later).
+
+        This only blocks if no worker has a session ready (for example, right after the pool has started)
+        """
+
+        self._handle_messages()
+        worker = self._pick_worker()
+
+        while worker is None:
+            ready = wait([worker.conn for worker in self.workers], WORKER_STARTUP_TIMEOUT)
+            assert ready, "Server workers didn't prepare any sessions in time"
+
+            self._handle_messages()
+            worker = self._pick_worker()
+
+        room_id = worker.reserve()
+
+        return worker.addr, room_id, (self.workers.index(worker), room_id)
+
+    def stop_session(self, handle: tuple[int, int]):
+        "Stop a handed out session. Doesn't block"
+
+        worker_index, room_id = handle
+        self.workers[worker_index].close_session(room_id)
+
+    def get_loads(self) -> tuple[int, ...]:
+        "The amount of running sessions of every worker"
+
+        self._handle_messages()
+        return tuple(worker.get_load() for worker in self.workers)
+
+    def close(self):
+        "Stop all workers (and all their sessions)"
+
+        for worker in self.workers:
+            worker.close()
@@ -4,7 +4,7 @@ from core import ServerCoreModulesPlugin
 
 from core.time import Clock
 
-from plugins.shared.services.network import Server
+from plugins.shared.services.network import Server, HighUDPRoom
 from plugins.shared import SharedPluginsCollection
 
 from .actions import ServerActionPlugin
@@ -16,6 +16,11 @@ from app_config import CONFIG
 
 from multiprocessing import Process, Value, Queue
 
+from contextlib import contextmanager
+from typing import Optional
+
+import asyncio
+
 class ServerController:
     """
     The class that gets passed to the server process to control when to stop its execution.
@@ -41,11 +46,14 @@ class ServerController:
 
         return self.quit_val.value == True
 
-def server_runner(app: App):
-    "A really simple server runner"
+@contextmanager
+def _server_app_lifetime(app: App):
+    """
+    Start the server app, and finalize it when the runner's loop is over. Both runners only differ in how they wait
+    for the next update, so everything around their loops lives here. If the loop raises an exception - the app
+    still gets finalized, and the exception is raised again afterwards
+    """
 
-    clock = app.get_resource(Clock)
-    server_controller = app.get_resource(ServerController)
     ewriter = app.get_resource(EventWriter)
 
     caught_exception = None
@@ -54,9 +62,7 @@ def server_runner(app: App):
     app.startup()
 
     try:
-        while not server_controller.should_quit():
-            clock.update()
-            app.update(clock.get_fixed_updates())            
+        yield
     except Exception as exception:
 
         # We don't want to handle events when an app has caught an exception - only finalize it
@@ -71,12 +77,53 @@ def server_runner(app: App):
     if caught_exception is not None:
         raise caught_exception
 
+def server_runner(app: App):
+    "A really simple server runner"
+
+    clock = app.get_resource(Clock)
+    server_controller = app.get_resource(ServerController)
+
+    with _server_app_lifetime(app):
+        while not server_controller.should_quit():
+            clock.update()
+            app.update(clock.get_fixed_updates())
+
+async def _run_server_loop(app: App):
+    clock = app.get_resource(Clock)
+    server_controller = app.get_resource(ServerController)
+
+    # From now on, the event loop receives and processes our packets the moment they arrive
+    await app.get_resource(Server).open_datagram_endpoint()
+
+    with _server_app_lifetime(app):
+        while not server_controller.should_quit():
+            # The clock doesn't sleep here - it's the loop timer that waits for the next fixed update,
+            # so packets can still be handled while we're waiting
+            clock.update(False)
+            app.update(clock.get_fixed_updates())
+
+            await asyncio.sleep(clock.get_time_until_fixed_update())
+
+def async_server_runner(app: App):
+    """
+    A server runner built on asyncio. Instead of polling the socket every fixed tick, the server's socket 
+    is driven by the event loop, and the app gets updated from a loop timer. While nothing is happening - 
+    the process simply idles.
+    """
+
+    asyncio.run(_run_server_loop(app))
+
 class ServerPlugins(Plugin):
     "The plugin collection that the server uses"
-    def __init__(self, controller: ServerController):
+    def __init__(self, controller: ServerController, room: Optional[HighUDPRoom] = None):
         self.controller = controller
+        self.room = room
 
     def build(self, app):
+        if self.room is not None:
+            # Has to be inserted before the services, since the server service runs on it
+            app.insert_resource(self.room)
+
         app.add_plugins(
             ServerCoreModulesPlugin(),
             SharedPluginsCollection(),
@@ -87,7 +134,7 @@ class ServerPlugins(Plugin):
         )
         app.insert_resource(self.controller)
         app.insert_resource(Clock(CONFIG.fixed_fps, CONFIG.fixed_fps))
-        app.set_runner(server_runner)
+        app.set_runner(async_server_runner if CONFIG.server_asyncio else server_runner)
 
 def _run_server_process(controller: ServerController, addr_queue: Queue):
     app = App(
@@ -4,6 +4,10 @@ from .clientlist import ClientListPlugin
 from .broadcaster import ServerBroadcasterPlugin
 from .state import GameStatePlugin
 from .include import IncludedServicesPlugin
+from .snapshots import ClientSnapshotsPlugin
+from .relevancy import RelevancyPlugin
+from .inputs import ClientInputsPlugin
+from .lagcomp import LagCompensationPlugin
 
 class ServerServicesPlugin(Plugin):
     def build(self, app):
@@ -11,5 +15,9 @@ class ServerServicesPlugin(Plugin):
             IncludedServicesPlugin(),
             ClientListPlugin(),
             ServerBroadcasterPlugin(),
-            GameStatePlugin()
+            GameStatePlugin(),
+            ClientSnapshotsPlugin(),
+            RelevancyPlugin(),
+            ClientInputsPlugin(),
+            LagCompensationPlugin()
         )
\ No newline at end of file
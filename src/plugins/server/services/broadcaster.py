@@ -5,10 +5,10 @@ from core.ecs import WorldECS
 
 from plugins.server.components import Client
 
-from plugins.server.commands import StopServerBroadcastingCommand
-from plugins.shared.services.network import BroadcastWriter, Server
+from plugins.server.commands import StopServerBroadcastingCommand, StartServerBroadcastingCommand
+from plugins.shared.services.network import BroadcastWriter, Server, HighUDPRoom
 
-from plugins.rpcs.listener import notify_available_server_rpc, LISTENER_PORT
+from plugins.rpcs.listener import notify_available_server_rpc, LISTENER_PORT, NO_ROOM_ID
 
 from plugins.server.constants import BROADCAST_FREQUENCY, MAX_PLAYERS
 
@@ -20,6 +20,9 @@ def broadcast_server(resources: Resources):
     server_ip, server_port = server.get_addr()
     players_len = len(world.query_component(Client))
 
+    # Rooms share the host's address, so the room ID is what tells them apart
+    room_id = server.get_room_id()
+
     broadcaster.broadcast_call(
         LISTENER_PORT,
         notify_available_server_rpc,
@@ -27,18 +30,28 @@ def broadcast_server(resources: Resources):
         *(int(ip_component) for ip_component in server_ip.split(".")),
         server_port,
         MAX_PLAYERS,
-        players_len
+        players_len,
+        NO_ROOM_ID if room_id is None else room_id
     )
 
 def on_stop_broadcasting_command(resources: Resources, _):
     resources[SystemScheduler].remove_scheduled(broadcast_server)
 
+def on_start_broadcasting_command(resources: Resources, _):
+    scheduler = resources[SystemScheduler]
+
+    if broadcast_server not in scheduler:
+        scheduler.schedule_seconds(broadcast_server, BROADCAST_FREQUENCY, True)
+
 class ServerBroadcasterPlugin(Plugin):
     def build(self, app):
-        # In this plugin we're going to initialize the game session resource and the server
-        schedule_systems_seconds(
-            app,
-            (broadcast_server, BROADCAST_FREQUENCY, True),
-        )
-
-        app.add_event_listener(StopServerBroadcastingCommand, on_stop_broadcasting_command)
\ No newline at end of file
+        # Spare sessions of a session host wait in the background until someone gets them, so they
+        # shouldn't advertise themselves to everyone in the main menu. They start on StartServerBroadcastingCommand
+        if app.get_resource(HighUDPRoom) is None:
+            schedule_systems_seconds(
+                app,
+                (broadcast_server, BROADCAST_FREQUENCY, True),
+            )
+
+        app.add_event_listener(StopServerBroadcastingCommand, on_stop_broadcasting_command)
+        app.add_event_listener(StartServerBroadcastingCommand, on_start_broadcasting_command)
\ No newline at end of file
@@ -1,11 +1,24 @@
 from plugin import Plugin
 
-from plugins.shared.services.network import Server, BroadcastWriter
+from plugins.shared.services.network import Server, BroadcastWriter, HighUDPRoom
 from plugins.rpcs.server import SERVER_RPCS
+from plugins.rpcs.channels import CHANNELS
+from plugins.rpcs.compression import COMPRESSOR
 
 from plugins.server.constants import MAX_PLAYERS
 
+from app_config import CONFIG
+
 class IncludedServicesPlugin(Plugin):
     def build(self, app):
         app.insert_resource(BroadcastWriter())
-        app.insert_resource(Server(app.get_resources(), MAX_PLAYERS, SERVER_RPCS))
\ No newline at end of file
+        app.insert_resource(Server(
+            app.get_resources(), 
+            MAX_PLAYERS, 
+            SERVER_RPCS, 
+            CONFIG.server_io_thread, 
+            # Only present when the server is hosted as a room of a multi-session host
+            app.get_resource(HighUDPRoom),
+            CHANNELS,
+            COMPRESSOR
+        ))
\ No newline at end of file
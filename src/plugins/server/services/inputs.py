@@ -0,0 +1,138 @@
+"""
+Clients send the inputs of their latest ticks with every control packet (see `control_player_rpc`), so
+the same input arrives multiple times. The server remembers the tick of the last input it has received
+from every client, and skips everything that isn't newer.
+
+New inputs are queued, and every fixed tick applies exactly one of them to the client's player. This way the
+server simulates the player the same way the client has predicted it, and can tell the client which
+of its inputs the current state includes (see `SyncPlayerStateAction`).
+
+After lost packets the inputs arrive in a burst, and every queued input is another tick of latency. Dropping them
+would make the server's state differ from the client's prediction, so instead the client catches up: while its queue
+is longer than `TARGET_QUEUED_INPUTS`, it gets an extra input applied every tick (see `apply_client_inputs_system`)
+"""
+
+from plugin import Plugin, Resources
+
+from modules.seqwindow import sequence_greater_than
+
+from plugins.rpcs.server import ControlPlayerCommand, INPUT_REDUNDANCY, WRAP_INPUT_TICKS
+from plugins.server.events import RemovedClientEvent
+from plugins.shared.constants import INTERPOLATION_TIME_DELAY
+
+from collections import deque
+from typing import Optional
+
+TARGET_QUEUED_INPUTS = 4
+"""
+If inputs arrive in bursts (or the client's clock is slightly faster), they pile up in the queue. Past this size the
+client catches up by applying 2 inputs per tick, until its queue shrinks back
+"""
+
+MAX_QUEUED_INPUTS = TARGET_QUEUED_INPUTS + 2*INPUT_REDUNDANCY
+"""
+A burst can only bring as many inputs as a single control packet carries, so only a misbehaving client can pile up
+this many. Past this size the oldest inputs get dropped
+"""
+
+class ClientInputs:
+    "The received, but not yet applied inputs of every client"
+
+    def __init__(self):
+        self.last_ticks: dict[int, int] = {}
+        "Client entities to the ticks of their last received inputs"
+
+        self.queues: dict[int, deque[ControlPlayerCommand]] = {}
+        "Inputs waiting to be applied, from the oldest to the latest"
+
+        self.applied: dict[int, int] = {}
+        "The ticks of inputs applied during the current fixed tick"
+
+        self.states: dict[int, tuple[int, tuple[float, float], float]] = {}
+        """
+        The latest input ticks and the states (positions and angles) players had right after them, 
+        which weren't sent yet
+        """
+
+        self.snapshot_delays: dict[int, float] = {}
+        "How far in the past every client sees other players, as of its latest input (see lag compensation)"
+
+    def _remove_client(self, client_ent: int):
+        self.last_ticks.pop(client_ent, None)
+        self.queues.pop(client_ent, None)
+        self.applied.pop(client_ent, None)
+        self.states.pop(client_ent, None)
+        self.snapshot_delays.pop(client_ent, None)
+
+    def push(self, client_ent: int, command: ControlPlayerCommand) -> bool:
+        "Queue a received input. Returns `False` if it has been already received (or is too old)"
+
+        last_tick = self.last_ticks.get(client_ent)
+        if last_tick is not None and not sequence_greater_than(command.tick, last_tick, WRAP_INPUT_TICKS):
+            return False
+
+        self.last_ticks[client_ent] = command.tick
+        self.snapshot_delays[client_ent] = command.snapshot_delay
+
+        queue = self.queues.setdefault(client_ent, deque())
+        queue.append(command)
+
+        while len(queue) > MAX_QUEUED_INPUTS:
+            queue.popleft()
+
+        return True
+
+    def get_snapshot_delay(self, client_ent: int) -> float:
+        "The client's latest interpolation delay. Clients that haven't sent any inputs yet have the shortest one"
+
+        return self.snapshot_delays.get(client_ent, INTERPOLATION_TIME_DELAY)
+
+    def is_behind(self, client_ent: int) -> bool:
+        "Have the client's inputs piled up past the target, so it should catch up on this tick?"
+
+        queue = self.queues.get(client_ent)
+        return queue is not None and len(queue) > TARGET_QUEUED_INPUTS
+
+    def pop(self, client_ent: int) -> Optional[ControlPlayerCommand]:
+        """
+        Take the next input to apply on this tick. If none have arrived in time - returns `None`, and the
+        player should keep its previous input
+        """
+
+        queue = self.queues.get(client_ent)
+        if not queue:
+            return None
+
+        command = queue.popleft()
+        self.applied[client_ent] = command.tick
+
+        return command
+
+    def take_applied(self) -> dict[int, int]:
+        "Take the ticks of inputs applied during this fixed tick. Their results are known only at the end of it"
+
+        applied = self.applied
+        self.applied = {}
+
+        return applied
+
+    def set_state(self, client_ent: int, tick: int, pos: tuple[float, float], angle: float):
+        "Remember the state of the client's player, right after its input of the provided tick"
+
+        self.states[client_ent] = (tick, pos, angle)
+
+    def take_states(self) -> dict[int, tuple[int, tuple[float, float], float]]:
+        "Take all player states that weren't sent yet"
+
+        states = self.states
+        self.states = {}
+
+        return states
+
+def on_removed_client(resources: Resources, event: RemovedClientEvent):
+    resources[ClientInputs]._remove_client(event.ent)
+
+class ClientInputsPlugin(Plugin):
+    def build(self, app):
+        app.insert_resource(ClientInputs())
+        app.add_event_listener(RemovedClientEvent, on_removed_client)
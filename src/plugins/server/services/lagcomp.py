@@ -0,0 +1,123 @@
+"""
+Lag compensation. Clients see other players in the past: they interpolate between received snapshots
+(their interpolation delay behind, which they report with their inputs), which took half of the round trip to arrive, 
+and their shots take the other half to reach the server. So when the server checks a projectile against the current positions - the shooter
+has to aim ahead of what it sees.
+
+Instead, the server remembers the recent positions of every hittable entity, and checks projectiles of lag
+compensated shooters against the positions their shooters saw (see `compensate_projectile_hits_system`).
+The rewind is bounded by `MAX_REWIND_TIME`, so players with a huge latency can't hit others long after they've
+left.
+"""
+
+from plugin import Plugin
+
+from plugins.server.constants import MAX_REWIND_TIME
+
+from app_config import CONFIG
+
+import numpy as np
+
+class PositionHistory:
+    """
+    A ring buffer of the positions (and collider radiuses) of all hittable entities, recorded every fixed tick.
+    Entities are stored in columns (slots), which get reused when entities disappear
+    """
+
+    INITIAL_SLOTS = 8
+    "Slots get doubled when there isn't enough of them"
+
+    def __init__(self, ticks: int):
+        assert ticks >= 2, "Rewinding needs at least 2 ticks to interpolate between"
+
+        self.positions = np.zeros((ticks, PositionHistory.INITIAL_SLOTS, 2), np.float32)
+        "Positions of every tick (rows) and every slot (columns)"
+
+        self.radiuses = np.zeros(PositionHistory.INITIAL_SLOTS, np.float32)
+        "The latest collider radiuses of all slots"
+
+        self.active = np.zeros(PositionHistory.INITIAL_SLOTS, bool)
+
+        self.slots: dict[int, int] = {}
+        "Entities to their slots"
+        self.slot_ents = np.zeros(PositionHistory.INITIAL_SLOTS, np.int64)
+        "Slots to their entities"
+
+        self.head = 0
+        "The row of the latest tick"
+        self.recorded = 0
+        "How many ticks back the history goes"
+
+    def _grow(self):
+        slots = len(self.active)
+
+        self.positions = np.concatenate((self.positions, np.zeros_like(self.positions)), axis=1)
+        self.radiuses = np.concatenate((self.radiuses, np.zeros(slots, np.float32)))
+        self.active = np.concatenate((self.active, np.zeros(slots, bool)))
+        self.slot_ents = np.concatenate((self.slot_ents, np.zeros(slots, np.int64)))
+
+    def _allocate_slot(self, ent: int, pos: tuple[float, float]) -> int:
+        free_slots = np.flatnonzero(~self.active)
+        if len(free_slots) == 0:
+            self._grow()
+            free_slots = np.flatnonzero(~self.active)
+
+        slot = int(free_slots[0])
+
+        # The entity didn't exist before, so we pretend it was always here
+        self.positions[:, slot] = pos
+        self.active[slot] = True
+        self.slot_ents[slot] = ent
+        self.slots[ent] = slot
+
+        return slot
+
+    def record(self, entities: dict[int, tuple[tuple[float, float], float]]):
+        "Record the positions and radiuses of all hittable entities on the current tick. Missing entities are forgotten"
+
+        for ent in tuple(self.slots):
+            if ent not in entities:
+                self.active[self.slots.pop(ent)] = False
+
+        self.head = (self.head + 1) % len(self.positions)
+        self.recorded = min(self.recorded + 1, len(self.positions))
+
+        for ent, (pos, radius) in entities.items():
+            slot = self.slots.get(ent)
+            if slot is None:
+                slot = self._allocate_slot(ent, pos)
+
+            self.positions[self.head, slot] = pos
+            self.radiuses[slot] = radius
+
+    def rewind(self, ticks_back: float) -> np.ndarray:
+        """
+        Positions of all slots the provided amount of ticks ago (interpolated between ticks). The rewind is clamped
+        to the recorded history. Slots that aren't active contain garbage
+        """
+
+        ticks_back = min(max(ticks_back, 0), max(self.recorded - 1, 0))
+
+        whole_ticks = int(ticks_back)
+        fraction = ticks_back - whole_ticks
+
+        size = len(self.positions)
+        newer = self.positions[(self.head - whole_ticks) % size]
+        older = self.positions[(self.head - whole_ticks - 1) % size]
+
+        return newer + (older - newer) * fraction
+
+    def get_slot_entities(self) -> np.ndarray:
+        return self.slot_ents
+
+    def get_radiuses(self) -> np.ndarray:
+        return self.radiuses
+
+    def get_active(self) -> np.ndarray:
+        "A mask of slots that contain entities"
+        return self.active
+
+class LagCompensationPlugin(Plugin):
+    def build(self, app):
+        # Plus 2 ticks, so the oldest rewind still has both ticks to interpolate between
+        app.insert_resource(PositionHistory(int(np.ceil(MAX_REWIND_TIME * CONFIG.fixed_fps)) + 2))
@@ -0,0 +1,106 @@
+"""
+Relevancy (interest management) decides which entities every client should be updated about.
+
+Entities that are close to the client's player and not hidden behind opaque walls are always relevant.
+All the other entities accumulate priority every sync (faster the closer they are), and get sent once it
+reaches 1. This way distant entities still get updated from time to time, just way less frequently.
+
+Entities that weren't picked keep the values that were last sent to the client, so the delta snapshots
+(see the snapshots service) don't send anything for them.
+"""
+
+from plugin import Plugin, Resources
+
+from plugins.shared.interfaces.map import WorldMap
+from plugins.server.events import RemovedClientEvent
+from plugins.server.constants import RELEVANCY_DISTANCE, RELEVANCY_PRIORITY_RATE
+
+from typing import Optional
+
+import numpy as np
+
+class Relevancy:
+    "Tracks the accumulated priorities of irrelevant entities for every client"
+
+    def __init__(self):
+        self.priorities: dict[int, dict[int, float]] = {}
+        "Client entities to the priorities of the entity UIDs they weren't updated about"
+
+    def _remove_client(self, client_ent: int):
+        self.priorities.pop(client_ent, None)
+
+    def is_relevant(
+        self,
+        viewer: tuple[float, float],
+        target: tuple[float, float],
+        world_map: Optional[WorldMap]
+    ) -> bool:
+        "Is the target position close enough to the viewer, and is it visible to them?"
+
+        if np.hypot(target[0]-viewer[0], target[1]-viewer[1]) > RELEVANCY_DISTANCE:
+            return False
+        elif world_map is None:
+            return True
+
+        tile_size, _ = world_map.get_wall_size()
+
+        return not world_map.get_wall_map().is_line_blocked(
+            (viewer[0]/tile_size, viewer[1]/tile_size),
+            (target[0]/tile_size, target[1]/tile_size),
+            world_map.get_opaque_walls()
+        )
+
+    def filter_snapshot(
+        self,
+        client_ent: int,
+        viewer_uid: Optional[int],
+        snapshot: dict[int, tuple],
+        last_sent: dict[int, tuple],
+        world_map: Optional[WorldMap] = None
+    ) -> dict[int, tuple]:
+        """
+        Produce the client's version of the snapshot. The snapshot values should start with the entity's position.
+        The viewer is the client's own player (it's always relevant). Clients without a player are updated about everything
+        """
+
+        viewer_values = snapshot.get(viewer_uid)
+        if viewer_values is None:
+            return snapshot
+
+        viewer = viewer_values[:2]
+        priorities = self.priorities.setdefault(client_ent, {})
+        filtered = {}
+
+        for uid, values in snapshot.items():
+            if uid == viewer_uid or self.is_relevant(viewer, values[:2], world_map):
+                priorities.pop(uid, None)
+                filtered[uid] = values
+                continue
+
+            # The closer the entity is, the faster it accumulates priority
+            distance = np.hypot(values[0]-viewer[0], values[1]-viewer[1])
+            priority = priorities.get(uid, 0) + RELEVANCY_PRIORITY_RATE * min(1, RELEVANCY_DISTANCE/max(distance, 1))
+
+            if priority >= 1:
+                priorities.pop(uid, None)
+                filtered[uid] = values
+            else:
+                priorities[uid] = priority
+
+                # Not sending anything is the same as sending the same values again
+                if uid in last_sent:
+                    filtered[uid] = last_sent[uid]
+
+        # Entities that are gone shouldn't accumulate anything anymore
+        for uid in priorities.keys() - snapshot.keys():
+            del priorities[uid]
+
+        return filtered
+
+def on_removed_client(resources: Resources, event: RemovedClientEvent):
+    resources[Relevancy]._remove_client(event.ent)
+
+class RelevancyPlugin(Plugin):
+    def build(self, app):
+        app.insert_resource(Relevancy())
+        app.add_event_listener(RemovedClientEvent, on_removed_client)
@@ -0,0 +1,100 @@
+"""
+Players are syncronized with delta compressed snapshots (see the snapshot module). Every client gets its
+own snapshots (since relevancy filtering makes them different for every client), so the server remembers
+the last few snapshots sent to every client, and the last one every client has acknowledged. Every client
+then only receives the changes since its own acknowledged snapshot (or the full snapshot if it hasn't
+acknowledged anything we still remember).
+"""
+
+from plugin import Plugin, Resources
+
+from modules.snapshot import SnapshotHistory, NO_BASELINE, WRAP_SNAPSHOT_IDS, next_snapshot_id
+from modules.seqwindow import sequence_greater_than
+
+from plugins.rpcs.client import SYNC_PLAYERS_SCHEMA
+from plugins.server.commands import AcknowledgeSnapshotCommand
+from plugins.server.events import AddedClientEvent, RemovedClientEvent
+from plugins.server.services.clientlist import ClientList
+
+from typing import Optional
+
+SNAPSHOT_HISTORY_SIZE = 32
+"At 20 snapshots a second, this allows clients to be a bit more than a second behind"
+
+class ClientSnapshots:
+    "The history of player snapshots sent to every client, and their acknowledged snapshots"
+
+    def __init__(self):
+        self.snapshot_id: Optional[int] = None
+        "The ID of the latest snapshot. All clients share the same IDs"
+
+        self.histories: dict[int, SnapshotHistory] = {}
+        self.acknowledged: dict[int, int] = {}
+        "Client entities to the IDs of their last acknowledged snapshots"
+
+    def _add_client(self, client_ent: int):
+        self.histories[client_ent] = SnapshotHistory(SNAPSHOT_HISTORY_SIZE)
+        self.acknowledged[client_ent] = NO_BASELINE
+
+    def _remove_client(self, client_ent: int):
+        self.histories.pop(client_ent, None)
+        self.acknowledged.pop(client_ent, None)
+
+    def get_clients(self) -> tuple[int, ...]:
+        return tuple(self.acknowledged.keys())
+
+    def next_snapshot(self) -> int:
+        "Start a new snapshot, and return its ID"
+
+        self.snapshot_id = next_snapshot_id(self.snapshot_id)
+        return self.snapshot_id
+
+    def get_last_sent(self, client_ent: int) -> dict[int, tuple]:
+        "The last snapshot sent to this client (empty if nothing was sent)"
+
+        return self.histories[client_ent].get_latest() or {}
+
+    def acknowledge(self, client_ent: int, snapshot_id: int):
+        "Only snapshots that we still remember, and that are newer than the current acknowledged one are accepted"
+
+        current = self.acknowledged.get(client_ent)
+        if current is None or self.histories[client_ent].get(snapshot_id) is None:
+            return
+
+        if current == NO_BASELINE or sequence_greater_than(snapshot_id, current, WRAP_SNAPSHOT_IDS):
+            self.acknowledged[client_ent] = snapshot_id
+
+    def encode_for(self, client_ent: int, snapshot: dict[int, tuple]) -> bytes:
+        "Remember the client's version of the current snapshot, and encode it against the client's acknowledged one"
+
+        history = self.histories[client_ent]
+        history.push(self.snapshot_id, snapshot)
+
+        baseline_id = self.acknowledged[client_ent]
+
+        return SYNC_PLAYERS_SCHEMA.encode(
+            self.snapshot_id,
+            snapshot,
+            baseline_id,
+            history.get(baseline_id)
+        )
+
+def on_acknowledge_snapshot_command(resources: Resources, command: AcknowledgeSnapshotCommand):
+    clientlist = resources[ClientList]
+
+    if clientlist.contains_client_addr(command.addr):
+        resources[ClientSnapshots].acknowledge(clientlist.get_client_ent(command.addr), command.snapshot_id)
+
+def on_added_client(resources: Resources, event: AddedClientEvent):
+    resources[ClientSnapshots]._add_client(event.ent)
+
+def on_removed_client(resources: Resources, event: RemovedClientEvent):
+    resources[ClientSnapshots]._remove_client(event.ent)
+
+class ClientSnapshotsPlugin(Plugin):
+    def build(self, app):
+        app.insert_resource(ClientSnapshots())
+
+        app.add_event_listener(AcknowledgeSnapshotCommand, on_acknowledge_snapshot_command)
+        app.add_event_listener(AddedClientEvent, on_added_client)
+        app.add_event_listener(RemovedClientEvent, on_removed_client)
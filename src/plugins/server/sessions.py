@@ -0,0 +1,250 @@
+"""
+A multi-session server host.
+
+Normally every game is a separate server process with its own interpreter, socket and a full copy of
+everything imported. The session host instead runs many independent games (sessions) inside a single
+process on a single socket: every session is a separate server `App` (with its own world, client list
+and game state), but all of them are rooms of the same shared `HighUDPServer`.
+"""
+
+from plugin import App, AppBuilder, EventWriter
+
+from core.time import Clock
+
+from modules.network import HighUDPServer, HighUDPRoom, ShardEntrance, get_current_ip
+
+from plugins.server.constants import MAX_PLAYERS
+from plugins.server.services.state import CurrentGameState, GameState
+from plugins.server.commands import StartServerBroadcastingCommand
+from plugins.shared.services.network import Server
+from plugins.rpcs.channels import CHANNELS
+from plugins.rpcs.compression import COMPRESSOR
+
+from .runner import ServerController, ServerPlugins
+
+from typing import Optional, Callable
+
+import asyncio
+
+class GameSession:
+    "A single game hosted by the session host. It's a full server app that runs on a room"
+    def __init__(self, room: HighUDPRoom):
+        self.room = room
+        self.controller = ServerController()
+        self.app = App(AppBuilder(ServerPlugins(self.controller, room)))
+        self.clock = self.app.get_resource(Clock)
+        self.reserved = False
+        "A reserved session was handed out to someone, so it no longer counts as an available one"
+
+        # Startup loads the map among other things, so a session that's waiting to be used is already warm
+        self.app.startup()
+
+    def get_room_id(self) -> int:
+        return self.room.get_id()
+
+    def update(self):
+        "Update this session's app, based on its own clock"
+
+        self.clock.update(False)
+        self.app.update(self.clock.get_fixed_updates())
+
+    def get_time_until_update(self) -> float:
+        return self.clock.get_time_until_fixed_update()
+
+    def is_finished(self) -> bool:
+        """
+        A session is finished when it was told to quit, or when its game has already started but
+        everyone has left (nobody can join it anymore, so nothing is going to happen there)
+        """
+
+        if self.controller.should_quit():
+            return True
+
+        state = self.app.get_resource(CurrentGameState)
+        server = self.app.get_resource(Server)
+
+        return state != GameState.WaitingForPlayers and len(server.server.get_connection_addresses()) == 0
+
+    def finalize(self, clear_events: bool = False):
+        if clear_events:
+            # Same as in the server runner, a crashed app only gets finalized
+            self.app.get_resource(EventWriter).clear_events()
+
+        self.app.finalize()
+
+class SessionHost:
+    """
+    Hosts multiple game sessions in one process on one socket. The host always keeps `sessions` sessions
+    available: when a session finishes (or crashes) - it's closed and replaced with a fresh one.
+
+    Clients connect to the host's address as usual. They can request a specific session with its room ID,
+    else they get placed in the first session that accepts players.
+
+    Sessions can also be reserved (see `reserve_session`). A reserved session is no longer counted as 
+    available, so a fresh one gets prepared in its place.
+    """
+    def __init__(self, sessions: int, addr: Optional[tuple[str, int]] = None, entrance: Optional[ShardEntrance] = None):
+        """
+        Sharded hosts share the address of their entrance, to spread the packet processing between multiple 
+        processes. Their sessions still run on their own address (see the sharding section of the network module)
+        """
+        assert sessions > 0, "A session host needs at least a single session"
+
+        self.entrance = entrance
+        self.server = HighUDPServer(
+            addr or (get_current_ip(), 0), 
+            0, 
+            False, 
+            CHANNELS, 
+            COMPRESSOR, 
+            0 if entrance is None else entrance.shard
+        )
+        self.session_count = sessions
+        self.sessions: dict[int, GameSession] = {}
+        self.should_quit = False
+
+        self.on_session_opened: Callable[[int], None] = None
+        "A callback that's fired with the room ID of every new session. A public attribute"
+        self.on_session_closed: Callable[[int], None] = None
+        "A callback that's fired with the room ID of every closed session. A public attribute"
+
+    def get_addr(self) -> tuple[str, int]:
+        return self.server.get_addr()
+
+    def get_session_ids(self) -> tuple[int, ...]:
+        "The room IDs of all currently running sessions"
+        return tuple(self.sessions.keys())
+
+    def get_available_sessions(self) -> int:
+        return sum(not session.reserved for session in self.sessions.values())
+
+    def reserve_session(self, room_id: Optional[int] = None) -> Optional[int]:
+        """
+        Reserve an available session (a specific one if `room_id` is provided) and return its room ID 
+        (or `None` if there are no available ones). The replacement session will only get prepared 
+        on the next update, so this call is cheap.
+
+        Only reserved sessions broadcast themselves on the local network
+        """
+
+        for session in self.sessions.values():
+            if not session.reserved and room_id in (None, session.get_room_id()):
+                session.reserved = True
+                session.app.get_resource(EventWriter).push_event(StartServerBroadcastingCommand())
+                return session.get_room_id()
+
+        return None
+
+    def close_session(self, room_id: int):
+        "Ask a session to quit. It will get closed on the next update"
+
+        if room_id in self.sessions:
+            self.sessions[room_id].controller.make_quit()
+
+    def _open_session(self):
+        session = GameSession(self.server.open_room(MAX_PLAYERS))
+        self.sessions[session.get_room_id()] = session
+
+        print(f"SESSION HOST: Opened session {session.get_room_id()}")
+
+        if self.on_session_opened is not None:
+            self.on_session_opened(session.get_room_id())
+
+    def _close_session(self, session: GameSession, crashed: bool = False):
+        del self.sessions[session.get_room_id()]
+
+        try:
+            session.finalize(crashed)
+        except Exception as exception:
+            print(f"SESSION HOST: Session {session.get_room_id()} failed to finalize: {exception}")
+
+        # In case the session hasn't cleaned up its own room
+        session.room.close()
+
+        print(f"SESSION HOST: Closed session {session.get_room_id()}")
+
+        if self.on_session_closed is not None:
+            self.on_session_closed(session.get_room_id())
+
+    def _fill_sessions(self):
+        for _ in range(self.session_count - self.get_available_sessions()):
+            self._open_session()
+
+    def update(self) -> float:
+        """
+        Update all sessions, replace finished ones, and return the amount of time until any of the sessions
+        needs to be updated again.
+
+        A crash in one session only closes that session, the others are not affected.
+        """
+
+        for session in tuple(self.sessions.values()):
+            try:
+                session.update()
+                finished = session.is_finished()
+            except Exception as exception:
+                print(f"SESSION HOST: Session {session.get_room_id()} has caught an exception: {exception}")
+                self._close_session(session, True)
+                continue
+
+            if finished:
+                self._close_session(session)
+
+        self._fill_sessions()
+
+        return min(session.get_time_until_update() for session in self.sessions.values())
+
+    def make_quit(self):
+        self.should_quit = True
+
+    async def run(self, on_update: Optional[Callable[[], None]] = None):
+        """
+        Run all sessions until told to quit. Packets are received by the event loop as they arrive.
+        The optional `on_update` is called before every update (the process pool for example uses it to
+        handle its commands)
+        """
+
+        await self.server.open_datagram_endpoint(asyncio.get_running_loop())
+        if self.entrance is not None:
+            await self.entrance.open_datagram_endpoint(asyncio.get_running_loop())
+
+        print("SESSION HOST: Starting on", self.get_addr())
+        self._fill_sessions()
+
+        try:
+            while not self.should_quit:
+                if on_update is not None:
+                    on_update()
+
+                await asyncio.sleep(self.update())
+        finally:
+            self.close()
+
+    def close(self):
+        for session in tuple(self.sessions.values()):
+            self._close_session(session)
+
+        self.server.close()
+        if self.entrance is not None:
+            self.entrance.close()
+
+        print("SESSION HOST: Finalizing!")
+
+def run_session_host(
+    sessions: int, 
+    addr: Optional[tuple[str, int]] = None, 
+    shard: Optional[tuple[tuple[str, int], int, tuple[int, ...]]] = None
+):
+    """
+    Run a session host on this process. This blocks until the host quits (or is interrupted). 
+    
+    Sharded hosts also get their `shard`: the shared address, their index and the ports of all hosts in the group
+    (see `ShardEntrance`)
+    """
+
+    host = SessionHost(sessions, addr, None if shard is None else ShardEntrance(*shard))
+
+    try:
+        asyncio.run(host.run())
+    except KeyboardInterrupt:
+        pass
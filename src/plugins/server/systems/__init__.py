@@ -3,11 +3,13 @@ from plugin import Plugin
 from .base import BaseSystemsPlugin
 from .sync import SyncSystemsPlugin
 from .map import MapSystemsPlugin
+from .lagcomp import LagCompensationSystemsPlugin
 
 class ServerSystemsPlugin(Plugin):
     def build(self, app):
         app.add_plugins(
             BaseSystemsPlugin(),
             SyncSystemsPlugin(),
-            MapSystemsPlugin()
+            MapSystemsPlugin(),
+            LagCompensationSystemsPlugin()
         )
\ No newline at end of file
@@ -8,6 +8,12 @@ from core.time import Clock
 
 from plugins.server.components import *
 from plugins.server.actions import *
+from plugins.server.services.inputs import ClientInputs
+from plugins.rpcs.server import ControlPlayerCommand
+
+from plugins.shared.services.collisions import resolve_static_collisions
+from plugins.shared.systems.base import move_entity, rotate_entity
+from plugins.shared.systems.player import orient_player
 
 from plugin import Plugin, Resources, Schedule
 
@@ -26,10 +32,92 @@ def remove_dead_entities_system(resources: Resources):
             if health.is_dead():
                 cmd.remove_entity(ent)
 
+def apply_input(controller: PlayerController, angle_vel: AngleVelocity, command: ControlPlayerCommand):
+    controller.forward_dir = command.forward_dir
+    controller.horizontal_dir = command.horizontal_dir
+    controller.is_shooting = command.is_shooting
+    angle_vel.set_velocity(command.turn_dir)
+
+def step_player(resources: Resources, player_ent: int):
+    """
+    Simulate a single tick of the player's movement on its own, the same way the client replays its inputs.
+    The rest of the world stays where it is
+    """
+
+    world = resources[WorldECS]
+    dt = resources[Clock].get_fixed_delta()
+
+    pos, vel, angle, angle_vel, controller = world.get_components(player_ent, Position, Velocity, Angle, AngleVelocity, PlayerController)
+
+    orient_player(controller, vel, angle)
+    move_entity(pos, vel, dt)
+    rotate_entity(angle, angle_vel, dt)
+
+    if world.has_component(player_ent, DynCollider):
+        resolve_static_collisions(resources, pos, world.get_component(player_ent, DynCollider))
+
+def apply_client_inputs_system(resources: Resources):
+    """
+    Apply the next queued input of every client to its player. If an input didn't arrive in time - the player
+    keeps doing what it did on the previous tick. Clients whose inputs have piled up get 2 of them applied:
+    the first one is simulated right away, and the second one during the tick as usual
+    """
+
+    world = resources[WorldECS]
+    inputs = resources[ClientInputs]
+
+    for client_ent, owned_ent in world.query_component(OwnsEntity):
+        player_ent = owned_ent.get_ent()
+
+        if not world.contains_entity(player_ent) or not world.has_components(player_ent, PlayerController, AngleVelocity):
+            continue
+
+        catching_up = inputs.is_behind(client_ent) and world.has_components(player_ent, Position, Velocity, Angle)
+
+        command = inputs.pop(client_ent)
+        if command is None:
+            continue
+
+        controller, angle_vel = world.get_components(player_ent, PlayerController, AngleVelocity)
+        apply_input(controller, angle_vel, command)
+
+        if catching_up:
+            step_player(resources, player_ent)
+
+            # The weapon only fires during the tick, so a shot from the caught up input carries over into it
+            is_shooting = command.is_shooting
+
+            command = inputs.pop(client_ent)
+            apply_input(controller, angle_vel, command)
+            controller.is_shooting |= is_shooting
+
+def record_player_states_system(resources: Resources):
+    "Once the tick is fully simulated, remember the resulting states of players whose inputs were applied"
+
+    world = resources[WorldECS]
+    inputs = resources[ClientInputs]
+
+    for client_ent, tick in inputs.take_applied().items():
+        if not world.contains_entity(client_ent) or not world.has_component(client_ent, OwnsEntity):
+            continue
+
+        player_ent = world.get_component(client_ent, OwnsEntity).get_ent()
+        if not world.contains_entity(player_ent) or not world.has_components(player_ent, Position, Angle):
+            continue
+
+        pos, angle = world.get_components(player_ent, Position, Angle)
+        pos = pos.get_position()
+
+        inputs.set_state(client_ent, tick, (pos.x, pos.y), angle.get_angle())
+
 class BaseSystemsPlugin(Plugin):
     def build(self, app):
         app.add_systems(
             Schedule.FixedUpdate, 
             update_invincibilities_system, 
             remove_dead_entities_system
-        )
\ No newline at end of file
+        )
+
+        # Inputs are applied before players get oriented, and the results are recorded after collisions
+        app.add_systems(Schedule.FixedUpdate, apply_client_inputs_system, priority=-2)
+        app.add_systems(Schedule.FixedUpdate, record_player_states_system, priority=2)
\ No newline at end of file
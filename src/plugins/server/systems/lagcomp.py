@@ -0,0 +1,87 @@
+from plugin import Plugin, Resources, Schedule, EventWriter
+
+from core.ecs import WorldECS
+from core.time import Clock
+
+from plugins.shared.services.network import Server
+from plugins.shared.events import CollisionEvent
+
+from plugins.server.services.clientlist import ClientList
+from plugins.server.services.lagcomp import PositionHistory
+from plugins.server.services.inputs import ClientInputs
+from plugins.server.constants import MAX_REWIND_TIME
+from plugins.server.components import *
+
+import numpy as np
+
+def record_positions_system(resources: Resources):
+    "Remember where all hittable entities are at the end of this tick"
+
+    world = resources[WorldECS]
+
+    entities = {}
+    for ent, (pos, collider) in world.query_components(Position, DynCollider, including=Hittable):
+        pos = pos.get_position()
+        entities[ent] = ((pos.x, pos.y), collider.radius)
+
+    resources[PositionHistory].record(entities)
+
+def get_rewind_time(resources: Resources, shooter_ent: int) -> float:
+    """
+    How far in the past the shooter sees other players (0 for shooters that aren't owned by clients): the round trip,
+    and the interpolation delay its client has reported with its latest inputs
+    """
+
+    world = resources[WorldECS]
+    clientlist = resources[ClientList]
+
+    if not world.contains_entity(shooter_ent) or not world.has_component(shooter_ent, OwnedByClient):
+        return 0
+
+    client_ent = world.get_component(shooter_ent, OwnedByClient).get_client_ent()
+    if not clientlist.contains_client_ent(client_ent):
+        return 0
+
+    rtt = resources[Server].get_rtt(clientlist.get_client_addr(client_ent)) or 0
+
+    return min(rtt + resources[ClientInputs].get_snapshot_delay(client_ent), MAX_REWIND_TIME)
+
+def compensate_projectile_hits_system(resources: Resources):
+    """
+    Check projectiles of lag compensated shooters against positions the shooter saw. Hits are pushed as
+    rewound collision events, and get handled like any other projectile hit
+    """
+
+    world = resources[WorldECS]
+    ewriter = resources[EventWriter]
+    history = resources[PositionHistory]
+    fixed_fps = 1/resources[Clock].get_fixed_delta()
+
+    active = history.get_active()
+    if not active.any():
+        return
+
+    slot_ents = history.get_slot_entities()
+    radiuses = history.get_radiuses()
+
+    # Every shooter has its own view of the world
+    rewound_by_shooter: dict[int, np.ndarray] = {}
+
+    for ent, (pos, collider, shot_by) in world.query_components(Position, DynCollider, ShotBy, including=LagCompensated):
+        shooter_ent = shot_by.get_ent()
+
+        rewound = rewound_by_shooter.get(shooter_ent)
+        if rewound is None:
+            rewound = rewound_by_shooter[shooter_ent] = history.rewind(get_rewind_time(resources, shooter_ent) * fixed_fps)
+
+        pos = pos.get_position()
+        distances_sq = np.sum((rewound - (pos.x, pos.y))**2, axis=1)
+
+        hits = np.flatnonzero(active & (distances_sq < (radiuses + collider.radius)**2) & (slot_ents != shooter_ent))
+        for slot in hits:
+            ewriter.push_event(CollisionEvent(ent, int(slot_ents[slot]), DynCollider, rewound=True))
+
+class LagCompensationSystemsPlugin(Plugin):
+    def build(self, app):
+        # After collisions, so both projectiles and hittable entities are where this tick has left them
+        app.add_systems(Schedule.FixedUpdate, record_positions_system, compensate_projectile_hits_system, priority=2)
@@ -2,53 +2,66 @@ from plugin import Plugin, Resources
 
 from core.ecs import WorldECS
 
-from ..actions import SyncTimeAction, ServerActionDispatcher
+from ..actions import ServerActionDispatcher
 
-from core.time import Clock, schedule_systems_seconds
+from core.time import schedule_systems_seconds
 
+from plugins.server.services.snapshots import ClientSnapshots
+from plugins.server.services.inputs import ClientInputs
+from plugins.server.services.relevancy import Relevancy
+from plugins.shared.interfaces.map import WorldMap
+from plugins.rpcs.pack import pack_angle
 from plugins.server.components import *
 from plugins.server.actions import *
 
-def tick_sync_client_timer_system(resources: Resources):
-    "This system runs in a while and essentially syncronizes client's clock with the server's"
-
-    dispatcher = resources[ServerActionDispatcher]
-    clock = resources[Clock]
-    
-    # Once in a while, we're going to syncronize client's clock with ours
-    dispatcher.dispatch_action(SyncTimeAction(clock.get_execution_time()))
-
 def sync_players_system(resources: Resources):
     """
-    Syncronize all movable entities by collecting their UIDs, positions, angles and shooting statuses,
-    sending them over network
+    Syncronize all movable entities by collecting their UIDs, positions, angles and shooting statuses
+    into a snapshot. Every client then receives only the relevant part of it, and only what has changed 
+    since its last acknowledged snapshot
     """
 
     world = resources[WorldECS]
     action_dispatcher = resources[ServerActionDispatcher]
+    snapshots = resources[ClientSnapshots]
+    relevancy = resources[Relevancy]
+    world_map = resources.get(WorldMap)
 
-    moved_entries = []
+    snapshot = {}
 
     for _, (ent, pos, angle, controller) in world.query_components(NetEntity, Position, Angle, PlayerController, including=NetSyncronized):
-        uid = ent.get_uid()
-
         pos = pos.get_position()
-        angle = angle.get_angle()
-        is_shooting = controller.is_shooting
 
-        moved_entries.append((uid, (pos.x, pos.y), angle, is_shooting))
+        # Snapshot values are quantized the same way they're sent, so we only detect changes the client can notice
+        snapshot[ent.get_uid()] = (int(pos.x), int(pos.y), pack_angle(angle.get_angle()), controller.is_shooting)
 
-    action_dispatcher.dispatch_action(SyncPlayersAction(
-        tuple(moved_entries)
-    )) 
+    # Every client looks at the world from its own player
+    viewers = {
+        owner.get_client_ent(): ent.get_uid() 
+        for _, (ent, owner) in world.query_components(NetEntity, OwnedByClient)
+    }
 
-class SyncSystemsPlugin(Plugin):
-    def build(self, app):
-        # In this plugin we're going to initialize the game session resource and the server
-        schedule_systems_seconds(
-            app,
-            (tick_sync_client_timer_system, 5, True)
+    snapshots.next_snapshot()
+
+    for client_ent in snapshots.get_clients():
+        client_snapshot = relevancy.filter_snapshot(
+            client_ent,
+            viewers.get(client_ent),
+            snapshot,
+            snapshots.get_last_sent(client_ent),
+            world_map
         )
 
+        action_dispatcher.dispatch_action(SyncPlayersAction(
+            client_ent, 
+            snapshots.encode_for(client_ent, client_snapshot)
+        ))
+
+    # Clients predict their own players, so they also get the exact state after their latest applied input
+    for client_ent, (input_tick, pos, angle) in resources[ClientInputs].take_states().items():
+        action_dispatcher.dispatch_action(SyncPlayerStateAction(client_ent, input_tick, pos, angle))
+
+class SyncSystemsPlugin(Plugin):
+    def build(self, app):
         # We would like to syncronize our movables 20 times a second
         schedule_systems_seconds(app, (sync_players_system, 1/20, True))
\ No newline at end of file
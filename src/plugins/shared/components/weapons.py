@@ -89,6 +89,22 @@ class ProjectileFactory:
             GameEntity()
         )
 
+@component
+class ShotBy:
+    "The entity that has shot this projectile"
+    def __init__(self, ent: int):
+        self.ent = ent
+
+    def get_ent(self) -> int:
+        return self.ent
+
+@component
+class LagCompensated:
+    """
+    Projectiles of entities with this tag hit others where the shooter saw them, not where they currently are.
+    Their projectiles get this tag as well, and their hits are detected by the server instead (see lag compensation)
+    """
+
 class WeaponStats:
     "This class contains actor-agnostic weapon statistics."
     def __init__(self, cooldown: float = 1, automatic: bool = False):
@@ -1,6 +1,20 @@
-SNAP_PLAYER_POSITION_DISTANCE = 100
-'''
-This distance essentially tells at which point to snap the player to the "correct" location.
-Note: this is not really an anticheat, as the player just needs to send more packets to bypass it.
-It's more of a way to achieve "forced teleportations" server-side 
-'''
\ No newline at end of file
+INTERPOLATION_TIME_DELAY = 0.05
+"""
+This is the time we're going to subtract when interpolating network positions. Why?
+Because it will make our clients move like they're in the past. Ideally we would like to live in
+the past, so that all motion doesn't seem to immediate for us.
+
+This is the shortest delay. Clients raise it depending on how regularly snapshots arrive (see 
+`InterpolationDelay`), and send their current delay with their inputs, so the server can rewind players 
+by as much for hit detection (see lag compensation). Until a client's first inputs arrive - the server assumes
+this one
+"""
+
+MAX_INTERPOLATION_TIME_DELAY = 0.25
+"The longest interpolation delay, no matter how unstable the connection is"
+
+MAX_EXTRAPOLATION_TIME = 0.1
+"""
+When no newer snapshots have arrived in time, network positions keep moving the way they did, but 
+only for this long
+"""
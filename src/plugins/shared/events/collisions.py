@@ -9,8 +9,11 @@ class CollisionEvent:
     Hit entity is the entity that touched our entity. It's important to note than 2 sensors can absolutely
     collide, so this event will also affect sensor/sensor collisions
     """
-    def __init__(self, sensor_entity: int, hit_entity: int, hit_collider_ty: type):
+    def __init__(self, sensor_entity: int, hit_entity: int, hit_collider_ty: type, rewound: bool = False):
         self.sensor_entity = sensor_entity
 
         self.hit_entity = hit_entity
-        self.hit_collider_ty = hit_collider_ty
\ No newline at end of file
+        self.hit_collider_ty = hit_collider_ty
+
+        self.rewound = rewound
+        "The hit entity was rewound to where the sensor's owner saw it (see lag compensation on the server)"
\ No newline at end of file
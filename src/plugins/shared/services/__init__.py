@@ -4,6 +4,7 @@ from .map import WorldMapPlugin
 from .collisions import CollisionsPlugin
 from .uidman import EntityUIDManagerPlugin
 from .network import NetworkPlugin
+from .telemetry import NetworkTelemetryPlugin
 
 class SharedServicesPlugin(Plugin):
     def build(self, app):
@@ -11,5 +12,6 @@ class SharedServicesPlugin(Plugin):
             WorldMapPlugin(),
             CollisionsPlugin(),
             EntityUIDManagerPlugin(),
-            NetworkPlugin()
+            NetworkPlugin(),
+            NetworkTelemetryPlugin()
         )
\ No newline at end of file
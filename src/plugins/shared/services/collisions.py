@@ -35,6 +35,12 @@ class _CollisionsState:
         self.resolved: set = set()
         "All resolved collider/collider pairs that will be ignored"
 
+        self.collider_cells: dict[tuple[int, int], list[tuple[int, DynCollider]]] = {}
+        "The cells of a single dynamic collider, when resolving its static collisions"
+
+        self.resolved_static: set = set()
+        "Static colliders already resolved with a single dynamic collider"
+
     def _clear_grid(self, grid: dict[tuple[int, int], list]):
         for cell in grid.values():
             cell.clear()
@@ -130,6 +136,48 @@ def fill_grid_with_colliders(
         # Finally, add our primary cell to the colliders
         grid.setdefault(pos, []).append((ent, collider))
 
+def _resolve_collider_static(collisions_state: _CollisionsState, pos: Position, collider: DynCollider):
+    """
+    Resolve a single (already moved) dynamic collider against all static colliders in its cells. The order only
+    depends on the collider's position, so the same movement always gets resolved the same way
+    """
+
+    cells = collisions_state.collider_cells
+    resolved = collisions_state.resolved_static
+    grid_static = collisions_state.grid_static
+
+    fill_grid_with_colliders(cells, ((None, (pos, collider)), ))
+
+    # Large static colliders can be in multiple cells at once
+    for cell in cells:
+        for ent, static_collider in grid_static.get(cell, ()):
+            if ent in resolved:
+                continue
+
+            collider.resolve_collision_static(static_collider)
+            resolved.add(ent)
+
+    cells.clear()
+    resolved.clear()
+
+def resolve_static_collisions(resources: Resources, pos: Position, collider: DynCollider):
+    """
+    Resolve collisions of a single dynamic collider against static colliders only, and move its position.
+    This is useful when a single entity has to be simulated again (like when the client replays its player's
+    inputs), while the rest of the world should stay where it is. 
+    
+    The result is exactly the same as in `resolve_collisions_system`, unless the entity also collides with 
+    dynamic colliders
+    """
+
+    if collider.sensor:
+        return
+
+    collider = collider.as_moved(pos.get_position())
+    _resolve_collider_static(resources[_CollisionsState], pos, collider)
+
+    pos.set_position(*collider.get_position())
+
 def resolve_collisions_system(resources: Resources):
     world = resources[WorldECS]
     ewriter = resources[EventWriter]
@@ -145,6 +193,12 @@ def resolve_collisions_system(resources: Resources):
     dyn_colliders = [(ent, (pos, collider.as_moved(pos.get_position()))) for ent, (pos, collider) in world.query_components(Position, DynCollider)]
     fill_grid_with_colliders(grid_dynamic, dyn_colliders)
 
+    # Static collisions are resolved first, separately for every collider. Otherwise their order would depend on the 
+    # order of cells in the dynamic grid (that is, on the rest of the world), and clients couldn't replay their movement
+    for _, (pos, collider) in dyn_colliders:
+        if not collider.sensor:
+            _resolve_collider_static(collisions_state, pos, collider)
+
     events: list[CollisionEvent] = []
 
     # Now, the most ugly part - the collision detection and resolution
@@ -158,19 +212,15 @@ def resolve_collisions_system(resources: Resources):
         # Iterate every dynamic collider
         for ent1, collider1 in d_colliders:
             
-            # Resolve dynamic collisions
-            for ent2, collider2 in s_colliders:
+            # Check sensor collisions with static colliders (the rest are already resolved)
+            for ent2, collider2 in (s_colliders if collider1.sensor else ()):
                 checks += 1
                 if ((ent1, ent2) in resolved) or ((ent2, ent1) in resolved):
                     # Of course ignore colliders that we already resolved
                     continue
-            
-                # The same check applies for sensor and static colliders 
 
-                if collider1.sensor and collider1.is_colliding_static(collider2):
+                if collider1.is_colliding_static(collider2):
                     events.append(CollisionEvent(ent1, ent2, StaticCollider))
-                else:
-                    collider1.resolve_collision_static(collider2)
 
                 resolved.add((ent1, ent2))
 
@@ -13,6 +13,8 @@ from modules.rpc import *
 
 from typing import Callable, Union, Optional
 
+import asyncio
+
 class RPCCallerAddress:
     """
     The global RPC caller's address that changes depending on who's calling the RPC.
@@ -82,10 +84,21 @@ class Client:
     CONNECTION_ATTEMPTS = 10
     CONNECTION_ATTEMPT_DELAY = 0.5
 
-    def __init__(self, resources: Resources, rpcs: tuple[Callable, ...] = ()):
+    def __init__(
+        self, 
+        resources: Resources, 
+        rpcs: tuple[Callable, ...] = (), 
+        channels: tuple[ChannelMode, ...] = (),
+        compressor: Optional[MessageCompressor] = None
+    ):
+        """
+        The channels and the compressor should match the server's ones (see the channels and compression 
+        sections of the network module)
+        """
         self.resources = resources
         self.ewriter = resources[EventWriter]
-        self.client = HighUDPClient((get_current_ip(), 0))
+        self.client = HighUDPClient((get_current_ip(), 0), channels, compressor)
+        self.writer = PacketWriter()
         self.rpcs: dict[int, Callable] = {}
 
         self._init_hooks()
@@ -110,18 +123,26 @@ class Client:
     
     def is_connected(self) -> bool:
         return self.client.is_connected()
+    
+    def get_rtt(self) -> Optional[float]:
+        "The round trip time to the server in seconds. `None` if it wasn't measured yet"
+        return self.client.get_rtt()
+    
+    def get_stats(self) -> ConnectionStats:
+        "Network statistics of our connection to the server (see the statistics section of the network module)"
+        return self.client.get_stats()
 
-    def try_connect(self, to: tuple[str, int]):
+    def try_connect(self, to: tuple[str, int], room_id: Optional[int] = None):
         """
         Kickstart client's attemp to connect. This operation can fail, so make sure to listen for
-        connection failure events.
+        connection failure events. A room ID is only needed for servers that host multiple sessions.
 
         Furthermore, if the client is already connected - this method will panic. 
         """
 
         assert not self.client.is_connected()
 
-        self.client.connect(to, Client.CONNECTION_ATTEMPTS, Client.CONNECTION_ATTEMPT_DELAY)
+        self.client.connect(to, Client.CONNECTION_ATTEMPTS, Client.CONNECTION_ATTEMPT_DELAY, room_id)
 
     def attach_rpcs(self, *rpcs: Callable):
         _attach_rpcs(self.rpcs, rpcs)
@@ -135,9 +156,13 @@ class Client:
 
     def call(self, rpc_func: Callable, *args):
         "Call the provided RPC function with the provided arguments on the server (if it's attached there)"
-        self.client.send(
-            serialize_call(rpc_func, args), 
-            is_rpc_reliable(rpc_func)
+        write_call(self.writer, rpc_func, args)
+        self.client.send_written(
+            self.writer, 
+            is_rpc_reliable(rpc_func), 
+            get_rpc_supersession_key(rpc_func), 
+            get_rpc_channel(rpc_func),
+            is_rpc_compressed(rpc_func)
         )
 
     def close(self):
@@ -146,12 +171,34 @@ class Client:
         self.ewriter.push_event(ServerDisonnectedEvent())
 
 class Server:
-    def __init__(self, resources: Resources, max_clients: int, rpcs: tuple[Callable, ...] = ()):
+    def __init__(
+        self, 
+        resources: Resources, 
+        max_clients: int, 
+        rpcs: tuple[Callable, ...] = (), 
+        io_thread: bool = False,
+        room: Optional[HighUDPRoom] = None,
+        channels: tuple[ChannelMode, ...] = (),
+        compressor: Optional[MessageCompressor] = None
+    ):
+        """
+        When a room is provided - this server will run on it instead of creating its own socket 
+        (see rooms in the network module). Rooms use the channels and the compressor of the server that opened them
+        """
         self.resources = resources
         self.ewriter = resources[EventWriter]
-        self.server = HighUDPServer((get_current_ip(), 0), max_clients)
+        if room is None:
+            self.server = HighUDPServer((get_current_ip(), 0), max_clients, channels=channels, compressor=compressor)
+        else:
+            self.server = room
+            self.server.set_max_connections(max_clients)
+        self.writer = PacketWriter()
         self.rpcs: dict[int, Callable] = {}
 
+        if io_thread:
+            # Packets will be received on a separate thread, so they don't wait for our fixed ticks
+            self.server.start_receiver_thread()
+
         self._init_event_hooks()
         self.attach_rpcs(*rpcs)
 
@@ -173,9 +220,37 @@ class Server:
     def get_addr(self) -> tuple[str, int]:
         return self.server.get_addr()
     
+    def get_room_id(self) -> Optional[int]:
+        "The ID of the room this server runs on. `None` if it has its own socket"
+        return self.server.get_id() if isinstance(self.server, HighUDPRoom) else None
+    
     def attach_rpcs(self, *rpcs: Callable):
         _attach_rpcs(self.rpcs, rpcs)
 
+    async def open_datagram_endpoint(self):
+        "Let the running asyncio event loop receive this server's packets as they arrive"
+
+        await self.server.open_datagram_endpoint(asyncio.get_running_loop())
+
+    def get_last_arrival_time(self) -> float:
+        """
+        The `time.perf_counter` time at which the currently executed RPC call has arrived. Only meaningful inside
+        RPC contexts. It's precise only when the server was created with an IO thread
+        """
+        return self.server.get_last_arrival_time()
+    
+    def get_rtt(self, addr: tuple[str, int]) -> Optional[float]:
+        "The round trip time to the provided client in seconds. `None` if it wasn't measured yet"
+        return self.server.get_rtt(addr)
+    
+    def get_stats(self, addr: tuple[str, int]) -> Optional[ConnectionStats]:
+        "Network statistics of the provided client. `None` if it isn't connected"
+        return self.server.get_stats(addr)
+    
+    def get_total_stats(self) -> ConnectionStats:
+        "Network statistics of all clients together, including the ones that have already disconnected"
+        return self.server.get_total_stats()
+
     def tick(self, dt: float):
         self.server.tick(dt)
         while self.server.has_packets():
@@ -184,19 +259,28 @@ class Server:
 
     def call(self, addr: tuple[str, int], rpc_func: Callable, *args):
         "Call the provided RPC function with the provided arguments on the provided client (if it's attached there)"
-        self.server.send_to(
-            addr,
-            serialize_call(rpc_func, args), 
-            is_rpc_reliable(rpc_func)
+        write_call(self.writer, rpc_func, args)
+        self.server.send_written_to(
+            addr, 
+            self.writer, 
+            is_rpc_reliable(rpc_func), 
+            get_rpc_supersession_key(rpc_func), 
+            get_rpc_channel(rpc_func),
+            is_rpc_compressed(rpc_func)
         )
 
     def call_all(self, rpc_func: Callable, *args):
         "Execute the RPC function on all connected clients"
-        rpc_call = serialize_call(rpc_func, args)
-        reliability = is_rpc_reliable(rpc_func)
-
-        for addr in self.server.get_connection_addresses():
-            self.server.send_to(addr, rpc_call, reliability)
+        write_call(self.writer, rpc_func, args)
+
+        self.server.multicast(
+            self.server.get_connection_addresses(), 
+            self.writer, 
+            is_rpc_reliable(rpc_func), 
+            get_rpc_supersession_key(rpc_func),
+            get_rpc_channel(rpc_func),
+            is_rpc_compressed(rpc_func)
+        )
 
     def close(self):
         "Always close the server when you're done with it"
@@ -0,0 +1,121 @@
+"""
+Network telemetry. Both the client and the server sample the statistics of their network actor every
+`NetworkTelemetry.SAMPLE_RATE` seconds, and keep a short history of them. Counters (like sent bytes) are
+stored as rates per second, while the rest (like the round trip time) are stored as they were when sampled.
+
+On the server, counters include all clients, while the round trip time and the loss are averaged between them
+(see `sum_connection_stats`)
+"""
+
+from plugin import Plugin, Resources, Schedule
+
+from core.time import Clock
+
+from plugins.shared.services.network import Client, Server
+
+from modules.network import ConnectionStats
+
+from typing import Optional
+
+import numpy as np
+
+class NetworkTelemetry:
+    "The history of network statistics, as ring buffers (one per statistic)"
+
+    SAMPLE_RATE = 1
+    "How often (in seconds) the statistics are sampled"
+
+    HISTORY_SIZE = 120
+    "How many samples are kept"
+
+    FIELDS = ConnectionStats.COUNTERS + ("queue_depth", "rtt", "loss")
+
+    def __init__(self):
+        self.history = np.zeros((len(NetworkTelemetry.FIELDS), NetworkTelemetry.HISTORY_SIZE), np.float64)
+        "Every row is the history of a single field. Unknown round trip times are stored as NaN"
+        self.rows = {field: row for row, field in enumerate(NetworkTelemetry.FIELDS)}
+
+        self.head = -1
+        "The column of the latest sample"
+        self.samples = 0
+
+        self.last_stats: Optional[ConnectionStats] = None
+        "The previous sample, to compute the rates of counters"
+        self.elapsed = 0.0
+        "The time since the previous sample"
+
+    def record(self, stats: ConnectionStats, dt: float):
+        "Record a new sample, taken `dt` seconds after the previous one"
+
+        self.head = (self.head + 1) % NetworkTelemetry.HISTORY_SIZE
+        self.samples = min(self.samples + 1, NetworkTelemetry.HISTORY_SIZE)
+
+        column = self.history[:, self.head]
+        last = self.last_stats
+
+        for counter in ConnectionStats.COUNTERS:
+            # Counters start over with new actors (like after reconnecting to another server)
+            value, last_value = getattr(stats, counter), getattr(last, counter) if last is not None else 0
+            column[self.rows[counter]] = (value - last_value if value >= last_value else value) / dt
+
+        column[self.rows["queue_depth"]] = stats.queue_depth
+        column[self.rows["rtt"]] = stats.rtt if stats.rtt is not None else np.nan
+        column[self.rows["loss"]] = stats.loss
+
+        self.last_stats = stats
+
+    def tick(self, dt: float) -> bool:
+        "Advance the time since the previous sample. Returns whether it's time to take a new one"
+
+        self.elapsed += dt
+        return self.elapsed >= NetworkTelemetry.SAMPLE_RATE
+    
+    def take_elapsed(self) -> float:
+        elapsed = self.elapsed
+        self.elapsed = 0.0
+
+        return elapsed
+
+    def get_history(self, field: str) -> np.ndarray:
+        "The samples of the provided field, from the oldest to the latest"
+
+        row = self.history[self.rows[field]]
+        start = self.head + 1 - self.samples
+
+        return np.roll(row, -start)[:self.samples]
+
+    def get_latest(self, field: str) -> Optional[float]:
+        "The latest sample of the provided field. `None` if there are no samples yet"
+        
+        if self.samples == 0:
+            return None
+        
+        return float(self.history[self.rows[field], self.head])
+
+    def reset(self):
+        self.head = -1
+        self.samples = 0
+        self.last_stats = None
+        self.elapsed = 0.0
+
+def sample_network_telemetry_system(resources: Resources):
+    telemetry = resources[NetworkTelemetry]
+
+    if not telemetry.tick(resources[Clock].get_fixed_delta()):
+        return
+    
+    server, client = resources.get(Server), resources.get(Client)
+    if server is not None:
+        stats = server.get_total_stats()
+    elif client is not None:
+        stats = client.get_stats()
+    else:
+        telemetry.reset()
+        return
+    
+    telemetry.record(stats, telemetry.take_elapsed())
+
+class NetworkTelemetryPlugin(Plugin):
+    def build(self, app):
+        app.insert_resource(NetworkTelemetry())
+        app.add_systems(Schedule.FixedUpdate, sample_network_telemetry_system)
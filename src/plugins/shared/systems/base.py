@@ -5,15 +5,21 @@ from core.ecs import WorldECS
 
 from plugins.shared.components.base import *
 
+def move_entity(position: Position, velocity: Velocity, dt: float):
+    position.apply_vector(velocity.get_velocity() * dt)
+
+def rotate_entity(angle: Angle, angle_vel: AngleVelocity, dt: float):
+    angle.set_angle(angle.get_angle() + angle_vel.get_velocity() * dt)
+
 def move_entities_system(resources: Resources):
     world = resources[WorldECS]
     dt = resources[Clock].get_fixed_delta()
     
     for _, (position, velocity) in world.query_components(Position, Velocity):
-        position.apply_vector(velocity.get_velocity() * dt)
+        move_entity(position, velocity, dt)
 
     for _, (angle, angle_vel) in world.query_components(Angle, AngleVelocity):
-        angle.set_angle(angle.get_angle() + angle_vel.get_velocity() * dt)
+        rotate_entity(angle, angle_vel, dt)
 
 def remove_temp_entities_system(resources: Resources):
     world = resources[WorldECS]
@@ -21,6 +21,9 @@ def collide_projectiles_system(resources: Resources, event: CollisionEvent):
         if event.hit_collider_ty is StaticCollider:
             # The projectile has hit a wall - kill him!
             world.remove_entity(projectile_entity)
+        elif not event.rewound and world.has_component(projectile_entity, LagCompensated):
+            # Where the target currently is doesn't matter, only where the shooter saw it
+            return
         elif world.has_components(target_entity, Hittable, Team, Health):
             projectile_team, projectile = world.get_components(projectile_entity, Team, Projectile)
             target_team = world.get_component(target_entity, Team)
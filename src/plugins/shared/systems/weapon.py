@@ -26,8 +26,10 @@ def shoot_weapons_system(resources: Resources):
             if weapon.may_shoot():
                 ewriter.push_event(WeaponUseEvent(ent))
                 
-                cmd.create_entity(*
-                    weapon.shoot(pos.get_position(), angle.get_vector(), damage_multiplier)
+                cmd.create_entity(
+                    *weapon.shoot(pos.get_position(), angle.get_vector(), damage_multiplier),
+                    ShotBy(ent),
+                    *((LagCompensated(), ) if world.has_component(ent, LagCompensated) else ())
                 )
 
 class WeaponSystemsPlugin(Plugin):
@@ -0,0 +1,37 @@
+from ward import test, raises
+
+from modules.bitpack import *
+
+@test("Bit schemas should pack fields tightly")
+def _():
+    schema = BitSchema(Int(-4096, 4095), Int(-4096, 4095), UInt(8), Bool(), Int(-1, 1), Bool())
+
+    # 13+13+8+1+2+1 bits fit into 5 bytes
+    assert schema.bits == 38
+    assert schema.size == 5
+
+    values = (-4096, 1234, 255, True, -1, False)
+    assert schema.unpack(schema.pack(*values)) == values
+
+@test("Bit fields should clamp and quantize their values")
+def _():
+    schema = BitSchema(UInt(4), Int(0, 10), Fixed(-1, 1, 8))
+
+    packed = schema.pack(100, -5, 0.5)
+    uint, int_, fixed = schema.unpack(packed)
+
+    assert uint == 15
+    assert int_ == 0
+    assert abs(fixed - 0.5) <= 1/255
+
+    assert schema.unpack(schema.pack(0, 10, 5))[1:] == (10, 1)
+
+@test("Unpacking data of the wrong size should fail")
+def _():
+    schema = BitSchema(UInt(12))
+
+    with raises(BitpackError):
+        schema.unpack(b"\x00")
+
+    with raises(BitpackError):
+        schema.unpack(b"\x00\x00\x00")
@@ -0,0 +1,60 @@
+from ward import test
+from modules.clocksync import ClockSync
+
+@test("Clock sync should compensate the round trip time")
+def _():
+    sync = ClockSync()
+    assert sync.get_offset() == 0
+
+    # The remote clock is 100 seconds ahead, and the request took 0.1 seconds there and back
+    assert sync.push_sample(10, 110.05, 110.05, 10.1)
+    assert abs(sync.get_offset() - 100) < 1e-9
+    assert abs(sync.get_rtt() - 0.1) < 1e-9
+
+    assert not sync.push_sample(10, 110, 110, 9)
+
+@test("Clock sync should subtract the time the request was held on the remote side")
+def _():
+    sync = ClockSync()
+
+    # The same as above, but the answer waited 0.2 seconds before it was sent back
+    assert sync.push_sample(10, 110.05, 110.25, 10.3)
+    assert abs(sync.get_offset() - 100) < 1e-9
+    assert abs(sync.get_rtt() - 0.1) < 1e-9
+
+    # Answered before it was received
+    assert not sync.push_sample(10, 110.25, 110.05, 10.3)
+    # Held for longer than the whole round trip
+    assert not sync.push_sample(10, 110.05, 110.5, 10.3)
+
+@test("Clock sync should ignore samples with long round trip times")
+def _():
+    sync = ClockSync(samples=8)
+
+    for i in range(3):
+        # The answers got delayed on their way back, so they look like the remote clock is behind
+        sync.push_sample(i, i + 100 + 0.05, i + 100 + 0.05, i + 1.05)
+    for i in range(3, 8):
+        sync.push_sample(i, i + 100 + 0.05, i + 100 + 0.05, i + 0.1)
+
+    # Only the 4 fastest samples are used, so the delayed ones don't matter
+    assert abs(sync.get_target_offset() - 100) < 1e-9
+
+@test("Clock sync should slew small corrections and step large ones")
+def _():
+    sync = ClockSync(samples=1, max_slew_rate=0.1, max_slew_error=0.5)
+    sync.push_sample(0, 10, 10, 0)
+    assert sync.get_offset() == 10
+
+    sync.push_sample(1, 11.2, 11.2, 1)
+    assert sync.get_offset() == 10
+    sync.update(1)
+    assert abs(sync.get_offset() - 10.1) < 1e-9
+    sync.update(10)
+    assert abs(sync.get_offset() - 10.2) < 1e-9
+
+    sync.push_sample(2, 14, 14, 2)
+    assert sync.get_offset() == 12
+
+    sync.reset()
+    assert sync.get_offset() == 0 and sync.get_rtt() is None
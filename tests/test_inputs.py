@@ -0,0 +1,193 @@
+from ward import test, raises
+
+from plugin import Resources, EventWriter
+
+from core.ecs import WorldECS
+from core.time import Clock
+
+from plugins.shared.services.network import RPCCallerAddress, RPCFormatError
+from plugins.rpcs.server import (
+    control_player_rpc, ControlPlayerCommand, CONTROL_INPUTS_HEADER, CONTROL_PLAYER_SCHEMA,
+    INPUT_REDUNDANCY, WRAP_INPUT_TICKS, pack_snapshot_delay
+)
+from plugins.server.services.inputs import ClientInputs, MAX_QUEUED_INPUTS, TARGET_QUEUED_INPUTS
+from plugins.server.systems.base import apply_client_inputs_system
+from plugins.server.components import Position, Velocity, Angle, AngleVelocity, PlayerController, OwnsEntity
+from plugins.shared.systems.base import move_entity, rotate_entity
+from plugins.shared.systems.player import orient_player
+from plugins.shared.constants import INTERPOLATION_TIME_DELAY
+
+CLIENT = 1
+ADDR = ("127.0.0.1", 1500)
+FPS = 30
+
+def make_command(tick: int, snapshot_delay: float = INTERPOLATION_TIME_DELAY, turn_dir: int = 0) -> ControlPlayerCommand:
+    return ControlPlayerCommand(ADDR, tick, 1, 0, turn_dir, False, snapshot_delay)
+
+def make_resources() -> Resources:
+    caller = RPCCallerAddress()
+    caller.addr = ADDR
+
+    return Resources(EventWriter(), caller)
+
+def pack_inputs(latest_tick: int, *inputs: tuple[int, int, int, bool], snapshot_delay: float = INTERPOLATION_TIME_DELAY) -> bytes:
+    header = CONTROL_INPUTS_HEADER.pack(latest_tick, len(inputs), pack_snapshot_delay(snapshot_delay))
+    return header + b"".join(CONTROL_PLAYER_SCHEMA.pack(*i) for i in inputs)
+
+@test("Redundant inputs should only be queued once")
+def _():
+    inputs = ClientInputs()
+
+    # Every packet carries the latest inputs, so the same ticks keep arriving
+    pushed = [inputs.push(CLIENT, make_command(tick)) for tick in (1, 2, 1, 2, 3, 2, 3)]
+
+    assert pushed == [True, True, False, False, True, False, False]
+
+    ticks = []
+    while (command := inputs.pop(CLIENT)) is not None:
+        ticks.append(command.tick)
+
+    assert ticks == [1, 2, 3]
+
+@test("Stale inputs should be skipped, even across the tick wraparound")
+def _():
+    inputs = ClientInputs()
+
+    assert inputs.push(CLIENT, make_command(WRAP_INPUT_TICKS - 2))
+    assert inputs.push(CLIENT, make_command(WRAP_INPUT_TICKS - 1))
+
+    # Ticks that wrapped around are newer
+    assert inputs.push(CLIENT, make_command(0))
+    assert inputs.push(CLIENT, make_command(1))
+
+    # And the ones from before the wraparound are older now
+    assert not inputs.push(CLIENT, make_command(WRAP_INPUT_TICKS - 1))
+    assert not inputs.push(CLIENT, make_command(1))
+
+    # Other clients have their own ticks
+    assert inputs.push(CLIENT + 1, make_command(1))
+
+@test("Inputs that pile up past the queue limit should drop the oldest ones")
+def _():
+    inputs = ClientInputs()
+
+    for tick in range(1, MAX_QUEUED_INPUTS + 3):
+        assert inputs.push(CLIENT, make_command(tick))
+        assert inputs.is_behind(CLIENT) == (tick > TARGET_QUEUED_INPUTS)
+
+    ticks = []
+    while (command := inputs.pop(CLIENT)) is not None:
+        ticks.append(command.tick)
+
+    assert ticks == list(range(3, MAX_QUEUED_INPUTS + 3))
+
+    # The last popped input is the one applied during this tick
+    assert inputs.take_applied() == {CLIENT: MAX_QUEUED_INPUTS + 2}
+    assert inputs.take_applied() == {}
+
+    # Dropped inputs are still considered received
+    assert not inputs.push(CLIENT, make_command(1))
+
+@test("Inputs that arrive in a burst after lost packets should all be applied, catching up with 2 inputs per tick")
+def _():
+    world = WorldECS(EventWriter())
+    inputs = ClientInputs()
+    resources = Resources(world, inputs, Clock(FPS, FPS))
+
+    player = (Position(0, 0), Velocity(0, 0, 100), Angle(0), AngleVelocity(0, 3), PlayerController())
+    player_ent = world.create_entity(*player)
+    client_ent = world.create_entity(OwnsEntity(player_ent))
+
+    def run_tick() -> tuple[int, int]:
+        "Apply the inputs and move the player, like the fixed tick would. Returns the last applied tick and what's left"
+
+        apply_client_inputs_system(resources)
+
+        pos, vel, angle, angle_vel, controller = player
+        orient_player(controller, vel, angle)
+        move_entity(pos, vel, 1/FPS)
+        rotate_entity(angle, angle_vel, 1/FPS)
+
+        return inputs.take_applied()[client_ent], len(inputs.queues[client_ent])
+
+    # A few packets were lost, so the next one brings all of the ticks they were carrying at once
+    burst = [make_command(tick, turn_dir=(-1, 0, 1)[tick % 3]) for tick in range(1, 8)]
+    for command in burst:
+        inputs.push(client_ent, command)
+
+    # Nothing is dropped: the client catches up until it's back to the target, and then gets one input per tick
+    assert [run_tick() for _ in range(5)] == [(2, 5), (4, 3), (5, 2), (6, 1), (7, 0)]
+
+    # And the player ends up exactly where the client has predicted it
+    expected = (Position(0, 0), Velocity(0, 0, 100), Angle(0), AngleVelocity(0, 3), PlayerController())
+    pos, vel, angle, angle_vel, controller = expected
+
+    for command in burst:
+        controller.forward_dir = command.forward_dir
+        controller.horizontal_dir = command.horizontal_dir
+        angle_vel.set_velocity(command.turn_dir)
+
+        orient_player(controller, vel, angle)
+        move_entity(pos, vel, 1/FPS)
+        rotate_entity(angle, angle_vel, 1/FPS)
+
+    assert player[0].get_position().distance_to(pos.get_position()) < 1e-9
+    assert abs(player[2].get_angle() - angle.get_angle()) < 1e-9
+
+@test("Only new inputs should update the client's interpolation delay")
+def _():
+    inputs = ClientInputs()
+
+    assert inputs.get_snapshot_delay(CLIENT) == INTERPOLATION_TIME_DELAY
+
+    inputs.push(CLIENT, make_command(2, 0.1))
+    assert inputs.get_snapshot_delay(CLIENT) == 0.1
+
+    # A late packet carries the delay the client had back then
+    inputs.push(CLIENT, make_command(1, 0.2))
+    assert inputs.get_snapshot_delay(CLIENT) == 0.1
+
+    inputs.push(CLIENT, make_command(3, 0.08))
+    assert inputs.get_snapshot_delay(CLIENT) == 0.08
+
+    inputs._remove_client(CLIENT)
+    assert inputs.get_snapshot_delay(CLIENT) == INTERPOLATION_TIME_DELAY
+
+@test("Control packets should push an input command for every tick they carry")
+def _():
+    resources = make_resources()
+
+    control_player_rpc(resources, pack_inputs(1, (1, 0, 0, False), (0, -1, 1, True), snapshot_delay=0.123))
+
+    commands = resources[EventWriter].read_events()
+    assert [(c.addr, c.tick, c.forward_dir, c.horizontal_dir, c.turn_dir, c.is_shooting) for c in commands] == [
+        (ADDR, 0, 1, 0, 0, False),
+        (ADDR, 1, 0, -1, 1, True)
+    ]
+    assert all(abs(c.snapshot_delay - 0.123) < 1e-9 for c in commands)
+
+    resources[EventWriter].clear_events()
+
+    # The ticks of older inputs wrap around as well
+    control_player_rpc(resources, pack_inputs(0, (0, 0, 0, False), (0, 0, 0, False)))
+    assert [c.tick for c in resources[EventWriter].read_events()] == [WRAP_INPUT_TICKS - 1, 0]
+
+@test("Control packets with a bad input count or length should be rejected")
+def _():
+    resources = make_resources()
+    no_input = (0, 0, 0, False)
+
+    malformed = (
+        b"",
+        CONTROL_INPUTS_HEADER.pack(1, 0, 0),
+        pack_inputs(1, *(no_input, ) * (INPUT_REDUNDANCY + 1)),
+        pack_inputs(1, no_input, no_input)[:-1],
+        pack_inputs(1, no_input) + b"\0",
+        CONTROL_INPUTS_HEADER.pack(1, 2, 0) + CONTROL_PLAYER_SCHEMA.pack(*no_input)
+    )
+
+    for data in malformed:
+        with raises(RPCFormatError):
+            control_player_rpc(resources, data)
+
+    assert not resources[EventWriter].read_events()
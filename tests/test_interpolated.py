@@ -1,5 +1,5 @@
 from ward import test
-from modules.inteprolation import Interpolated, InterpolatedDegrees
+from modules.inteprolation import Interpolated, InterpolatedDegrees, SnapshotBuffer, SnapshotBufferDegrees, InterpolationDelay
 
 import numpy as np
 
@@ -42,4 +42,79 @@ def _():
     assert i.get_interpolated(0.25) == rad(5)
     assert i.get_interpolated(0.5) == rad(0)
     assert i.get_interpolated(0.75) == rad(355)
-    assert i.get_interpolated(1) == rad(350)
\ No newline at end of file
+    assert i.get_interpolated(1) == rad(350)
+
+@test("Snapshot buffers should interpolate between the samples around the requested time")
+def _():
+    buffer = SnapshotBuffer(0.0, size=4)
+
+    # Without samples - the initial value is used, and a single sample can't be interpolated
+    assert buffer.get_interpolated(1) == 0
+    buffer.push_sample(1, 10.0)
+    assert buffer.get_interpolated(0.5) == 10
+    assert buffer.get_interpolated(2) == 10
+
+    buffer.push_sample(2, 20.0)
+    buffer.push_sample(4, 60.0) # The sample of time 3 was lost
+
+    assert buffer.get_interpolated(1.5) == 15
+    assert buffer.get_interpolated(3) == 40
+    assert buffer.get_value() == 60
+
+    # Old samples are ignored
+    assert not buffer.push_sample(3, 0.0)
+    assert buffer.get_interpolated(3) == 40
+
+    # The oldest samples get forgotten
+    buffer.push_sample(5, 80.0)
+    buffer.push_sample(6, 100.0)
+    assert buffer.get_interpolated(0) == 20
+
+@test("Snapshot buffers should extrapolate only for a limited time")
+def _():
+    buffer = SnapshotBuffer(0.0, max_extrapolation=0.5)
+    buffer.push_sample(1, 10.0)
+    buffer.push_sample(2, 20.0)
+
+    assert buffer.get_interpolated(2.25) == 22.5
+    assert buffer.get_interpolated(2.5) == 25
+    assert buffer.get_interpolated(10) == 25
+
+@test("Angle snapshot buffers should interpolate along the shortest path")
+def _():
+    rad = lambda degrees: np.radians(degrees)-np.pi
+
+    buffer = SnapshotBufferDegrees(0)
+    buffer.push_sample(0, rad(350))
+    buffer.push_sample(1, rad(10))
+
+    assert np.isclose(buffer.get_interpolated(0.25), rad(355))
+    assert np.isclose(buffer.get_interpolated(0.75), rad(5))
+
+@test("Interpolation delays should adapt to the jitter of arrivals")
+def _():
+    steady = InterpolationDelay(0.05, 0.5)
+    unstable = InterpolationDelay(0.05, 0.5)
+
+    time = 0
+    for i in range(100):
+        steady.push_arrival(i * 0.1)
+
+        time += 0.05 if i % 2 else 0.15
+        unstable.push_arrival(time)
+
+    # Both receive samples every 0.1 seconds on average, but one of them is much less regular
+    assert np.isclose(steady.get_target_delay(), 0.1)
+    assert unstable.get_target_delay() > 0.15
+    assert unstable.get_target_delay() <= 0.5
+
+    # The delay doesn't jump at once
+    assert steady.get_delay() == 0.05
+    steady.update(0.1)
+    assert np.isclose(steady.get_delay(), 0.06)
+    for _ in range(100):
+        steady.update(0.1)
+    assert np.isclose(steady.get_delay(), 0.1)
+
+    steady.reset()
+    assert steady.get_delay() == 0.05
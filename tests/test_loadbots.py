@@ -0,0 +1,63 @@
+from ward import test, raises
+
+from plugins.client.loadbots import ScriptedInputs, load_input_script
+
+from tempfile import TemporaryDirectory
+
+import os
+
+FORWARD = (1, 0, 0, False)
+SHOOT = (0, 0, 1, True)
+STEPS = [(0.5, FORWARD), (0.25, SHOOT)]
+
+def load_script(text: str) -> list:
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "script.txt")
+        with open(path, "w") as file:
+            file.write(text)
+
+        return load_input_script(path)
+
+@test("Scripted inputs should follow their steps in a loop")
+def _():
+    inputs = ScriptedInputs(STEPS)
+
+    played = [inputs.next_input(0.125) for _ in range(12)]
+
+    # The time advances before every input, so with ticks of 0.125 seconds the first loop moves forward only for 3 ticks
+    assert played == [FORWARD]*3 + [SHOOT]*2 + [FORWARD]*4 + [SHOOT]*2 + [FORWARD]
+
+@test("Scripted inputs with an offset should start from the middle of their script")
+def _():
+    assert ScriptedInputs(STEPS, 0.5).next_input(0) == SHOOT
+
+    # Offsets past the script's end wrap around
+    assert ScriptedInputs(STEPS, 0.75 + 0.25).next_input(0) == FORWARD
+    assert ScriptedInputs(STEPS, 3*0.75 + 0.625).next_input(0) == SHOOT
+
+    with raises(AssertionError):
+        ScriptedInputs([])
+    with raises(AssertionError):
+        ScriptedInputs([(0, FORWARD)])
+
+@test("Input scripts should be parsed line by line, skipping comments")
+def _():
+    steps = load_script("""
+    # duration forward horizontal turn shoot
+    1 1 0 1 0
+
+    0.5 -1 1 0 1
+    """)
+
+    assert steps == [(1.0, (1, 0, 1, False)), (0.5, (-1, 1, 0, True))]
+
+@test("Malformed input scripts should tell which line is wrong")
+def _():
+    for line in ("1 1 0 1", "1 1 0 1 0 1", "fast 1 0 1 0", "1 1 0 0.5 0"):
+        with raises(ValueError) as exception:
+            load_script(f"# A comment\n1 0 0 0 0\n{line}\n")
+
+        assert "Line 3" in str(exception.raised)
+
+    with raises(AssertionError):
+        load_script("1 2 0 0 0")
@@ -0,0 +1,151 @@
+from ward import test
+from modules.netsim import *
+from modules.network import HighUDPServer, HighUDPClient
+
+DT = 1/60
+IP = "127.0.0.1"
+
+ADDR_SERVER = (IP, 1600)
+ADDR_CLIENT = (IP, 1601)
+ADDR_RELAY = (IP, 1602)
+
+class ManualClock:
+    "Simulations only move forward when we say so"
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+def send_all(link: LinkSimulator, packets: int, interval: float = 0.01) -> list[tuple[float, bytes]]:
+    "Submit numbered packets, and return when each of them has arrived"
+
+    arrivals = []
+    time = 0
+    for i in range(packets):
+        link.submit(time, i.to_bytes(2, "little"))
+        arrivals.extend((time, packet) for packet in link.poll(time))
+        time += interval
+
+    while link.has_packets():
+        arrivals.extend((time, packet) for packet in link.poll(time))
+        time += interval
+
+    return arrivals
+
+@test("Simulated links should be deterministic under the same seed")
+def _():
+    conditions = NetworkConditions(latency=0.05, jitter=0.03, loss=0.1, reordering=0.1, dublicates=0.05)
+
+    first = send_all(LinkSimulator(conditions, seed=5), 200)
+    assert first == send_all(LinkSimulator(conditions, seed=5), 200)
+    assert first != send_all(LinkSimulator(conditions, seed=6), 200)
+
+@test("Simulated links should delay packets, and only reorder them when asked to")
+def _():
+    arrivals = send_all(LinkSimulator(NetworkConditions(latency=0.1, jitter=0.05)), 100)
+    assert len(arrivals) == 100
+
+    for time, packet in arrivals:
+        assert time >= int.from_bytes(packet, "little") * 0.01 + 0.1
+
+    # Jitter alone keeps the order
+    order = [int.from_bytes(packet, "little") for _, packet in arrivals]
+    assert order == sorted(order)
+
+    arrivals = send_all(LinkSimulator(NetworkConditions(latency=0.1, jitter=0.05, reordering=0.2)), 100)
+    order = [int.from_bytes(packet, "little") for _, packet in arrivals]
+    assert order != sorted(order) and sorted(order) == list(range(100))
+
+@test("Simulated links should cap the bandwidth and drop packets past their queue")
+def _():
+    link = LinkSimulator(NetworkConditions(bandwidth=1000, max_queue_delay=0.5))
+
+    # 10 packets of 100 bytes take a second, but only half of a second can wait
+    for _ in range(10):
+        link.submit(0, bytes(100))
+
+    assert link.dropped == 4
+    assert len(link.poll(0.55)) == 6
+
+@test("Simulated links should lose packets in bursts")
+def _():
+    link = LinkSimulator(NetworkConditions(burst_start=0.05, burst_end=0.2, burst_loss=1), seed=1)
+
+    lost = []
+    for i in range(1000):
+        dropped = link.dropped
+        link.submit(i, b"packet")
+        lost.append(link.dropped > dropped)
+
+    # Losses come in runs, not one by one
+    runs = sum(1 for i in range(1, len(lost)) if lost[i] and not lost[i-1])
+    assert 0 < runs < sum(lost)
+
+@test("Network actors should send their packets through simulated links")
+def _():
+    clock = ManualClock()
+    # Times that floats represent exactly, so packets arrive exactly on the ticks
+
+    server, client = HighUDPServer(ADDR_SERVER, 4), HighUDPClient(ADDR_CLIENT)
+    server.simulate_network(NetworkConditions(latency=0.125), clock=clock)
+    client.simulate_network(NetworkConditions(latency=0.125), clock=clock)
+
+    client.connect(server.get_addr(), 2, 1)
+
+    # The connection request is still on its way
+    client.tick(DT)
+    server.tick(DT)
+    assert not server.has_connection_addr(ADDR_CLIENT)
+
+    clock.time = 0.125
+    client.tick(DT)
+    server.tick(DT)
+    assert server.has_connection_addr(ADDR_CLIENT)
+
+    clock.time = 0.25
+    server.tick(DT)
+    client.tick(DT)
+    assert client.is_connected()
+
+    client.send(b"delayed", True)
+    client.tick(DT)
+    server.tick(DT)
+    assert not server.has_packets()
+
+    clock.time = 0.375
+    client.tick(DT)
+    server.tick(DT)
+    assert server.recv() == (b"delayed", ADDR_CLIENT)
+
+    server.close()
+    client.close()
+
+@test("The network relay should forward packets both ways")
+def _():
+    server, client = HighUDPServer(ADDR_SERVER, 4), HighUDPClient(ADDR_CLIENT)
+    relay = NetworkRelay(ADDR_RELAY, server.get_addr(), NetworkConditions(), NetworkConditions())
+
+    client.connect(relay.get_addr(), 2, 1)
+    for _ in range(3):
+        client.tick(DT)
+        relay.tick()
+        server.tick(DT)
+        relay.tick()
+
+    assert client.is_connected()
+
+    # The server only sees the relay
+    relay_addrs = server.get_connection_addresses()
+    assert len(relay_addrs) == 1 and relay_addrs[0] != ADDR_CLIENT
+
+    client.send(b"relayed", True)
+    client.tick(DT)
+    relay.tick()
+    server.tick(DT)
+    assert server.recv() == (b"relayed", relay_addrs[0])
+
+    server.close()
+    client.close()
+    relay.close()
@@ -1,4 +1,4 @@
-from ward import test
+from ward import test, skip
 from modules.network import *
 
 DT = 1/60
@@ -288,6 +288,45 @@ def _():
     reset_unreliability()
     close_actors(server, client)
 
+@test("Late acknowledgements of old packets should still stop their resends")
+def _():
+    sock = make_async_socket((IP, 0))
+    connection = HighUDPConnection(sock, ADDR_SERVER_DUMMY)
+
+    connection.queue_message(b"old", True)
+    old_id = connection.packet_queue[0][0]
+    connection.tick(DT)
+
+    # Acknowledgements of many newer packets arrive first, so the old packet falls far behind them
+    for ack_id in range(old_id+1, old_id+SEQUENCE_WINDOW_SIZE+2):
+        connection.process_packet(0, PacketType.Acknowledgment, ack_id.to_bytes(2, BYTE_ORDER))
+
+    connection.process_packet(0, PacketType.Acknowledgment, old_id.to_bytes(2, BYTE_ORDER))
+    connection.tick(DT)
+
+    assert all(seq_id != old_id for seq_id, *_ in connection.packet_queue)
+
+    sock.close()
+
+@test("Packets far behind the newest received ones should still be delivered")
+def _():
+    connection = HighUDPConnection(None, ADDR_CLIENT)
+
+    # The first packet keeps getting lost, while way more than a window of newer packets gets through
+    for seq_id in range(2, SEQUENCE_WINDOW_SIZE+76):
+        assert connection.process_packet(seq_id, PacketType.Message, b"newer") == [b"newer"]
+
+    connection.packet_queue.clear()
+
+    # It should be delivered and acknowledged just like any other packet
+    assert connection.process_packet(1, PacketType.Message, b"important") == [b"important"]
+    assert connection.has_packet_been_received(1)
+    assert [packet for _, packet, _ in connection.packet_queue] == [make_acknowledgement_packet(1)]
+
+    # And only once
+    assert connection.process_packet(1, PacketType.Message, b"important") == []
+    assert connection.stats.dublicates == 1
+
 @test("Test unreliable packets")
 def _():
     server, client = make_test_pair()
@@ -584,4 +623,608 @@ def _():
     assert server_connections
     assert not client_connections
 
-    close_actors(server, client)
\ No newline at end of file
+    close_actors(server, client)
+
+@test("Test fragmentation of large reliable messages")
+def _():
+    server, client = make_test_pair()
+    connect_actors(server, client)
+
+    # This message is way over the single packet limit, so it will get split into fragments
+    large_message = bytes(i % 251 for i in range(BYTES_PER_MESSAGE*10 + 17))
+
+    client.send(large_message, True)
+    server.send_to(ADDR_CLIENT, large_message, True)
+
+    # A connection can only send a few packets per tick, so we need a bit more ticks here
+    tick_actors(DT, client, server, times=16)
+
+    # The message should arrive assembled, in its entirety and only once
+    assert server.recv() == (large_message, ADDR_CLIENT)
+    assert client.recv() == large_message
+
+    assert not server.has_packets()
+    assert not client.has_packets()
+
+    # And no partial messages should be left hanging
+    assert not server.connections[ADDR_CLIENT].fragment_buffers
+    assert not client.connection.fragment_buffers
+
+    close_actors(server, client)
+
+@test("Test fragmentation in unreliable environment")
+def _():
+    server, client = make_test_pair()
+
+    server.set_testing_mode(True)
+    client.set_testing_mode(True)
+
+    connect_actors(server, client)
+
+    set_loss_rate(0.05)
+    set_dublicates_rate(0.1)
+
+    large_message = b"fragment"*1000
+    client.send(large_message, True)
+
+    tick_actors(DT, client, server, times=32)
+
+    assert server.recv() == (large_message, ADDR_CLIENT)
+    assert not server.has_packets()
+
+    reset_unreliability()
+    close_actors(server, client)
+
+@test("Partially received messages should be bounded")
+def _():
+    connection = HighUDPConnection(None, ADDR_CLIENT)
+
+    # We're going to feed the connection with first fragments of many different messages
+    for group_id in range(1, MAX_FRAGMENT_GROUPS+2):
+        fragment = next(make_fragments(group_id, bytes(FRAGMENT_CHUNK_SIZE*2)))
+        connection.process_packet(group_id, PacketType.Fragment, fragment)
+
+    # Fragments that didn't fit shouldn't be acknowledged (so they can be resent later)
+    assert len(connection.fragment_buffers) == MAX_FRAGMENT_GROUPS
+    assert not connection.has_packet_been_received(MAX_FRAGMENT_GROUPS+1)
+
+    # Received fragments are acknowledged, so they won't be sent again. Partial messages are kept while they're alive
+    message = bytes(FRAGMENT_CHUNK_SIZE*2 - CHANNEL_TRAILER.size) + CHANNEL_TRAILER.pack(DEFAULT_CHANNEL, 0)
+    _, last_fragment = make_fragments(1, message)
+
+    assert connection.process_packet(MAX_FRAGMENT_GROUPS+2, PacketType.Fragment, last_fragment) == [message[:-CHANNEL_TRAILER.size]]
+    assert len(connection.fragment_buffers) == MAX_FRAGMENT_GROUPS-1
+
+@test("Partially received messages that can't complete should make space for new ones")
+def _():
+    sock = make_async_socket((IP, 0))
+    connection = HighUDPConnection(sock, ADDR_SERVER_DUMMY)
+
+    def make_message(text: bytes) -> bytes:
+        return text * (FRAGMENT_CHUNK_SIZE*3 - CHANNEL_TRAILER.size) + CHANNEL_TRAILER.pack(DEFAULT_CHANNEL, 0)
+
+    messages = [make_message(bytes((group_id, ))) for group_id in range(MAX_FRAGMENT_GROUPS+1)]
+    fragments = [list(make_fragments(group_id, message)) for group_id, message in enumerate(messages)]
+
+    # Every slot gets taken by a message whose sender went silent after its first fragment
+    for group_id in range(1, MAX_FRAGMENT_GROUPS+1):
+        connection.process_packet(group_id, PacketType.Fragment, fragments[group_id][0])
+
+    assert connection.process_packet(MAX_FRAGMENT_GROUPS+1, PacketType.Fragment, fragments[0][0]) == []
+    assert not connection.has_packet_been_received(MAX_FRAGMENT_GROUPS+1)
+
+    # Only the first message keeps getting its fragments
+    connection.tick(FRAGMENT_GROUP_TIMEOUT/2)
+    connection.process_packet(MAX_FRAGMENT_GROUPS+2, PacketType.Fragment, fragments[1][1])
+    connection.tick(FRAGMENT_GROUP_TIMEOUT/2)
+
+    # So the silent ones give their place to the new message once it's resent
+    assert connection.process_packet(MAX_FRAGMENT_GROUPS+1, PacketType.Fragment, fragments[0][0]) == []
+    assert connection.has_packet_been_received(MAX_FRAGMENT_GROUPS+1)
+    assert set(connection.fragment_buffers) == {0, 1}
+
+    seq_id = MAX_FRAGMENT_GROUPS+3
+    for fragment in fragments[0][1:-1]:
+        assert connection.process_packet(seq_id, PacketType.Fragment, fragment) == []
+        seq_id += 1
+
+    assert connection.process_packet(seq_id, PacketType.Fragment, fragments[0][-1]) == [messages[0][:-CHANNEL_TRAILER.size]]
+    assert connection.process_packet(seq_id+1, PacketType.Fragment, fragments[1][2]) == [messages[1][:-CHANNEL_TRAILER.size]]
+    assert not connection.fragment_buffers
+
+    # A group ID reused by a message of another size replaces whatever was left under it
+    connection.process_packet(seq_id+2, PacketType.Fragment, fragments[2][0])
+    reused = list(make_fragments(2, b"reused" * FRAGMENT_CHUNK_SIZE + CHANNEL_TRAILER.pack(DEFAULT_CHANNEL, 0)))
+
+    assert connection.process_packet(seq_id+3, PacketType.Fragment, reused[0]) == []
+    assert connection.has_packet_been_received(seq_id+3)
+    assert not connection.fragment_buffers[2].fits(3)
+
+    sock.close()
+
+@test("Test batched packet receiving")
+def _():
+    receiving = make_async_socket((IP, 0))
+    sending = make_async_socket((IP, 0))
+
+    receiver = DatagramReceiver(RECV_BYTES, batch_size=8)
+
+    # We're going to send way more packets than a single batch can hold, and a few pieces of garbage in between
+    messages = [i.to_bytes(2, "big") for i in range(100)]
+    for i, message in enumerate(messages):
+        sending.sendto(make_unreliable_packet(PacketType.Message, message), receiving.getsockname())
+        if i % 10 == 0:
+            sending.sendto(b"ab", receiving.getsockname())
+
+    received = [data for (_, _, data), _ in receiver.receive_packets(receiving)]
+
+    # All messages should arrive intact even though their buffers were reused, and garbage should be ignored
+    assert received == messages
+
+    close_actors(receiving, sending)
+
+@test("Test the server's receiver thread")
+def _():
+    server, client = make_test_pair()
+    server.start_receiver_thread()
+
+    def wait_for_thread():
+        "The thread receives packets on its own, so we only need to give it a bit of time"
+        started = perf_counter()
+        while not server.receiver_thread.packets and perf_counter()-started < 1:
+            pass
+
+    client.connect(server.addr, 2, DT)
+    client.tick(0)
+    wait_for_thread()
+    server.tick(0)
+    client.tick(0)
+
+    assert client.is_connected()
+
+    sent_at = perf_counter()
+    client.send(b"hello", True)
+    client.tick(DT)
+    wait_for_thread()
+
+    server.tick(DT)
+
+    assert server.recv() == (b"hello", ADDR_CLIENT)
+
+    # The arrival time is the moment the thread got the packet, not when the server got to process it
+    assert sent_at <= server.get_last_arrival_time() <= perf_counter()
+
+    close_actors(server, client)
+    assert not server.receiver_thread
+
+@test("Test the server's asyncio datagram endpoint")
+def _():
+    server, client = make_test_pair()
+
+    async def run():
+        await server.open_datagram_endpoint(asyncio.get_running_loop())
+
+        async def tick_loop(*actors, times: int = 1):
+            "Unlike `tick_actors` we also need to let the event loop receive the packets"
+            for _ in range(times):
+                for actor in actors:
+                    actor.tick(DT)
+                    await asyncio.sleep(0.01)
+
+        client.connect(server.addr, 2, DT)
+        await tick_loop(client, server, client)
+
+        assert client.is_connected()
+        assert server.has_connection_addr(ADDR_CLIENT)
+
+        client.send(b"hello", True)
+        await tick_loop(client, server)
+
+        assert server.recv() == (b"hello", ADDR_CLIENT)
+        assert not server.has_packets()
+
+        server.send_to(ADDR_CLIENT, b"hi", True)
+        await tick_loop(server, client)
+
+        assert client.recv() == b"hi"
+
+        close_actors(server, client)
+
+    asyncio.run(run())
+
+@test("Test server rooms")
+def _():
+    server, client = make_test_pair()
+    client2 = HighUDPClient(ADDR_CLIENT2)
+    client3 = HighUDPClient(ADDR_CLIENT3)
+
+    room1 = server.open_room(1)
+    room2 = server.open_room(2)
+
+    # The first client gets placed into the first room that has space, while the other 2 ask
+    # for specific rooms
+    client.connect(server.addr, 2, DT)
+    tick_actors(0, client, room1, client)
+
+    client2.connect(server.addr, 2, DT, room1.get_id())
+    client3.connect(server.addr, 2, DT, room2.get_id())
+    tick_actors(0, client2, client3, room1, client2, client3)
+
+    assert client.is_connected() and client3.is_connected()
+
+    # The first room is full, so the second client should get rejected
+    assert not client2.is_connected()
+
+    assert room1.get_connection_addresses() == (ADDR_CLIENT,)
+    assert room2.get_connection_addresses() == (ADDR_CLIENT3,)
+
+    # Messages should only reach the room of their connection
+    client.send(b"room 1", True)
+    client3.send(b"room 2", True)
+    tick_actors(DT, client, client3, room1, room2)
+
+    assert room1.recv() == (b"room 1", ADDR_CLIENT)
+    assert room2.recv() == (b"room 2", ADDR_CLIENT3)
+    assert not room1.has_packets() and not room2.has_packets()
+    assert not server.has_packets()
+
+    # A room can't send to connections that aren't its own
+    room1.send_to(ADDR_CLIENT3, b"not yours", True)
+    room2.send_to(ADDR_CLIENT3, b"hi", True)
+    tick_actors(DT, room1, room2, client3)
+
+    assert client3.recv() == b"hi"
+    assert not client3.has_packets()
+
+    # Closing a room only disconnects its own connections
+    room1.close()
+    assert not server.has_connection_addr(ADDR_CLIENT)
+    assert room2.has_connection_addr(ADDR_CLIENT3)
+
+    close_actors(server, client, client2, client3)
+
+@skip("SO_REUSEPORT isn't supported on this platform", when=not supports_sharding())
+@test("Test sharded servers sharing the same address")
+def _():
+    server1 = HighUDPServer(ADDR_SERVER, 4, sharded=True)
+    server2 = HighUDPServer(ADDR_SERVER, 4, sharded=True)
+    clients = [HighUDPClient(addr) for addr in (ADDR_CLIENT, ADDR_CLIENT2, ADDR_CLIENT3)]
+
+    for client in clients:
+        client.connect(ADDR_SERVER, 2, DT)
+    tick_actors(0, *clients, server1, server2, *clients)
+
+    assert all(client.is_connected() for client in clients)
+
+    # Every client gets accepted by exactly one of the servers
+    owners = {}
+    for client in clients:
+        addr = client.sock.getsockname()
+        owning = [server for server in (server1, server2) if server.has_connection_addr(addr)]
+        assert len(owning) == 1
+        owners[addr] = owning[0]
+
+    # And all of its later packets should keep arriving to that same server
+    for _ in range(3):
+        for client in clients:
+            client.send(b"hi", True)
+        tick_actors(DT, *clients, server1, server2)
+
+    for server in (server1, server2):
+        while server.has_packets():
+            _, addr = server.recv()
+            assert owners[addr] is server
+
+    close_actors(server1, server2, *clients)
+
+@skip("SO_REUSEPORT isn't supported on this platform", when=not supports_sharding())
+@test("Connection requests for rooms of other sharded servers should get redirected to their owners")
+def _():
+    ports = (1510, 1511)
+    servers = [HighUDPServer((IP, port), 0, shard=shard) for shard, port in enumerate(ports)]
+    entrances = [ShardEntrance(ADDR_SERVER, shard, ports) for shard in range(len(ports))]
+
+    rooms = [server.open_room(4) for server in servers]
+
+    # Room IDs of different servers never collide, and they tell which server owns them
+    assert rooms[0].get_id() != rooms[1].get_id()
+    assert [get_room_shard(room.get_id()) for room in rooms] == [0, 1]
+
+    clients = [HighUDPClient(addr) for addr in (ADDR_CLIENT, ADDR_CLIENT2, ADDR_CLIENT3)]
+
+    # Whichever entrance the kernel picks for a client, it should end up in the room it has asked for
+    for client, room in zip(clients, (rooms[1], rooms[0], rooms[1])):
+        client.connect(ADDR_SERVER, 2, DT, room.get_id())
+
+    tick_actors(0, *clients, *entrances, *clients, *servers, *clients)
+
+    for client, room in zip(clients, (rooms[1], rooms[0], rooms[1])):
+        assert client.is_connected()
+        assert room.has_connection_addr(client.sock.getsockname())
+
+    # Rooms of servers that aren't in the group can't be joined
+    client = HighUDPClient(("127.0.0.1", 1504))
+    client.connect(ADDR_SERVER, 2, DT, (2 << (16 - ROOM_SHARD_BITS)) | 1)
+    tick_actors(0, client, *entrances, client)
+
+    assert not client.is_connected() and not client.is_trying_to_connect()
+
+    close_actors(*entrances, *servers, *clients, client)
+
+@test("Test multicasting a message to multiple connections")
+def _():
+    server, client = make_test_pair()
+    client2 = HighUDPClient(ADDR_CLIENT2)
+
+    connect_actors(server, client, client2)
+
+    # Make the clients' reliable sequences differ
+    server.send_to(ADDR_CLIENT, b"first", True)
+    tick_actors(DT, server, client, client2)
+    assert client.recv() == b"first"
+
+    writer = PacketWriter()
+    addrs = server.get_connection_addresses()
+
+    for reliable in (False, True):
+        writer.reset()
+        writer.write(b"everyone")
+        server.multicast(addrs, writer, reliable)
+        tick_actors(DT, server, client, client2)
+
+        for receiver in (client, client2):
+            assert receiver.recv() == b"everyone"
+            assert not receiver.has_packets()
+
+    # Unreliable messages are framed once, so both connections should get the exact same packet
+    packet = writer.finish(0, PacketType.Message)
+    assert open_packet(packet) == (0, PacketType.Message, b"everyone")
+
+    close_actors(server, client, client2)
+
+@test("Unsent unreliable messages should be superseded by newer ones under the same key")
+def _():
+    server, client = make_test_pair()
+    connect_actors(server, client)
+
+    for i in range(5):
+        server.send_to(ADDR_CLIENT, f"state {i}".encode(), False, key=1)
+    server.send_to(ADDR_CLIENT, b"other", False, key=2)
+    server.send_to(ADDR_CLIENT, b"state 5", False, key=1)
+
+    # Only the latest message of every key should be waiting, in the place of the first one
+    assert len(server.connections[ADDR_CLIENT].packet_queue) == 2
+
+    tick_actors(DT, server, client)
+
+    assert client.recv() == b"state 5"
+    assert client.recv() == b"other"
+    assert not client.has_packets()
+
+    # Once sent, the key can be used again
+    server.send_to(ADDR_CLIENT, b"state 6", False, key=1)
+    tick_actors(DT, server, client)
+    assert client.recv() == b"state 6"
+
+    close_actors(server, client)
+
+@test("Ordered channels should deliver messages in order, and sequenced ones should drop late messages")
+def _():
+    ordered = ChannelReceiver(ChannelMode.ReliableOrdered)
+
+    assert ordered.receive(1, b"b") == (True, [])
+    assert ordered.receive(2, b"c") == (True, [])
+    assert ordered.receive(0, b"a") == (True, [b"a", b"b", b"c"])
+    assert ordered.receive(1, b"b") == (True, [])
+
+    # Early messages are bounded, and the ones that don't fit aren't accepted
+    for i in range(MAX_ORDERED_BUFFER):
+        assert ordered.receive(4+i, b"early") == (True, [])
+    assert ordered.receive(4+MAX_ORDERED_BUFFER, b"early")[0] == False
+
+    sequenced = ChannelReceiver(ChannelMode.UnreliableSequenced)
+
+    assert sequenced.receive(0, b"a") == (True, [b"a"])
+    assert sequenced.receive(5, b"f") == (True, [b"f"])
+    assert sequenced.receive(3, b"d") == (True, [])
+    assert sequenced.receive(WRAP_IDS-1, b"old") == (True, [])
+
+@test("An ordered channel should wait for its lost message, no matter how many packets arrive after it")
+def _():
+    connection = HighUDPConnection(None, ADDR_CLIENT, channels=(ChannelMode.ReliableOrdered, ))
+
+    def channel_message(channel_seq: int, message: bytes) -> bytes:
+        return message + CHANNEL_TRAILER.pack(1, channel_seq)
+
+    # Packet 1 with the channel's first message is lost, so the ones after it wait in the buffer
+    for channel_seq in range(1, MAX_ORDERED_BUFFER+2):
+        assert connection.process_packet(channel_seq+1, PacketType.ChannelMessage, channel_message(channel_seq, b"after")) == []
+
+    # The buffer is full, so the last one wasn't acknowledged (it will be resent)
+    assert not connection.has_packet_been_received(MAX_ORDERED_BUFFER+2)
+
+    # Meanwhile, way more than a window of packets goes through the default channel
+    for seq_id in range(MAX_ORDERED_BUFFER+3, MAX_ORDERED_BUFFER+SEQUENCE_WINDOW_SIZE+100):
+        connection.process_packet(seq_id, PacketType.Message, b"other")
+
+    # The lost message finally arrives, and releases everything that waited for it
+    assert connection.process_packet(1, PacketType.ChannelMessage, channel_message(0, b"spawn")) == [b"spawn"] + [b"after"]*MAX_ORDERED_BUFFER
+    assert connection.has_packet_been_received(1)
+
+    # The channel keeps going from there
+    assert connection.process_packet(MAX_ORDERED_BUFFER+2, PacketType.ChannelMessage, channel_message(MAX_ORDERED_BUFFER+1, b"after")) == [b"after"]
+    assert connection.process_packet(
+        MAX_ORDERED_BUFFER+SEQUENCE_WINDOW_SIZE+100, 
+        PacketType.ChannelMessage, 
+        channel_message(MAX_ORDERED_BUFFER+2, b"next")
+    ) == [b"next"]
+    assert not connection.channel_receivers[0].buffer
+
+@test("Test channels in unreliable environment")
+def _():
+    channels = (ChannelMode.ReliableOrdered, ChannelMode.UnreliableSequenced)
+    server, client = HighUDPServer(ADDR_SERVER, 4, channels=channels), HighUDPClient(ADDR_CLIENT, channels)
+
+    server.set_testing_mode(True)
+    client.set_testing_mode(True)
+
+    connect_actors(server, client)
+
+    set_loss_rate(0.2)
+    set_dublicates_rate(0.2)
+
+    messages = [f"message {i}".encode() for i in range(32)]
+    for message in messages:
+        client.send(message, True, channel=1)
+    
+    # Large messages should keep their place in the order as well
+    large_message = b"fragment"*500
+    client.send(large_message, True, channel=1)
+
+    tick_actors(DT, client, server, times=64)
+
+    received = []
+    while server.has_packets():
+        received.append(server.recv()[0])
+
+    assert received == messages + [large_message]
+
+    reset_unreliability()
+
+    # Sequenced messages should never go back in time
+    for i in range(16):
+        server.send_to(ADDR_CLIENT, bytes([i]), False, channel=2)
+        tick_actors(DT, server, client)
+
+    received = []
+    while client.has_packets():
+        received.append(client.recv()[0])
+
+    assert received == sorted(received) and len(received) > 0
+
+    close_actors(server, client)
+
+@test("Messages should be compressed only when it saves bytes")
+def _():
+    compressor = MessageCompressor(b"repeated payload " * 8)
+
+    message = b"repeated payload " * 200
+    compressed = compressor.compress(message)
+
+    assert compressed is not None and len(compressed) < len(message)
+    assert compressor.decompress(compressed) == message
+
+    # Small and incompressible messages are left alone
+    assert compressor.compress(b"tiny") is None
+    assert compressor.compress(bytes(range(256))) is None
+
+    assert compressor.decompress(b"garbage") is None
+
+    # A different dictionary can't decompress it
+    assert MessageCompressor(b"other dictionary").decompress(compressed) != message
+
+@test("Test compressed messages")
+def _():
+    compressor = MessageCompressor(b"repeated payload " * 8)
+    server = HighUDPServer(ADDR_SERVER, 4, channels=(ChannelMode.ReliableOrdered, ), compressor=compressor)
+    client = HighUDPClient(ADDR_CLIENT, (ChannelMode.ReliableOrdered, ), compressor)
+
+    connect_actors(server, client)
+
+    # Without compression it would take multiple fragments
+    large_message = b"repeated payload " * 500
+    client.send(large_message, True, compress=True)
+
+    connection = client.connection
+    assert len(connection.packet_queue) == 1
+
+    client.send(large_message, True, channel=1, compress=True)
+    client.send(b"small", False, compress=True)
+
+    tick_actors(DT, client, server)
+
+    assert server.recv() == (large_message, ADDR_CLIENT)
+    assert server.recv() == (large_message, ADDR_CLIENT)
+    assert server.recv() == (b"small", ADDR_CLIENT)
+
+    writer = PacketWriter()
+    writer.write(large_message[:1000])
+    server.multicast(server.get_connection_addresses(), writer, False, compress=True)
+
+    tick_actors(DT, server, client)
+    assert client.recv() == large_message[:1000]
+
+    close_actors(server, client)
+
+@test("Connections should measure their round trip time with pings")
+def _():
+    server, client = make_test_pair()
+    connect_actors(server, client)
+
+    assert client.get_rtt() is None
+    assert server.get_rtt(ADDR_CLIENT) is None
+    assert server.get_rtt(ADDR_SERVER_DUMMY) is None
+
+    # The first pings are sent right away, and get echoed back on the next tick
+    tick_actors(DT, client, server, client, server)
+
+    client_rtt, server_rtt = client.get_rtt(), server.get_rtt(ADDR_CLIENT)
+    assert client_rtt is not None and client_rtt >= 0
+    assert server_rtt is not None and server_rtt >= 0
+
+    # Pings aren't delivered as messages
+    assert not client.has_packets()
+    assert not server.has_packets()
+
+    # Until the next ping, the measurement doesn't change
+    tick_actors(DT, client, server, times=4)
+    assert client.get_rtt() == client_rtt
+
+    close_actors(server, client)
+
+@test("Connections should count their traffic")
+def _():
+    server, client = make_test_pair()
+    connect_actors(server, client)
+
+    # The server doesn't tick in between, so the message gets sent again
+    client.send(b"reliable", True)
+    tick_actors(DT, client, times=2)
+    assert client.get_stats().resent == 1
+
+    tick_actors(DT, server)
+    assert server.recv() == (b"reliable", ADDR_CLIENT)
+    assert not server.has_packets()
+
+    client_stats, server_stats = client.get_stats(), server.get_stats(ADDR_CLIENT)
+    assert client_stats.packets_sent > 0 and client_stats.bytes_sent > 0
+    assert server_stats.packets_received == client_stats.packets_sent
+    assert server_stats.bytes_received == client_stats.bytes_sent
+    assert server_stats.dublicates == 1
+
+    # Garbage can't be attributed to any connection
+    client.sock.sendto(b"definitely not a packet", server.get_addr())
+    tick_actors(DT, server)
+    assert server.get_total_stats().corrupted == 1
+    assert server.get_stats(ADDR_CLIENT).corrupted == 0
+
+    # Counters of removed connections still count in totals
+    sent = server.get_total_stats().bytes_sent
+    client.disconnect()
+    tick_actors(DT, server)
+    assert not server.has_connection_addr(ADDR_CLIENT)
+    assert server.get_total_stats().bytes_sent == sent
+    assert server.get_stats(ADDR_CLIENT) is None
+
+    close_actors(server, client)
+
+@test("Unanswered pings should count as lost")
+def _():
+    server, client = make_test_pair()
+    connect_actors(server, client)
+
+    # The server never ticks, so nothing gets echoed back
+    tick_actors(HighUDPConnection.PING_RATE, client, times=3)
+    assert client.get_stats().loss > 0
+
+    close_actors(server, client)
@@ -0,0 +1,134 @@
+from ward import test
+
+from plugin import Resources, EventWriter
+
+from core.ecs import WorldECS
+from core.time import Clock
+
+from plugins.client.components import Position, Velocity, Angle, AngleVelocity, PlayerController, MainPlayer
+from plugins.client.commands import SyncPlayerStateCommand
+from plugins.client.services.session import InputHistory
+from plugins.client.handlers.session import on_sync_player_state_command
+from plugins.shared.systems.base import move_entity, rotate_entity
+from plugins.shared.systems.player import orient_player
+from plugins.rpcs.server import WRAP_INPUT_TICKS
+
+import pygame as pg
+
+FPS = 60
+
+INPUTS = ((1, 0, 0, False), (1, 1, 0, False), (0, 1, 1, True), (-1, 0, 1, False), (0, 0, -1, False))
+
+def make_history(start_tick: int, count: int) -> InputHistory:
+    history = InputHistory()
+    history.tick = start_tick
+
+    for _ in range(count):
+        history.push(0, 0, 0, False)
+
+    return history
+
+def simulate(pos: Position, vel: Velocity, angle: Angle, angle_vel: AngleVelocity, controller: PlayerController, inputs):
+    "Run the player's inputs the same way the client does every fixed tick, and return the states after each of them"
+
+    states = []
+    for forward_dir, horizontal_dir, turn_dir, _ in inputs:
+        controller.forward_dir = forward_dir
+        controller.horizontal_dir = horizontal_dir
+        angle_vel.set_velocity(turn_dir)
+
+        orient_player(controller, vel, angle)
+        move_entity(pos, vel, 1/FPS)
+        rotate_entity(angle, angle_vel, 1/FPS)
+
+        states.append((pg.Vector2(pos.get_position()), angle.get_angle()))
+
+    return states
+
+@test("Input history lookups should work across the tick wraparound")
+def _():
+    history = make_history(WRAP_INPUT_TICKS - 3, 6)
+
+    assert history.get_latest_tick() == 3
+    assert [predicted.tick for predicted in history.inputs] == [WRAP_INPUT_TICKS - 2, WRAP_INPUT_TICKS - 1, 0, 1, 2, 3]
+
+    assert history.get(WRAP_INPUT_TICKS - 1).tick == WRAP_INPUT_TICKS - 1
+    assert history.get(0).tick == 0
+    assert history.get(3).tick == 3
+
+    assert [predicted.tick for predicted in history.get_after(WRAP_INPUT_TICKS - 1)] == [0, 1, 2, 3]
+    assert [predicted.tick for predicted in history.get_after(1)] == [2, 3]
+    assert history.get_after(3) == ()
+
+    # Ticks that were never pushed (or already forgotten) aren't there
+    assert history.get(4) is None
+    assert history.get(WRAP_INPUT_TICKS - 3) is None
+    assert history.get_after(WRAP_INPUT_TICKS - 3) == ()
+
+@test("The input history should only remember its latest inputs")
+def _():
+    history = make_history(0, InputHistory.HISTORY_SIZE + 10)
+    latest = history.get_latest_tick()
+
+    assert len(history.inputs) == InputHistory.HISTORY_SIZE
+    assert history.get(10) is None
+    assert history.get(11).tick == 11
+    assert len(history.get_after(11)) == InputHistory.HISTORY_SIZE - 1
+    assert history.get(latest) is history.get_latest()
+
+@test("A mispredicted state should replay all inputs after it from the server's state")
+def _():
+    world = WorldECS(EventWriter())
+    history = InputHistory()
+    resources = Resources(world, history, Clock(FPS, FPS))
+
+    components = (Position(0, 0), Velocity(0, 0, 100), Angle(0), AngleVelocity(0, 3), PlayerController())
+    world.create_entity(*components, MainPlayer())
+
+    # Predict our inputs, just like the client would
+    for predicted_state, player_input in zip(simulate(*components, INPUTS), INPUTS):
+        history.push(*player_input).set_state(*predicted_state)
+
+    # The server says that after our second input we've been somewhere else
+    server_pos, server_angle = (5, -3), 0.25
+    on_sync_player_state_command(resources, SyncPlayerStateCommand(2, server_pos, server_angle))
+
+    # So the same inputs after it should be replayed from there
+    expected = simulate(
+        Position(*server_pos),
+        Velocity(0, 0, 100),
+        Angle(server_angle),
+        AngleVelocity(0, 3),
+        PlayerController(),
+        INPUTS[2:]
+    )
+
+    assert history.get(2).pos == server_pos and history.get(2).angle == server_angle
+
+    for predicted, (pos, angle) in zip(history.get_after(2), expected):
+        assert predicted.pos.distance_to(pos) < 1e-9
+        assert abs(predicted.angle - angle) < 1e-9
+
+    pos, angle = expected[-1]
+    assert components[0].get_position().distance_to(pos) < 1e-9
+    assert abs(components[2].get_angle() - angle) < 1e-9
+
+@test("A correctly predicted state shouldn't be replayed")
+def _():
+    world = WorldECS(EventWriter())
+    history = InputHistory()
+    resources = Resources(world, history, Clock(FPS, FPS))
+
+    components = (Position(0, 0), Velocity(0, 0, 100), Angle(0), AngleVelocity(0, 3), PlayerController())
+    world.create_entity(*components, MainPlayer())
+
+    for predicted_state, player_input in zip(simulate(*components, INPUTS), INPUTS):
+        history.push(*player_input).set_state(*predicted_state)
+
+    # The player has moved on since (for example, pushed by someone), which only a replay would overwrite
+    components[0].set_position(100, 100)
+
+    predicted = history.get(3)
+    on_sync_player_state_command(resources, SyncPlayerStateCommand(3, tuple(predicted.pos), predicted.angle))
+
+    assert components[0].get_position() == (100, 100)
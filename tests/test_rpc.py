@@ -3,7 +3,11 @@ import struct
 
 from plugin import Resources
 
-from modules.rpc import rpc, rpc_raw, RPCFormatError, is_rpc_reliable
+from modules.rpc import (
+    rpc, rpc_raw, rpc_bits, RPCFormatError, is_rpc_reliable, serialize_call, write_call, get_rpc_supersession_key, get_rpc_id
+)
+from modules.network import PacketWriter, PacketType, make_reliable_packet
+from modules.bitpack import BitSchema, Int, Bool
 
 RESOURCES = Resources()
 # We're mocking resources here since we don't really care about them when testing RPCs
@@ -107,4 +111,61 @@ def _():
         pass
 
     assert is_rpc_reliable(reliable)
-    assert not is_rpc_reliable(unreliable)
\ No newline at end of file
+    assert not is_rpc_reliable(unreliable)
+
+    @rpc("", supersedes=True)
+    def superseding():
+        pass
+
+    @rpc_raw(supersedes=True)
+    def raw_superseding():
+        pass
+
+    assert get_rpc_supersession_key(superseding) == get_rpc_id(superseding)
+    assert get_rpc_supersession_key(raw_superseding) == get_rpc_id(raw_superseding)
+    assert get_rpc_supersession_key(unreliable) is None
+
+@test("Test bit-packed RPCs")
+def _():
+    result = []
+
+    @rpc_bits(BitSchema(Int(-100, 100), Bool()))
+    def push_result(_, a: int, b: bool):
+        result.append((a, b))
+
+    data = push_result.serialize_call(-50, True)
+
+    # 8 bits for the integer and 1 for the boolean
+    assert len(data) == 2
+
+    push_result(RESOURCES, data)
+    assert result == [(-50, True)]
+
+    with raises(RPCFormatError):
+        push_result(RESOURCES, b"abc")
+
+@test("Written RPC calls should match serialized ones")
+def _():
+    @rpc("hi")
+    def struct_rpc(_, a: int, b: int):
+        pass
+
+    @rpc_raw
+    def raw_rpc(_, data: bytes):
+        pass
+
+    @rpc_bits(BitSchema(Int(-100, 100), Bool()))
+    def bits_rpc(_, a: int, b: bool):
+        pass
+
+    # A tiny capacity, so the writer has to grow
+    writer = PacketWriter(8)
+
+    for func, args in ((struct_rpc, (-5, 70000)), (raw_rpc, (b"x" * 100, )), (bits_rpc, (3, False))):
+        write_call(writer, func, args)
+
+        call = serialize_call(func, args)
+        assert bytes(writer.get_payload()) == call
+
+        # The packet is framed in place, and it should be the same as a packet built from the whole call
+        assert writer.finish(7, PacketType.Message) == make_reliable_packet(7, PacketType.Message, call)
@@ -0,0 +1,107 @@
+from ward import test
+from modules.seqwindow import SequenceWindow, SequenceTracker, sequence_greater_than
+
+WRAP = 2**16
+
+@test("Sequence comparisons should be wraparound-aware")
+def _():
+    assert sequence_greater_than(2, 1, WRAP)
+    assert not sequence_greater_than(1, 2, WRAP)
+
+    # 1 comes right after the wrap around, so it's newer than the last ID before it
+    assert sequence_greater_than(1, WRAP-1, WRAP)
+    assert not sequence_greater_than(WRAP-1, 1, WRAP)
+
+@test("Sequence window should only remember the latest IDs")
+def _():
+    w = SequenceWindow(8, WRAP)
+
+    # An empty window doesn't contain anything, and nothing is stale in it
+    assert 1 not in w
+    assert not w.is_stale(1)
+
+    for i in range(1, 9):
+        w.add(i)
+
+    # 1..8 all fit into the window
+    assert all(i in w for i in range(1, 9))
+
+    # Now let's push it a bit forward. 1 should drop out
+    w.add(9)
+    assert 1 not in w
+    assert w.is_stale(1)
+    assert 2 in w and 9 in w
+
+    # Skipped IDs must not be reported as present
+    w.add(12)
+    assert 10 not in w and 11 not in w
+    assert 12 in w
+
+    # Older (but not stale) IDs can still be inserted afterwards
+    w.add(10)
+    assert 10 in w
+
+    # Stale IDs on the other hand are ignored
+    w.add(2)
+    assert 2 not in w
+
+@test("Sequence window should handle the sequence ID wrap around")
+def _():
+    w = SequenceWindow(8, WRAP)
+
+    for i in range(WRAP-4, WRAP):
+        w.add(i)
+
+    # Sequence IDs wrap back to 1 (0 is reserved for unreliable packets)
+    for i in range(1, 4):
+        w.add(i)
+
+    assert all(i in w for i in (WRAP-3, WRAP-2, WRAP-1, 1, 2, 3))
+
+    # The old ID from the other side of the wrap around shouldn't be considered newer
+    assert not w.is_stale(WRAP-1)
+    assert w.is_stale(WRAP-100)
+
+    # And a jump larger than the entire window should clear it
+    w.add(100)
+    assert 100 in w
+    assert 3 not in w
+
+@test("Sequence tracker should remember every inserted ID, no matter how old")
+def _():
+    t = SequenceTracker(WRAP)
+
+    assert 1 not in t
+
+    # 1 is missing, so everything after it is kept aside
+    for i in range(2, 2000):
+        t.add(i)
+
+    assert 1 not in t
+    assert all(i in t for i in range(2, 2000))
+    assert 2000 not in t
+
+    # Once the gap closes, all of it collapses
+    t.add(1)
+    assert t.missing == 2000 and not t.ahead
+    assert 1 in t and 1999 in t
+
+    # Dublicates change nothing
+    t.add(5)
+    assert t.missing == 2000 and not t.ahead
+
+@test("Sequence tracker should handle the sequence ID wrap around")
+def _():
+    t = SequenceTracker(WRAP)
+    t.missing = WRAP-2
+
+    t.add(WRAP-1)
+    t.add(1)
+    assert WRAP-2 not in t
+    assert WRAP-1 in t and 1 in t
+
+    # 0 is never used, so the sequence goes straight from the last ID to 1
+    t.add(WRAP-2)
+    assert t.missing == 2 and not t.ahead
+    assert WRAP-100 in t
+    assert 2 not in t
@@ -0,0 +1,74 @@
+from ward import test
+from modules.snapshot import *
+
+SCHEMA = SnapshotSchema("h", "h", "B", "?")
+
+@test("Full snapshots should be decoded without a baseline")
+def _():
+    snapshot = {1: (10, -20, 255, False), 2: (0, 0, 0, True)}
+
+    data = SCHEMA.encode(1, snapshot)
+    assert SCHEMA.decode_header(data) == (1, NO_BASELINE)
+    assert SCHEMA.decode(data) == snapshot
+
+@test("Delta snapshots should only contain changes")
+def _():
+    baseline = {1: (10, 20, 30, False), 2: (0, 0, 0, True), 3: (5, 5, 5, False)}
+    snapshot = {1: (11, 20, 30, False), 2: (0, 0, 0, True), 4: (1, 2, 3, True)}
+
+    full = SCHEMA.encode(2, snapshot)
+    delta = SCHEMA.encode(2, snapshot, 1, baseline)
+
+    assert len(delta) < len(full)
+    assert SCHEMA.decode_header(delta) == (2, 1)
+
+    # Entity 1 has changed a single field, 2 didn't change, 3 got removed and 4 is new
+    assert SCHEMA.decode(delta, baseline) == snapshot
+
+    # Nothing changed - nothing to send but the header
+    assert len(SCHEMA.encode(3, snapshot, 2, snapshot)) == SNAPSHOT_HEADER.size
+
+@test("Malformed snapshots should raise format errors")
+def _():
+    baseline = {1: (10, 20, 30, False)}
+    delta = SCHEMA.encode(2, {1: (11, 20, 30, False)}, 1, baseline)
+
+    for decode in (
+        lambda: SCHEMA.decode(delta),
+        lambda: SCHEMA.decode(delta[:-1], baseline),
+        lambda: SCHEMA.decode(delta, {}),
+        lambda: SCHEMA.decode(b"\x00"),
+    ):
+        try:
+            decode()
+            assert False, "Should've failed"
+        except SnapshotFormatError:
+            pass
+
+@test("Snapshot history should forget old snapshots and skip the reserved ID")
+def _():
+    history = SnapshotHistory(2)
+
+    for _ in range(3):
+        history.push(history.next_id(), {})
+
+    assert tuple(history.get_ids()) == (2, 3)
+    assert history.get(1) is None
+
+    history.push(WRAP_SNAPSHOT_IDS-1, {})
+    assert history.next_id() == 1
+    assert history.is_newer(1)
+
+@test("Full snapshots should keep the per-entity format")
+def _():
+    snapshot = {1: (10, -20, 255, False), 7: (-5, 3, 1, True)}
+
+    # A full snapshot is encoded in bulk, but it should be the same as encoding every entity separately
+    expected = SNAPSHOT_HEADER.pack(1, NO_BASELINE) + b"".join(
+        ENTITY_HEADER.pack(uid, SCHEMA.full_mask) + SCHEMA.structs[SCHEMA.full_mask].pack(*values)
+        for uid, values in snapshot.items()
+    )
+
+    assert SCHEMA.encode(1, snapshot) == expected
+    assert SCHEMA.decode(expected) == snapshot
+    assert SCHEMA.decode(SCHEMA.encode(1, {})) == {}
@@ -0,0 +1,28 @@
+from ward import test
+
+import numpy as np
+from modules.tilemap import Tilemap
+
+@test("Lines should be blocked only by the tiles they cross")
+def _():
+    tiles = np.zeros((4, 4), np.uint32)
+    tiles[1][2] = 1
+    tiles[3][3] = 2
+
+    tilemap = Tilemap(4, 4, tiles)
+
+    # Straight through the blocking tile at x=2, y=1
+    assert tilemap.is_line_blocked((0.5, 1.5), (3.5, 1.5), {1})
+
+    # Right under it
+    assert not tilemap.is_line_blocked((0.5, 2.5), (3.5, 2.5), {1})
+
+    # Non-blocking tiles are fine
+    assert not tilemap.is_line_blocked((0.5, 0.5), (3.5, 3.5), {1})
+    assert tilemap.is_line_blocked((0.5, 0.5), (3.5, 3.5), {2})
+
+    # A diagonal line that passes the blocking tile's corner
+    assert not tilemap.is_line_blocked((0.5, 0.5), (1.5, 2.5), {1})
+
+    # Leaving the grid counts as being blocked
+    assert tilemap.is_line_blocked((0.5, 0.5), (5.5, 0.5), set())